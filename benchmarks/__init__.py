@@ -0,0 +1 @@
+"""Benchmarks of task3_dsw."""
@@ -0,0 +1,4 @@
+"""Run benchmark suite with python -m benchmarks."""
+from benchmarks.suite import main
+
+main()
@@ -0,0 +1,124 @@
+"""Local HTTP server answering like NBP api, with configurable latency."""
+from __future__ import annotations
+
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+from benchmarks.ledger import fake_rate
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import Self
+
+NOT_FOUND = b"404 NotFound - Not Found - Brak danych"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serve exchangerates/rates/{table}/{code}/{date} and date ranges."""
+
+    server: _Server
+
+    def do_GET(self) -> None:  # noqa: N802
+        """Answer request for rates of one day or of range of days."""
+        self.server.count_request()
+        time.sleep(self.server.latency)
+        # /api/exchangerates/rates/{table}/{code}/{start}[/{end}]/
+        parts = self.path.split("?")[0].strip("/").split("/")
+        try:
+            table, code = parts[3], parts[4]
+            start = datetime.date.fromisoformat(parts[5])
+            end = datetime.date.fromisoformat(parts[-1])
+        except (IndexError, ValueError):
+            self._send(400, b"400 BadRequest", "text/plain")
+            return
+        days = (
+            start + datetime.timedelta(day) for day in range((end - start).days + 1)
+        )
+        rates = [fake_rate(code, day) for day in days if day.weekday() < 5]  # noqa: PLR2004
+        if not rates:
+            self._send(404, NOT_FOUND, "text/plain")
+            return
+        body = {"table": table, "currency": code.lower(), "code": code, "rates": rates}
+        self._send(200, json.dumps(body).encode(), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        """Send response with body."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        """Do not log requests."""
+
+
+class _Server(ThreadingHTTPServer):
+    """Threading server counting requests."""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count_request(self) -> None:
+        """Count one request."""
+        with self._lock:
+            self.requests += 1
+
+
+class FakeNBPServer:
+    """
+    Fake NBP api running in a background thread.
+
+    Rates are published on weekdays, requests for weekends only get 404
+    like from real api. Use as context manager and point NBP_API_URL to url.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """
+        Initialize FakeNBPServer.
+
+        Args:
+        ----
+            latency: seconds every response is delayed by
+        """
+        self._server = _Server(latency)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Return base url of api."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    @property
+    def requests(self) -> int:
+        """Return number of requests served so far."""
+        return self._server.requests
+
+    def reset(self) -> None:
+        """Reset request counter."""
+        self._server.requests = 0
+
+    def __enter__(self) -> Self:
+        """Start server."""
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Stop server."""
+        self._server.shutdown()
+        self._server.server_close()
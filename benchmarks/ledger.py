@@ -0,0 +1,107 @@
+"""Generator of synthetic json database files."""
+from __future__ import annotations
+
+import datetime
+import json
+import random
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DEFAULT_CURRENCIES = {"EUR": 0.4, "USD": 0.3, "GBP": 0.1, "PLN": 0.2}
+FIRST_DAY = datetime.date(2023, 1, 2)
+WEEKDAYS = [
+    day
+    for day in (FIRST_DAY + datetime.timedelta(days) for days in range(365))
+    if day.weekday() < 5  # noqa: PLR2004
+]
+
+
+def parse_currencies(value: str) -> dict[str, float]:
+    """Parse currency mix like "EUR=0.4,USD=0.3,PLN=0.3"."""
+    currencies = {}
+    for item in value.split(","):
+        code, _, weight = item.partition("=")
+        currencies[code.strip().upper()] = float(weight or 1)
+    return currencies
+
+
+def fake_rate(code: str, date: datetime.date) -> dict:
+    """Return deterministic rate of currency published on a weekday."""
+    return {
+        "no": f"{date.timetuple().tm_yday:03}/A/NBP/{date.year}",
+        "effectiveDate": str(date),
+        "mid": round(3 + (sum(map(ord, code)) % 20) / 10 + date.day / 1000, 4),
+    }
+
+
+def fake_response(code: str, date: datetime.date) -> dict:
+    """Return exchange rate response of NBP api for one day."""
+    return {
+        "table": "A",
+        "currency": code.lower(),
+        "code": code,
+        "rates": [fake_rate(code, date)],
+    }
+
+
+def generate_ledger(  # noqa: PLR0913
+    path: Path,
+    invoices: int,
+    *,
+    payments_per_invoice: int = 3,
+    currencies: dict[str, float] | None = None,
+    calculated: bool = False,
+    seed: int = 0,
+) -> int:
+    """
+    Write json database file with random invoices on weekdays of a year.
+
+    Args:
+    ----
+        path: path to output file
+        invoices: number of invoices
+        payments_per_invoice: average number of payments, from 0 to twice as many
+        currencies: weights of currency codes of invoices and payments
+        calculated: store exchange rates as if file was already calculated
+        seed: seed of random generator, same arguments give the same file
+
+    Returns:
+    -------
+        int: number of payments
+    """
+    generator = random.Random(seed)
+    currencies = currencies or DEFAULT_CURRENCIES
+    codes, weights = list(currencies), list(currencies.values())
+
+    def record(prefix: str, number: str, amount: float) -> dict:
+        currency = generator.choices(codes, weights)[0]
+        date = generator.choice(WEEKDAYS)
+        rate = (
+            fake_response(currency, date) if calculated and currency != "PLN" else None
+        )
+        return {
+            "id": f"{prefix}-{number}",
+            "amount": amount,
+            "currency": currency,
+            "date": str(date),
+            "exchange_rate": rate,
+        }
+
+    payments = 0
+    data = []
+    for number in range(invoices):
+        invoice = record("invoice", str(number), round(generator.uniform(1, 10_000), 2))
+        invoice["status"] = "Nie zaplacona"
+        invoice["payments"] = []
+        for index in range(generator.randint(0, 2 * payments_per_invoice)):
+            payment = record(
+                "payment", f"{number}-{index}", round(generator.uniform(1, 5_000), 2)
+            )
+            payment["exchange_rate_difference"] = 0.0
+            invoice["payments"].append(payment)
+        payments += len(invoice["payments"])
+        data.append(invoice)
+    path.write_text(json.dumps({"invoices": data}))
+    return payments
@@ -0,0 +1,141 @@
+"""
+Peak memory of loading a database file as models and as CompactLedger.
+
+Usage: python -m benchmarks.memory [--payments N] [--per-invoice N]
+
+File is generated and every measurement runs in a fresh interpreter, so
+peak RSS of one step does not hide the others. Results are printed as json.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.ledger import fake_response
+
+CURRENCIES = ["EUR", "USD", "GBP", "PLN"]
+
+MEASURE = """
+import resource, sys, time
+from task3_dsw.compact import CompactLedger
+from task3_dsw.database import Database
+from task3_dsw.nbp_api import NBPApiClient
+from task3_dsw.settings import Settings
+
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if sys.argv[1] == "models":
+    database = Database(Settings(DATABASE_PATH=sys.argv[2]), NBPApiClient())
+    database.load()
+    count = len(database.get_invoices())
+else:
+    count = len(CompactLedger.load(sys.argv[2]))
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(count, baseline, peak, elapsed)
+"""
+
+
+def generate(path: Path, payments: int, per_invoice: int) -> None:
+    """Write calculated database file with given number of payments."""
+    generator = random.Random(0)
+    days = [datetime.date(2023, 1, 2) + datetime.timedelta(days) for days in range(365)]
+    invoices = []
+    for number in range(-(-payments // per_invoice)):
+        currency = generator.choice(CURRENCIES)
+        date = generator.choice(days)
+        invoice_payments = []
+        for _ in range(min(per_invoice, payments - number * per_invoice)):
+            payment_currency = generator.choice(CURRENCIES)
+            payment_date = generator.choice(days)
+            invoice_payments.append(
+                {
+                    "id": f"payment-{number}-{len(invoice_payments)}",
+                    "amount": round(generator.uniform(1, 1000), 2),
+                    "currency": payment_currency,
+                    "date": str(payment_date),
+                    "exchange_rate": fake_response(payment_currency, payment_date),
+                    "exchange_rate_difference": round(generator.uniform(-5, 5), 2),
+                }
+            )
+        invoices.append(
+            {
+                "id": f"invoice-{number}",
+                "amount": round(generator.uniform(1, 10_000), 2),
+                "currency": currency,
+                "date": str(date),
+                "status": "Nie zaplacona",
+                "exchange_rate": fake_response(currency, date),
+                "payments": invoice_payments,
+            }
+        )
+    path.write_text(json.dumps({"invoices": invoices}))
+
+
+def measure(mode: str, path: Path) -> dict:
+    """Load file in a fresh interpreter and return its peak memory."""
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE, mode, str(path)],  # noqa: S603
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    count, baseline, peak, elapsed = int(output[0]), *map(float, output[1:])
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "invoices": count,
+        "peak_rss_mb": round(peak * unit / 2**20, 1),
+        "load_rss_mb": round((peak - baseline) * unit / 2**20, 1),
+        "seconds": round(elapsed, 2),
+    }
+
+
+def main() -> None:
+    """Run memory benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--payments", type=int, default=1_000_000)
+    parser.add_argument("--per-invoice", type=int, default=4)
+    parser.add_argument("--generate", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.generate:
+        generate(Path(args.generate), args.payments, args.per_invoice)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "database.json"
+        start = time.perf_counter()
+        # Generated ledger is built in another process, forked measurements
+        # would otherwise inherit its peak RSS
+        subprocess.run(
+            [  # noqa: S603
+                sys.executable,
+                "-m",
+                "benchmarks.memory",
+                f"--payments={args.payments}",
+                f"--per-invoice={args.per_invoice}",
+                f"--generate={path}",
+            ],
+            check=True,
+        )
+        report = {
+            "payments": args.payments,
+            "file_mb": round(path.stat().st_size / 2**20, 1),
+            "generate_seconds": round(time.perf_counter() - start, 2),
+            "models": measure("models", path),
+            "compact": measure("compact", path),
+        }
+    report["ratio"] = round(
+        report["compact"]["load_rss_mb"] / report["models"]["load_rss_mb"], 3
+    )
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark scenarios, every one run in a fresh interpreter.
+
+Usage: python -m benchmarks.scenarios SCENARIO LEDGER WORKDIR
+
+Settings are taken from environment, so NBP_API_URL points to fake api.
+Prints json with seconds taken by measured part and peak RSS of process.
+"""
+from __future__ import annotations
+
+import json
+import resource
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from task3_dsw.database import Database
+from task3_dsw.main import main as task3_main
+from task3_dsw.nbp_api import NBPApiClient
+from task3_dsw.settings import Settings
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def _database(path: Path, output_file: str | None = None) -> Database:
+    """Return json database of file with client of fake api."""
+    return Database(
+        Settings(DATABASE_PATH=str(path)), NBPApiClient(), output_file=output_file
+    )
+
+
+def batch(ledger: Path, workdir: Path) -> float:
+    """Run batch mode of main() for ledger."""
+    sys.argv = ["main.py", "-f", str(ledger), "-o", str(workdir / "output.json")]
+    start = time.perf_counter()
+    task3_main()
+    return time.perf_counter() - start
+
+
+def load(ledger: Path, workdir: Path) -> float:  # noqa: ARG001
+    """Load json database."""
+    database = _database(ledger)
+    start = time.perf_counter()
+    database.load()
+    return time.perf_counter() - start
+
+
+def save(ledger: Path, workdir: Path) -> float:
+    """Save loaded json database to another file."""
+    database = _database(ledger, output_file=str(workdir / "output.json"))
+    database.load()
+    start = time.perf_counter()
+    database.save()
+    return time.perf_counter() - start
+
+
+def calculate(ledger: Path, workdir: Path) -> float:  # noqa: ARG001
+    """Calculate status and differences of every invoice one request at a time."""
+    database = _database(ledger)
+    database.load()
+    start = time.perf_counter()
+    for invoice in database.get_invoices():
+        database.calulate_payments_for_invoice(invoice)
+        for payment in database.get_payments(invoice):
+            database.calculate_difference(invoice, payment)
+    return time.perf_counter() - start
+
+
+SCENARIOS: dict[str, Callable[[Path, Path], float]] = {
+    "batch": batch,
+    "load": load,
+    "save": save,
+    "calculate": calculate,
+}
+
+
+def main() -> None:
+    """Run scenario given in arguments."""
+    name, ledger, workdir = sys.argv[1], Path(sys.argv[2]), Path(sys.argv[3])
+    # Scenarios may change their file, every one gets its own copy
+    copy = workdir / ledger.name
+    shutil.copyfile(ledger, copy)
+    seconds = SCENARIOS[name](copy, workdir)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    print(
+        json.dumps(
+            {"seconds": round(seconds, 4), "peak_rss_mb": round(peak * unit / 2**20, 1)}
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark suite of task3_dsw.
+
+Usage: python -m benchmarks [--sizes N ...] [--latency MS] [--output FILE]
+                            [--compare OLD_REPORT]
+
+Generates ledgers of every size and runs every scenario of
+benchmarks.scenarios against a local fake NBP api. Timings, request counts
+and peak memory are written to a json report. Report compared with an older
+one lists scenarios which became slower, and scenarios whose time per
+invoice grows with size are listed in every report.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.fake_nbp import FakeNBPServer
+from benchmarks.ledger import DEFAULT_CURRENCIES, generate_ledger, parse_currencies
+from benchmarks.scenarios import SCENARIOS
+
+DEFAULT_SIZES = [1_000, 10_000]
+# Time per invoice of largest ledger may be this many times time of smallest
+SCALING_LIMIT = 3.0
+# Scenarios shorter than this are too noisy to compare
+MIN_SECONDS = 0.05
+
+
+def run_scenario(
+    name: str, ledger: Path, server: FakeNBPServer, directory: Path
+) -> dict:
+    """Run scenario in a fresh interpreter and return its measurements."""
+    workdir = Path(tempfile.mkdtemp(dir=directory))
+    env = {
+        **os.environ,
+        "NBP_API_URL": server.url,
+        "DATABASE_PATH": str(workdir / "database.json"),
+        "RATE_CACHE_PATH": str(workdir / "rates.sqlite3"),
+        "RATE_STORE_PATH": str(workdir / "nbp_rates.sqlite3"),
+        # Measure the program, not the rate limiter protecting real api
+        "NBP_RATE_LIMIT": "0",
+    }
+    server.reset()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.scenarios", name, str(ledger), str(workdir)],  # noqa: S603
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    return {**json.loads(output.splitlines()[-1]), "requests": server.requests}
+
+
+def scaling(results: list[dict]) -> dict[str, float]:
+    """Return growth of time per invoice from smallest to largest ledger."""
+    growth = {}
+    for name in SCENARIOS:
+        runs = sorted(
+            (result for result in results if result["scenario"] == name),
+            key=lambda result: result["invoices"],
+        )
+        if len(runs) < 2 or runs[-1]["seconds"] < MIN_SECONDS:  # noqa: PLR2004
+            continue
+        smallest = max(runs[0]["seconds"], MIN_SECONDS) / runs[0]["invoices"]
+        growth[name] = round(runs[-1]["seconds"] / runs[-1]["invoices"] / smallest, 2)
+    return growth
+
+
+def compare(report: dict, old_report: dict, tolerance: float) -> list[dict]:
+    """Return runs slower than in old report by more than tolerance."""
+    old_runs = {
+        (result["scenario"], result["invoices"]): result
+        for result in old_report["results"]
+    }
+    regressions = []
+    for result in report["results"]:
+        old = old_runs.get((result["scenario"], result["invoices"]))
+        if old is None or result["seconds"] < MIN_SECONDS:
+            continue
+        ratio = result["seconds"] / max(old["seconds"], MIN_SECONDS)
+        if ratio > 1 + tolerance or result["requests"] > old["requests"]:
+            regressions.append(
+                {
+                    "scenario": result["scenario"],
+                    "invoices": result["invoices"],
+                    "ratio": round(ratio, 2),
+                    "requests": [old["requests"], result["requests"]],
+                }
+            )
+    return regressions
+
+
+def commit() -> str | None:
+    """Return current git commit, None outside of git repository."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S603, S607
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args: argparse.Namespace) -> dict:
+    """Run every scenario for every size and return report."""
+    results = []
+    with tempfile.TemporaryDirectory() as directory, FakeNBPServer(
+        args.latency / 1000
+    ) as server:
+        for size in args.sizes:
+            ledger = Path(directory) / f"ledger-{size}.json"
+            payments = generate_ledger(
+                ledger,
+                size,
+                payments_per_invoice=args.payments_per_invoice,
+                currencies=args.currencies,
+            )
+            for name in args.scenarios:
+                result = run_scenario(name, ledger, server, Path(directory))
+                results.append(
+                    {"scenario": name, "invoices": size, "payments": payments, **result}
+                )
+                print(json.dumps(results[-1]), file=sys.stderr)
+    report = {
+        "created": datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+        "commit": commit(),
+        "python": platform.python_version(),
+        "config": {
+            "payments_per_invoice": args.payments_per_invoice,
+            "currencies": args.currencies,
+            "latency_ms": args.latency,
+        },
+        "results": results,
+        "scaling": scaling(results),
+    }
+    report["superlinear"] = [
+        name for name, growth in report["scaling"].items() if growth > SCALING_LIMIT
+    ]
+    return report
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Create parser for command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark suite of task3_dsw.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--payments-per-invoice", type=int, default=3)
+    parser.add_argument(
+        "--currencies",
+        type=parse_currencies,
+        default=DEFAULT_CURRENCIES,
+        help='Currency mix, e.g. "EUR=0.4,USD=0.3,PLN=0.3".',
+    )
+    parser.add_argument(
+        "--latency", type=float, default=5.0, help="Latency of fake NBP api in ms."
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--output", type=Path, default=Path("benchmark.json"))
+    parser.add_argument("--compare", type=Path, help="Older report to compare with.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown against older report.",
+    )
+    return parser
+
+
+def main() -> None:
+    """Run benchmark suite, exit with 1 when regressions are found."""
+    args = create_parser().parse_args()
+    report = run_suite(args)
+    if args.compare:
+        report["regressions"] = compare(
+            report, json.loads(args.compare.read_text()), args.tolerance
+        )
+    args.output.write_text(json.dumps(report, indent=4))
+    print(
+        json.dumps({key: report[key] for key in report if key != "results"}, indent=4)
+    )
+    if report["superlinear"] or report.get("regressions"):
+        sys.exit(1)
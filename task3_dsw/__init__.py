@@ -1,5 +1,41 @@
-"""Package initialization."""
-from .nbp_api import *  # noqa: F403
-from .settings import *  # noqa: F403
+"""
+Package initialization.
 
-__all__ = ["settings.__all__", "nbp_api.__all__"]  # noqa: F405
+Settings are imported eagerly, names of nbp_api are imported on first use,
+so that importing the package does not import httpx.
+"""
+from __future__ import annotations
+
+import importlib
+
+from .settings import Settings, settings
+
+# Names importable from package, mapped to modules importing them on first use
+_LAZY_NAMES = dict.fromkeys(
+    (
+        "AsyncNBPApiClient",
+        "BaseNBPApiClient",
+        "ExchangeRateRangeSchema",
+        "ExchangeRateSchema",
+        "ExchangeRateSchemaResponse",
+        "NBPApiClient",
+        "NBPApiError",
+        "OfflineNBPApiClient",
+        "RateSchema",
+    ),
+    "task3_dsw.nbp_api",
+)
+
+__all__ = ["Settings", "settings", *_LAZY_NAMES]  # noqa: PLE0604
+
+
+def __getattr__(name: str) -> object:
+    """Import name of nbp_api on first use."""
+    try:
+        module = _LAZY_NAMES[name]
+    except KeyError:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg) from None
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
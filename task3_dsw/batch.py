@@ -0,0 +1,433 @@
+"""Batch processing of invoices file."""
+from __future__ import annotations
+
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, NamedTuple
+
+from task3_dsw.cache import RateCache
+from task3_dsw.cassette import CassetteTransport
+from task3_dsw.compact import CompactLedger
+from task3_dsw.database import Database, DataSchema, file_codec
+from task3_dsw.logger import logger
+from task3_dsw.metrics import metrics
+from task3_dsw.nbp_api import NBPApiClient, OfflineNBPApiClient
+from task3_dsw.planner import RatePlanner
+from task3_dsw.rate_store import RateStore
+from task3_dsw.resilience import ResilientTransport
+from task3_dsw.settings import BATCH_ENGINES, Settings, settings
+from task3_dsw.streaming import InvoiceWriter, iter_invoices
+from task3_dsw.tracing import tracer
+
+if TYPE_CHECKING:
+    from task3_dsw.database import Invoice
+    from task3_dsw.nbp_api import AsyncNBPApiClient
+
+__all__ = [
+    "ENGINES",
+    "BatchResult",
+    "calculate_invoice",
+    "process_invoices",
+    "run_batch",
+    "run_batch_compact",
+    "run_batch_stream",
+]
+
+# Number of chunks given to every worker, more chunks balance uneven invoices
+CHUNKS_PER_WORKER = 4
+
+# Calculation engines, numpy engine needs optional numpy dependency
+ENGINES = BATCH_ENGINES
+
+# Database of worker process, created by _init_worker
+_worker_database: Database | None = None
+
+
+class BatchResult(NamedTuple):
+    """Numbers of processed invoices and of records skipped as unchanged."""
+
+    invoices: int
+    skipped: int
+
+
+def _record_throughput(result: BatchResult, start: float) -> BatchResult:
+    """Record processed invoices and their number per second in metrics."""
+    elapsed = time.perf_counter() - start
+    metrics.inc("invoices_processed_total", result.invoices)
+    metrics.inc("records_skipped_total", result.skipped)
+    metrics.observe("batch_seconds", elapsed)
+    metrics.set("invoices_per_second", result.invoices / elapsed if elapsed else 0.0)
+    return result
+
+
+def calculate_invoice(
+    database: Database, invoice: Invoice, *, incremental: bool = False
+) -> int:
+    """
+    Calculate status and exchange rate differences of invoice payments.
+
+    Calculated invoice and payments get hash of their inputs and exchange
+    rates used. In incremental mode records with unchanged hash are skipped.
+
+    Args:
+    ----
+        database: Database containing invoice
+        invoice: Invoice
+        incremental: skip invoice and payments whose inputs did not change
+
+    Returns:
+    -------
+        int: number of skipped invoices and payments
+    """
+    with tracer.span("batch.invoice", id=invoice.id, payments=len(invoice.payments)):
+        if incremental and invoice.input_hash == database.invoice_input_hash(invoice):
+            return 1 + len(invoice.payments)
+        skipped = 0
+        database.calulate_payments_for_invoice(invoice)
+        payments = database.get_payments(invoice)
+        for payment in payments:
+            if incremental and payment.input_hash == database.payment_input_hash(
+                invoice, payment
+            ):
+                skipped += 1
+                continue
+            database.calculate_difference(invoice, payment)
+            payment.input_hash = database.payment_input_hash(invoice, payment)
+        invoice.input_hash = database.invoice_input_hash(invoice)
+        return skipped
+
+
+def process_invoices(
+    database: Database,
+    workers: int = 1,
+    checkpoint: int = 0,
+    *,
+    incremental: bool = False,
+    engine: str = "scalar",
+) -> int:
+    """
+    Calculate status and exchange rate differences of every invoice.
+
+    Results are saved once at the end, and every checkpoint invoices if
+    checkpoint is given.
+
+    Args:
+    ----
+        database: Database with loaded invoices
+        workers: number of worker processes, 1 to calculate in this process
+        checkpoint: number of invoices between saves, 0 to save only at the end
+        incremental: skip invoices and payments whose inputs did not change
+        engine: "scalar" or "numpy" to calculate whole dataset in vectorised passes
+
+    Returns:
+    -------
+        int: number of skipped invoices and payments
+
+    Raises:
+    ------
+        ValueError: if engine is unknown or its dependency is not installed
+    """
+    if engine not in ENGINES:
+        msg = f"Unknown engine {engine}, choose one of {', '.join(ENGINES)}."
+        raise ValueError(msg)
+    if engine == "numpy":
+        return _process_invoices_numpy(database, incremental=incremental)
+    if workers > 1:
+        return _process_invoices_parallel(database, workers, incremental=incremental)
+    skipped = 0
+    invoices = database.get_invoices()
+    for number, invoice in enumerate(invoices, start=1):
+        skipped += calculate_invoice(database, invoice, incremental=incremental)
+        if checkpoint and number % checkpoint == 0:
+            logger.debug("Checkpoint after %s invoices", number)
+            database.save()
+    database.save()
+    return skipped
+
+
+def _process_invoices_numpy(database: Database, *, incremental: bool) -> int:
+    """Calculate all invoices with numpy engine and save them."""
+    try:
+        from task3_dsw.numpy_engine import calculate_invoices
+    except ImportError as e:
+        msg = "Numpy engine requires numpy, install task3-dsw with numpy extra."
+        raise ValueError(msg) from e
+    skipped = calculate_invoices(
+        database, database.get_invoices(), incremental=incremental
+    )
+    database.save()
+    return skipped
+
+
+def _process_invoices_parallel(
+    database: Database, workers: int, *, incremental: bool
+) -> int:
+    """Split invoices into chunks calculated by pool of worker processes."""
+    invoices = database.get_invoices()
+    chunk_size = max(1, math.ceil(len(invoices) / (workers * CHUNKS_PER_WORKER)))
+    chunks = [
+        invoices[start : start + chunk_size]
+        for start in range(0, len(invoices), chunk_size)
+    ]
+    cache = database.nbp_api_client.cache
+    # Worker can not share in memory cache, give it a copy of all entries
+    cache_entries = cache.entries() if cache.path == ":memory:" else []
+    nbp_api_client = database.nbp_api_client
+    offline = isinstance(nbp_api_client, OfflineNBPApiClient)
+    store_path = nbp_api_client.store.path if offline else None
+    fallback = not offline or nbp_api_client.fallback is not None
+    network = nbp_api_client.fallback if offline else nbp_api_client
+    # Workers replay the same cassette, recording is left to the main process
+    transport = network.transport if network is not None else None
+    cassette = (
+        str(transport.path)
+        if isinstance(transport, CassetteTransport) and transport.mode == "replay"
+        else None
+    )
+    logger.debug("Calculate %s chunks with %s workers", len(chunks), workers)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            database.settings,
+            cache.path,
+            cache_entries,
+            store_path,
+            fallback,
+            cassette,
+        ),
+    ) as executor:
+        # map keeps order of chunks, so invoices stay in original order
+        results = list(
+            executor.map(_process_chunk, chunks, [incremental] * len(chunks))
+        )
+    database.data = DataSchema.model_construct(
+        invoices=[invoice for chunk, _ in results for invoice in chunk]
+    )
+    database.save()
+    return sum(skipped for _, skipped in results)
+
+
+def _init_worker(  # noqa: PLR0913
+    worker_settings: Settings,
+    cache_path: str,
+    cache_entries: list[tuple[str, str, str, str | None]],
+    store_path: str | None,
+    fallback: bool,  # noqa: FBT001
+    cassette: str | None,
+) -> None:
+    """Create database used by worker process."""
+    global _worker_database  # noqa: PLW0603
+    # validators read module settings, which is not shared with spawned workers
+    settings.CURRENCIES = worker_settings.CURRENCIES
+    cache = RateCache(
+        path=cache_path, max_entries=worker_settings.RATE_CACHE_MAX_ENTRIES
+    )
+    cache.set_many(cache_entries)
+    transport = (
+        CassetteTransport(cassette)
+        if cassette is not None
+        else ResilientTransport.from_settings(worker_settings)
+    )
+    nbp_api_client = NBPApiClient(cache=cache, transport=transport)
+    if store_path is not None:
+        nbp_api_client = OfflineNBPApiClient(
+            RateStore(store_path), fallback=nbp_api_client if fallback else None
+        )
+    _worker_database = Database(settings=worker_settings, nbp_api_client=nbp_api_client)
+
+
+def _process_chunk(
+    invoices: list[Invoice],
+    incremental: bool,  # noqa: FBT001
+) -> tuple[list[Invoice], int]:
+    """Calculate chunk of invoices in worker process."""
+    _worker_database.data = DataSchema.model_construct(invoices=invoices)
+    skipped = sum(
+        calculate_invoice(_worker_database, invoice, incremental=incremental)
+        for invoice in invoices
+    )
+    return _worker_database.data.invoices, skipped
+
+
+async def run_batch(  # noqa: PLR0913
+    database: Database,
+    async_nbp_api_client: AsyncNBPApiClient | None,
+    workers: int = 1,
+    checkpoint: int = 0,
+    *,
+    incremental: bool = False,
+    engine: str = "scalar",
+) -> BatchResult:
+    """
+    Run batch pipeline for loaded database.
+
+    All exchange rates needed by the file are fetched concurrently first,
+    then invoices are calculated in their original order from the cache.
+
+    Args:
+    ----
+        database: Database with loaded invoices
+        async_nbp_api_client: client sharing rate cache with database client,
+            None to skip fetching rates up front
+        workers: number of worker processes calculating invoices
+        checkpoint: number of invoices between saves, 0 to save only at the end
+        incremental: skip invoices and payments whose inputs did not change
+        engine: calculation engine, one of ENGINES
+
+    Returns:
+    -------
+        BatchResult
+    """
+    start = time.perf_counter()
+    invoices = database.get_invoices()
+    if incremental:
+        # Rates are needed only for invoices which will be calculated
+        invoices = [
+            invoice
+            for invoice in invoices
+            if invoice.input_hash != database.invoice_input_hash(invoice)
+        ]
+    if async_nbp_api_client is not None:
+        async with async_nbp_api_client:
+            with tracer.span("batch.prefetch"):
+                await RatePlanner(async_nbp_api_client).aprefetch(invoices)
+    logger.debug("Exchange rates fetched, calculating invoices.")
+    skipped = process_invoices(
+        database,
+        workers=workers,
+        checkpoint=checkpoint,
+        incremental=incremental,
+        engine=engine,
+    )
+    return _record_throughput(BatchResult(len(database.get_invoices()), skipped), start)
+
+
+def _check_wal_empty(database: Database) -> None:
+    """Refuse to read input file directly while its write-ahead log has records."""
+    if database.has_wal_records():
+        msg = (
+            f"{database.wal.path} holds changes not saved in "
+            f"{database.settings.DATABASE_PATH}, run without streaming or "
+            "low memory mode to apply them."
+        )
+        raise ValueError(msg)
+
+
+async def run_batch_stream(
+    database: Database,
+    async_nbp_api_client: AsyncNBPApiClient | None,
+    *,
+    incremental: bool = False,
+) -> BatchResult:
+    """
+    Run batch pipeline reading and writing invoices one at a time.
+
+    Input file is read twice: first to fetch exchange rates, then to
+    calculate invoices and write them to output file. Only one invoice is
+    kept in memory, so memory use does not depend on size of the file.
+
+    Args:
+    ----
+        database: Database with settings and output file, not loaded
+        async_nbp_api_client: client sharing rate cache with database client,
+            None to skip fetching rates up front
+        incremental: skip invoices and payments whose inputs did not change
+
+    Returns:
+    -------
+        BatchResult
+
+    Raises:
+    ------
+        ValueError: if write-ahead log of input file has records, they are
+            applied only by loaded Database
+    """
+    _check_wal_empty(database)
+    start = time.perf_counter()
+    input_file = database.settings.DATABASE_PATH
+    invoices = iter_invoices(input_file)
+    if incremental:
+        invoices = (
+            invoice
+            for invoice in invoices
+            if invoice.input_hash != database.invoice_input_hash(invoice)
+        )
+    if async_nbp_api_client is not None:
+        async with async_nbp_api_client:
+            with tracer.span("batch.prefetch"):
+                await RatePlanner(async_nbp_api_client).aprefetch(invoices)
+    logger.debug("Exchange rates fetched, streaming invoices.")
+    skipped = 0
+    output_file = database.output_file or input_file
+    codec = file_codec(output_file, database.settings.DATABASE_CODEC)
+    with InvoiceWriter(output_file, codec) as writer:
+        for invoice in iter_invoices(input_file):
+            database.data = DataSchema.model_construct(invoices=[invoice])
+            skipped += calculate_invoice(database, invoice, incremental=incremental)
+            # Invoice is written here, keeping its id would grow with the file
+            database.discard_changes()
+            writer.write(invoice)
+    database.data = DataSchema(invoices=[])
+    return _record_throughput(BatchResult(writer.count, skipped), start)
+
+
+async def run_batch_compact(
+    database: Database,
+    async_nbp_api_client: AsyncNBPApiClient | None,
+    *,
+    incremental: bool = False,
+) -> BatchResult:
+    """
+    Run batch pipeline keeping invoices in compact array columns.
+
+    Input file is validated and read once into CompactLedger. Invoices are
+    calculated as models one at a time and their results stored back, so
+    memory use is a small fraction of loaded Database.
+
+    Args:
+    ----
+        database: Database with settings and output file, not loaded
+        async_nbp_api_client: client sharing rate cache with database client,
+            None to skip fetching rates up front
+        incremental: skip invoices and payments whose inputs did not change
+
+    Returns:
+    -------
+        BatchResult
+
+    Raises:
+    ------
+        ValueError: if write-ahead log of input file has records, they are
+            applied only by loaded Database
+    """
+    _check_wal_empty(database)
+    start = time.perf_counter()
+    input_file = database.settings.DATABASE_PATH
+    ledger = CompactLedger.load(input_file)
+    logger.debug(
+        "Loaded %s invoices with %s payments", len(ledger), ledger.payment_count
+    )
+    if async_nbp_api_client is not None:
+        invoices = iter(ledger)
+        if incremental:
+            invoices = (
+                invoice
+                for invoice in invoices
+                if invoice.input_hash != database.invoice_input_hash(invoice)
+            )
+        async with async_nbp_api_client:
+            with tracer.span("batch.prefetch"):
+                await RatePlanner(async_nbp_api_client).aprefetch(invoices)
+    logger.debug("Exchange rates fetched, calculating invoices.")
+    skipped = 0
+    for index, invoice in enumerate(ledger):
+        database.data = DataSchema.model_construct(invoices=[invoice])
+        skipped += calculate_invoice(database, invoice, incremental=incremental)
+        database.discard_changes()
+        ledger[index] = invoice
+    database.data = DataSchema(invoices=[])
+    output_file = database.output_file or input_file
+    ledger.save(output_file, file_codec(output_file, database.settings.DATABASE_CODEC))
+    return _record_throughput(BatchResult(len(ledger), skipped), start)
@@ -0,0 +1,181 @@
+"""Persistent cache for exchange rates fetched from NBP api."""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    import datetime
+
+__all__ = ["CacheEntry", "RateCache"]
+
+
+class CacheEntry(NamedTuple):
+    """
+    Cached exchange rate.
+
+    Attributes
+    ----------
+        payload: str | None - raw json response, None if no rate was published
+    """
+
+    payload: str | None
+
+    @property
+    def negative(self) -> bool:
+        """Return True if entry records that no rate was published."""
+        return self.payload is None
+
+
+class RateCache:
+    """
+    SQLite cache for exchange rates keyed by (table, code, date).
+
+    Past NBP rates never change, so entries never expire. When the cache
+    grows over max_entries the oldest entries are evicted first.
+    """
+
+    def __init__(self, path: str = ":memory:", max_entries: int = 100_000) -> None:
+        """
+        Initialize RateCache.
+
+        Args:
+        ----
+            path: path to sqlite file, ":memory:" for a cache living in memory
+            max_entries: maximum number of cached entries
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rates (
+                    rate_table TEXT NOT NULL,
+                    code TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    payload TEXT,
+                    PRIMARY KEY (rate_table, code, date)
+                )
+                """
+            )
+        self._size = self._connection.execute("SELECT COUNT(*) FROM rates").fetchone()[
+            0
+        ]
+
+    def __len__(self) -> int:
+        """Return number of cached entries."""
+        return self._size
+
+    def get(
+        self, table: str, code: str, date: datetime.date | str
+    ) -> CacheEntry | None:
+        """
+        Get exchange rate from cache.
+
+        Args:
+        ----
+            table: NBP table
+            code: currency code
+            date: date of exchange rate
+
+        Returns:
+        -------
+            CacheEntry or None if the key is not cached
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload FROM rates WHERE rate_table = ? AND code = ? AND date = ?",
+                (table.upper(), code, str(date)),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return CacheEntry(payload=row[0])
+
+    def has(self, table: str, code: str, date: datetime.date | str) -> bool:
+        """Return True if key is cached, without touching hit/miss counters."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM rates WHERE rate_table = ? AND code = ? AND date = ?",
+                (table.upper(), code, str(date)),
+            ).fetchone()
+            return row is not None
+
+    def set(
+        self, table: str, code: str, date: datetime.date | str, payload: str | None
+    ) -> None:
+        """
+        Store exchange rate in cache.
+
+        Args:
+        ----
+            table: NBP table
+            code: currency code
+            date: date of exchange rate
+            payload: raw json response, None if no rate was published
+        """
+        self.set_many([(table, code, date, payload)])
+
+    def set_many(
+        self, entries: list[tuple[str, str, datetime.date | str, str | None]]
+    ) -> None:
+        """
+        Store many exchange rates in one transaction.
+
+        Args:
+        ----
+            entries: list of (table, code, date, payload) tuples
+        """
+        rows = [
+            (table.upper(), code, str(date), payload)
+            for table, code, date, payload in entries
+        ]
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO rates VALUES (?, ?, ?, ?)", rows
+            )
+            self._size += self._connection.total_changes - before
+            if self._size > self.max_entries:
+                self._evict(self._size - self.max_entries)
+
+    def entries(self) -> list[tuple[str, str, str, str | None]]:
+        """Return all cached entries as (table, code, date, payload) tuples."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT rate_table, code, date, payload FROM rates ORDER BY rowid"
+            ).fetchall()
+
+    def _evict(self, count: int) -> None:
+        """Remove count oldest entries."""
+        self._connection.execute(
+            "DELETE FROM rates WHERE rowid IN "
+            "(SELECT rowid FROM rates ORDER BY rowid LIMIT ?)",
+            (count,),
+        )
+        self._size -= count
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM rates")
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return cache statistics."""
+        return {"hits": self.hits, "misses": self.misses, "size": self._size}
+
+    def close(self) -> None:
+        """Close connection to sqlite file."""
+        self._connection.close()
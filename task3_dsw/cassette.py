@@ -0,0 +1,154 @@
+"""Transport recording responses of NBP api to cassette file and replaying them."""
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+
+import httpx
+
+from task3_dsw.database import atomic_open
+from task3_dsw.logger import logger
+
+__all__ = ["MODES", "CassetteTransport"]
+
+MODES = ("record", "replay")
+VERSION = 1
+
+
+class CassetteTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Transport serving responses saved in cassette file.
+
+    In record mode requests are sent through inner transport and responses
+    are kept in memory until transport is closed, which writes them to
+    cassette once. In replay mode responses are served from cassette
+    without network. Requests are matched by method, path and query,
+    host is ignored.
+    Same instance can be used by sync and async clients.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        mode: str = "replay",
+        transport: httpx.BaseTransport | None = None,
+        async_transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """
+        Initialize CassetteTransport.
+
+        Args:
+        ----
+            path: path to cassette file, created in record mode if missing
+            mode: "record" or "replay"
+            transport: transport sending requests in record mode
+            async_transport: transport sending async requests in record mode
+
+        Raises:
+        ------
+            ValueError: if mode is unknown or cassette is not valid
+            FileNotFoundError: if cassette is missing in replay mode
+        """
+        if mode not in MODES:
+            msg = f"Unknown cassette mode {mode}, expected one of {', '.join(MODES)}."
+            raise ValueError(msg)
+        self.path = Path(path)
+        self.mode = mode
+        self._transport = transport
+        self._async_transport = async_transport
+        self._lock = threading.Lock()
+        self.interactions: dict[str, dict] = {}
+        self._unsaved = False
+        if mode == "replay" or self.path.exists():
+            self.interactions = self._read()
+
+    def _read(self) -> dict[str, dict]:
+        """Read interactions from cassette file."""
+        try:
+            cassette = json.loads(self.path.read_bytes())
+            if cassette["version"] != VERSION:
+                raise ValueError  # noqa: TRY301
+            return dict(cassette["interactions"])
+        except (KeyError, TypeError, ValueError) as e:
+            msg = f"{self.path} is not a cassette of version {VERSION}."
+            raise ValueError(msg) from e
+
+    def save(self) -> None:
+        """Write recorded interactions to cassette file."""
+        with self._lock:
+            data = {"version": VERSION, "interactions": self.interactions}
+            with atomic_open(self.path, "w") as f:
+                json.dump(data, f, indent=4, sort_keys=True)
+            self._unsaved = False
+
+    @staticmethod
+    def _key(request: httpx.Request) -> str:
+        """Return key of request in cassette."""
+        return f"{request.method} {request.url.raw_path.decode('ascii')}"
+
+    def _replay(self, request: httpx.Request) -> httpx.Response:
+        """Return response saved for request."""
+        interaction = self.interactions.get(self._key(request))
+        if interaction is None:
+            msg = f"Request {self._key(request)} is not recorded in {self.path}."
+            raise httpx.TransportError(msg, request=request)
+        return httpx.Response(
+            interaction["status"],
+            headers={"Content-Type": interaction["content_type"]},
+            content=interaction["body"].encode(),
+            request=request,
+        )
+
+    def _record(self, request: httpx.Request, response: httpx.Response) -> None:
+        """Keep read response until cassette is saved."""
+        with self._lock:
+            self.interactions[self._key(request)] = {
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", ""),
+                "body": response.text,
+            }
+            self._unsaved = True
+        logger.debug("Recorded %s for %s", self._key(request), self.path)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Send request through inner transport or replay it."""
+        if self.mode == "record":
+            if self._transport is None:
+                self._transport = httpx.HTTPTransport()
+            response = self._transport.handle_request(request)
+            try:
+                response.read()
+            finally:
+                response.close()
+            self._record(request, response)
+        return self._replay(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send async request through inner transport or replay it."""
+        if self.mode == "record":
+            if self._async_transport is None:
+                self._async_transport = httpx.AsyncHTTPTransport()
+            response = await self._async_transport.handle_async_request(request)
+            try:
+                await response.aread()
+            finally:
+                await response.aclose()
+            self._record(request, response)
+        return self._replay(request)
+
+    def close(self) -> None:
+        """Save recorded responses and close inner sync transport."""
+        if self._unsaved:
+            self.save()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def aclose(self) -> None:
+        """Save recorded responses and close inner async transport."""
+        if self._unsaved:
+            self.save()
+        if self._async_transport is not None:
+            await self._async_transport.aclose()
+            self._async_transport = None
@@ -0,0 +1,293 @@
+"""Compact in-memory ledger of invoices stored in parallel array columns."""
+from __future__ import annotations
+
+import datetime
+import math
+from array import array
+from typing import TYPE_CHECKING
+
+from task3_dsw.database import Invoice, InvoiceStatus, Payment
+from task3_dsw.streaming import InvoiceWriter, iter_invoices
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from pathlib import Path
+
+    from task3_dsw.nbp_api import ExchangeRateSchemaResponse
+
+__all__ = ["CompactLedger"]
+
+STATUSES = list(InvoiceStatus)
+HASH_SIZE = 32
+NO_HASH = bytes(HASH_SIZE)
+NO_RATE = -1
+
+
+class _StringColumn:
+    """Append-only column of strings stored back to back in one buffer."""
+
+    __slots__ = ("_data", "_offsets")
+
+    def __init__(self) -> None:
+        """Initialize _StringColumn."""
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+
+    def append(self, value: str) -> None:
+        """Append string to column."""
+        self._data += value.encode()
+        self._offsets.append(len(self._data))
+
+    def __getitem__(self, index: int) -> str:
+        """Return string at index."""
+        return self._data[self._offsets[index] : self._offsets[index + 1]].decode()
+
+
+class _HashColumn:
+    """Column of sha256 hex digests stored as raw bytes, None as zero bytes."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self) -> None:
+        """Initialize _HashColumn."""
+        self._data = bytearray()
+
+    def append(self, value: str | None) -> None:
+        """Append hash to column."""
+        self._data += NO_HASH
+        self[len(self._data) // HASH_SIZE - 1] = value
+
+    def __getitem__(self, index: int) -> str | None:
+        """Return hash at index."""
+        raw = bytes(self._data[index * HASH_SIZE : (index + 1) * HASH_SIZE])
+        return raw.hex() if raw != NO_HASH else None
+
+    def __setitem__(self, index: int, value: str | None) -> None:
+        """Replace hash at index, hash which is not a sha256 digest is dropped."""
+        try:
+            raw = bytes.fromhex(value) if value else NO_HASH
+        except ValueError:
+            raw = NO_HASH
+        if len(raw) != HASH_SIZE:
+            raw = NO_HASH
+        self._data[index * HASH_SIZE : (index + 1) * HASH_SIZE] = raw
+
+
+class _Records:
+    """Columns shared by invoices and payments."""
+
+    __slots__ = ("ids", "amounts", "currencies", "dates", "rates", "hashes")
+
+    def __init__(self) -> None:
+        """Initialize _Records."""
+        self.ids = _StringColumn()
+        self.amounts = array("d")
+        self.currencies = array("B")
+        self.dates = array("l")
+        self.rates = array("l")
+        self.hashes = _HashColumn()
+
+
+class CompactLedger:
+    """
+    Invoices and payments kept in parallel array columns.
+
+    Memory used per payment is a few dozen bytes instead of a tree of
+    pydantic models. Invoices are validated when loaded and materialized
+    as models one at a time, so calculations work on regular Invoice objects.
+    Exchange rates are interned, payments sharing a rate keep one response.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty CompactLedger."""
+        self._codes: list[str] = []
+        self._code_index: dict[str, int] = {}
+        self._responses: list[ExchangeRateSchemaResponse] = []
+        self._response_index: dict[tuple, int] = {}
+        self._invoices = _Records()
+        self._statuses = array("B")
+        self._offsets = array("Q", [0])
+        self._payments = _Records()
+        self._differences = array("d")
+
+    @classmethod
+    def from_invoices(cls, invoices: Iterable[Invoice]) -> CompactLedger:
+        """
+        Build ledger from invoices.
+
+        Args:
+        ----
+            invoices: iterable of invoices, consumed one at a time
+
+        Returns:
+        -------
+            CompactLedger
+        """
+        ledger = cls()
+        for invoice in invoices:
+            ledger.append(invoice)
+        return ledger
+
+    @classmethod
+    def load(cls, filename: str | Path) -> CompactLedger:
+        """
+        Load and validate json database file without keeping its models.
+
+        Args:
+        ----
+            filename: path to json database file
+
+        Returns:
+        -------
+            CompactLedger
+        """
+        return cls.from_invoices(iter_invoices(filename))
+
+    def save(self, filename: str | Path, codec: str = "compact") -> None:
+        """
+        Save ledger to json database file, same as Database.save.
+
+        Args:
+        ----
+            filename: path to output file
+            codec: codec of output file, one of database.CODECS
+        """
+        with InvoiceWriter(filename, codec) as writer:
+            for invoice in self:
+                writer.write(invoice)
+
+    def __len__(self) -> int:
+        """Return number of invoices."""
+        return len(self._statuses)
+
+    def __iter__(self) -> Iterator[Invoice]:
+        """Iterate over invoices materialized one at a time."""
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def payment_count(self) -> int:
+        """Return number of payments."""
+        return len(self._differences)
+
+    def append(self, invoice: Invoice) -> None:
+        """
+        Append invoice with its payments.
+
+        Args:
+        ----
+            invoice: Invoice
+        """
+        self._invoices.ids.append(invoice.id)
+        self._append_record(self._invoices, invoice)
+        self._statuses.append(STATUSES.index(InvoiceStatus(invoice.status)))
+        for payment in invoice.payments:
+            self._payments.ids.append(payment.id)
+            self._append_record(self._payments, payment)
+            self._differences.append(_from_optional(payment.exchange_rate_difference))
+        self._offsets.append(len(self._differences))
+
+    def __getitem__(self, index: int) -> Invoice:
+        """Return invoice at index as model."""
+        invoices = self._invoices
+        payments = self._payments
+        return Invoice.model_construct(
+            id=invoices.ids[index],
+            amount=invoices.amounts[index],
+            currency=self._codes[invoices.currencies[index]],
+            date=datetime.date.fromordinal(invoices.dates[index]),
+            status=STATUSES[self._statuses[index]],
+            exchange_rate=self._response(invoices.rates[index]),
+            payments=[
+                Payment.model_construct(
+                    id=payments.ids[position],
+                    amount=payments.amounts[position],
+                    currency=self._codes[payments.currencies[position]],
+                    date=datetime.date.fromordinal(payments.dates[position]),
+                    exchange_rate=self._response(payments.rates[position]),
+                    exchange_rate_difference=_to_optional(self._differences[position]),
+                    input_hash=payments.hashes[position],
+                )
+                for position in range(self._offsets[index], self._offsets[index + 1])
+            ],
+            input_hash=invoices.hashes[index],
+        )
+
+    def __setitem__(self, index: int, invoice: Invoice) -> None:
+        """
+        Store calculated fields of invoice at index.
+
+        Raises
+        ------
+            ValueError: if invoice is another invoice or its payments changed
+        """
+        start, end = self._offsets[index], self._offsets[index + 1]
+        if (
+            invoice.id != self._invoices.ids[index]
+            or len(invoice.payments) != end - start
+        ):
+            msg = f"Invoice {invoice.id} does not match invoice at index {index}."
+            raise ValueError(msg)
+        self._set_record(self._invoices, index, invoice)
+        self._statuses[index] = STATUSES.index(InvoiceStatus(invoice.status))
+        for position, payment in enumerate(invoice.payments, start=start):
+            self._set_record(self._payments, position, payment)
+            self._differences[position] = _from_optional(
+                payment.exchange_rate_difference
+            )
+
+    def _append_record(self, records: _Records, record: Invoice | Payment) -> None:
+        """Append fields shared by invoices and payments."""
+        records.amounts.append(record.amount)
+        records.currencies.append(self._code(record.currency))
+        records.dates.append(record.date.toordinal())
+        records.rates.append(self._intern(record.exchange_rate))
+        records.hashes.append(record.input_hash)
+
+    def _set_record(
+        self, records: _Records, index: int, record: Invoice | Payment
+    ) -> None:
+        """Replace fields shared by invoices and payments."""
+        records.amounts[index] = record.amount
+        records.currencies[index] = self._code(record.currency)
+        records.dates[index] = record.date.toordinal()
+        records.rates[index] = self._intern(record.exchange_rate)
+        records.hashes[index] = record.input_hash
+
+    def _code(self, currency: str) -> int:
+        """Return index of currency code."""
+        index = self._code_index.get(currency)
+        if index is None:
+            index = self._code_index[currency] = len(self._codes)
+            self._codes.append(currency)
+        return index
+
+    def _intern(self, response: ExchangeRateSchemaResponse | None) -> int:
+        """Return index of exchange rate response, adding it if new."""
+        if response is None:
+            return NO_RATE
+        key = (
+            response.table,
+            response.currency,
+            response.code,
+            tuple((rate.no, rate.effectiveDate, rate.mid) for rate in response.rates),
+        )
+        index = self._response_index.get(key)
+        if index is None:
+            index = self._response_index[key] = len(self._responses)
+            self._responses.append(response)
+        return index
+
+    def _response(self, index: int) -> ExchangeRateSchemaResponse | None:
+        """Return interned exchange rate response."""
+        return self._responses[index] if index != NO_RATE else None
+
+
+def _from_optional(value: float | None) -> float:
+    """Store None as nan in float column."""
+    return math.nan if value is None else value
+
+
+def _to_optional(value: float) -> float | None:
+    """Read nan from float column as None."""
+    return None if math.isnan(value) else value
@@ -1,14 +1,27 @@
 """Database module."""
 from __future__ import annotations
 
+import abc
+import contextlib
 import datetime  # noqa: TCH003
 import enum
+import gc
+import gzip
+import hashlib
 import json
+import lzma
+import os
+import stat
+import tempfile
+import uuid
+import zlib
 from pathlib import Path
+from typing import IO, TYPE_CHECKING
 
 from pydantic import BaseModel, Field, ValidationError, field_validator
 
 from task3_dsw.logger import logger
+from task3_dsw.metrics import metrics
 from task3_dsw.nbp_api import (
     ExchangeRateSchema,
     ExchangeRateSchemaResponse,
@@ -16,9 +29,213 @@ from task3_dsw.nbp_api import (
     NBPApiError,
 )
 from task3_dsw.settings import (
+    DATABASE_CODECS,
     Settings,
     settings,
 )
+from task3_dsw.tracing import tracer
+from task3_dsw.wal import WriteAheadLog
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from task3_dsw.snapshot import Snapshot
+
+# Codecs of json database file. Compressed files hold compact json and are
+# recognised on load by their magic bytes, layout of json needs no detection.
+CODECS = DATABASE_CODECS
+CODEC_SUFFIXES = {".gz": "gzip", ".xz": "lzma"}
+GZIP_MAGIC = b"\x1f\x8b"
+LZMA_MAGIC = b"\xfd7zXZ\x00"
+GZIP_LEVEL = 6
+# Higher presets shrink files a little more at many times the cost
+LZMA_PRESET = 1
+# Errors of reading truncated or corrupt compressed file, BadGzipFile is an OSError
+DECOMPRESSION_ERRORS = (EOFError, OSError, lzma.LZMAError, zlib.error)
+
+
+# Permission bits masked out of new files, read once as os.umask can only be swapped
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@contextlib.contextmanager
+def atomic_open(filename: str | Path, mode: str = "w") -> Iterator[IO]:
+    """
+    Open temporary file which replaces filename once it is closed.
+
+    Data is flushed to disk before the rename and the directory after it, so
+    a crash leaves either the old or the new file, never a half-written one.
+    Replaced file keeps its permissions, new file gets those of umask.
+
+    Args:
+    ----
+        filename: path of file to write
+        mode: "w" for text or "wb" for binary file
+
+    Yields:
+    ------
+        file object of temporary file
+    """
+    path = Path(filename)
+    f = tempfile.NamedTemporaryFile(
+        mode, dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    )
+    try:
+        with f:
+            yield f
+            f.flush()
+            # Temporary file is private, replaced file keeps its permissions
+            try:
+                file_mode = stat.S_IMODE(path.stat().st_mode)
+            except FileNotFoundError:
+                file_mode = 0o666 & ~UMASK
+            Path(f.name).chmod(file_mode)
+            os.fsync(f.fileno())
+        Path(f.name).replace(path)
+    except BaseException:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+    fsync_directory(path.parent)
+
+
+def fsync_directory(path: str | Path) -> None:
+    """Flush directory entries to disk, so a rename in it survives a crash."""
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def paused_gc() -> Iterator[None]:
+    """
+    Pause cyclic garbage collector while a database is built.
+
+    Collector runs after every few hundred new objects and, as they pile up,
+    walks the whole heap, so loading a large file spent most of its time
+    there. Loaded models have no reference cycles, so nothing is missed.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def file_codec(filename: str | Path, codec: str) -> str:
+    """
+    Return codec of json database file.
+
+    Args:
+    ----
+        filename: path to json database file
+        codec: codec used unless suffix of filename names a compression
+
+    Returns:
+    -------
+        str: one of CODECS
+
+    Raises:
+    ------
+        ValueError: if codec is not known
+    """
+    codec = CODEC_SUFFIXES.get(Path(filename).suffix, codec)
+    if codec not in CODECS:
+        msg = f"Codec {codec} is not one of {', '.join(CODECS)}."
+        raise ValueError(msg)
+    return codec
+
+
+@contextlib.contextmanager
+def open_data_writer(filename: str | Path, codec: str) -> Iterator[IO[bytes]]:
+    """
+    Open binary file which replaces filename once closed, compressed by codec.
+
+    Args:
+    ----
+        filename: path of json database file
+        codec: one of CODECS
+
+    Yields:
+    ------
+        binary file object
+    """
+    with atomic_open(filename, "wb") as f:
+        if codec == "gzip":
+            # No name and time in header, same data gives the same file
+            with gzip.GzipFile(
+                filename="", mode="wb", fileobj=f, compresslevel=GZIP_LEVEL, mtime=0
+            ) as compressed:
+                yield compressed
+        elif codec == "lzma":
+            with lzma.LZMAFile(f, "wb", preset=LZMA_PRESET) as compressed:
+                yield compressed
+        else:
+            yield f
+
+
+def open_data_reader(filename: str | Path) -> IO[str]:
+    """
+    Open json database file for reading text, decompressing it if needed.
+
+    Args:
+    ----
+        filename: path of json database file
+
+    Returns:
+    -------
+        text file object
+    """
+    path = Path(filename)
+    with path.open("rb") as f:
+        magic = f.read(len(LZMA_MAGIC))
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if magic.startswith(LZMA_MAGIC):
+        return lzma.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+def encode_data(data: DataSchema, codec: str) -> bytes:
+    """Return json of data in layout of codec, before compression."""
+    if codec == "pretty":
+        return data.model_dump_json(indent=4).encode()
+    return data.model_dump_json().encode()
+
+
+def decode_data(raw: bytes) -> bytes:
+    """Return json of file content, decompressed if it is compressed."""
+    if raw.startswith(GZIP_MAGIC):
+        return gzip.decompress(raw)
+    if raw.startswith(LZMA_MAGIC):
+        return lzma.decompress(raw)
+    return raw
+
+
+def new_id() -> str:
+    """Return new unique id of invoice or payment."""
+    return str(uuid.uuid4())
+
+
+def content_hash(*values: object) -> str:
+    """Return hash of json representation of values."""
+    raw = json.dumps(values, separators=(",", ":"), sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _stat(path: Path) -> tuple[int, int] | None:
+    """Return modification time in ns and size of file, None if it does not exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
 
 class InvoiceStatus(str, enum.Enum):
@@ -32,11 +249,13 @@ class InvoiceStatus(str, enum.Enum):
 class AddPayment(BaseModel):
     """Add payment model."""
 
+    id: str = Field(default_factory=new_id)
     amount: float
     currency: str
     date: datetime.date
     exchange_rate: ExchangeRateSchemaResponse = None
     exchange_rate_difference: float = Field(default=0.0)
+    input_hash: str | None = None
 
     @field_validator("currency")
     def currency_is_valid(cls, v) -> str:  # noqa: N805, ANN001
@@ -50,11 +269,13 @@ class AddPayment(BaseModel):
 class Payment(BaseModel):
     """Payment model."""
 
+    id: str = Field(default_factory=new_id)
     amount: float
     currency: str
     date: datetime.date
     exchange_rate: ExchangeRateSchemaResponse | None
     exchange_rate_difference: float | None
+    input_hash: str | None = None
 
     def __str__(self) -> str:
         """Return string representation of payment."""
@@ -64,12 +285,14 @@ class Payment(BaseModel):
 class AddInvoice(BaseModel):
     """Add invoice model."""
 
+    id: str = Field(default_factory=new_id)
     amount: float
     currency: str
     date: datetime.date
     status: InvoiceStatus = InvoiceStatus.UNPAID
     exchange_rate: ExchangeRateSchemaResponse = None
     payments: list[Payment] = []
+    input_hash: str | None = None
 
     @field_validator("currency")
     def currency_is_valid(cls, v) -> str:  # noqa: N805, ANN001
@@ -83,12 +306,14 @@ class AddInvoice(BaseModel):
 class Invoice(BaseModel):
     """Invoice model."""
 
+    id: str = Field(default_factory=new_id)
     amount: float
     currency: str
     date: datetime.date
     status: InvoiceStatus
     exchange_rate: ExchangeRateSchemaResponse | None
     payments: list[Payment]
+    input_hash: str | None = None
 
     def __str__(self) -> str:
         """Return string representation of invoice."""
@@ -115,32 +340,259 @@ class Database:
         self.data = DataSchema(invoices=[])
         self.nbp_api_client = nbp_api_client
         self.output_file = output_file
+        # Maps from ids to positions, rebuilt when invoices list is replaced
+        self._invoice_positions: dict[str, int] = {}
+        self._payment_positions: dict[str, tuple[int, int]] = {}
+        self._indexed_invoices: list[Invoice] | None = None
+        # Ids of invoices changed since last commit, in order of change
+        self._pending: dict[str, None] = {}
+        self.wal = WriteAheadLog(f"{settings.DATABASE_PATH}.wal")
+        # Stats of database file and log with digest of file, set by load and save
+        self._file_state: tuple[tuple, str | None] | None = None
+
+    def _build_positions(self) -> None:
+        """Rebuild maps from ids to positions of invoices and payments."""
+        invoices = self.data.invoices
+        self._invoice_positions = {
+            invoice.id: invoice_index for invoice_index, invoice in enumerate(invoices)
+        }
+        self._payment_positions = {
+            payment.id: (invoice_index, payment_index)
+            for invoice_index, invoice in enumerate(invoices)
+            for payment_index, payment in enumerate(invoice.payments)
+        }
+        self._indexed_invoices = invoices
 
-    def load(self) -> None:
+    def _invoice_position(self, invoice: Invoice) -> int:
         """
-        Load data from json file.
+        Return position of invoice in database.
 
         Raises
         ------
-            FileNotFoundError: if file not found
-            JSONDecodeError: if json file is not valid
-            ValidationError: if json file is not valid
+            ValueError: if invoice is not in database
+        """
+        invoices = self.data.invoices
+        position = self._invoice_positions.get(invoice.id)
+        if (
+            invoices is not self._indexed_invoices
+            or position is None
+            or position >= len(invoices)
+            or invoices[position].id != invoice.id
+        ):
+            self._build_positions()
+            position = self._invoice_positions.get(invoice.id)
+        if position is None:
+            msg = f"Invoice {invoice.id} is not in database."
+            raise ValueError(msg)
+        return position
+
+    def _payment_position(self, invoice_index: int, payment: Payment) -> int:
         """
+        Return position of payment in payments of invoice.
+
+        Raises
+        ------
+            ValueError: if payment is not in payments of invoice
+        """
+        payments = self.data.invoices[invoice_index].payments
+        position = self._payment_positions.get(payment.id)
+        if (
+            self.data.invoices is not self._indexed_invoices
+            or position is None
+            or position[0] != invoice_index
+            or position[1] >= len(payments)
+            or payments[position[1]].id != payment.id
+        ):
+            self._build_positions()
+            position = self._payment_positions.get(payment.id)
+        if position is None or position[0] != invoice_index:
+            msg = f"Payment {payment.id} is not in database."
+            raise ValueError(msg)
+        return position[1]
+
+    @metrics.timed("database_load_seconds")
+    @tracer.traced("database.load")
+    def load(self) -> bool:
+        """
+        Load data from json file, creating empty database if file not found.
+
+        Returns
+        -------
+            bool: False if file is not valid, it is logged and data is kept
+        """
+        # Stats taken before reading, so changes made meanwhile are seen by refresh
+        stats = self._file_stats()
         try:
-            with Path.open(self.settings.DATABASE_PATH, "r") as f:
-                logger.debug("Load data from json file")
-                self.data = DataSchema(**json.load(f))
+            content = Path(self.settings.DATABASE_PATH).read_bytes()
+            raw = decode_data(content)
+            logger.debug("Load data from json file")
+            # Parsing and validation in one pass of pydantic-core
+            with paused_gc():
+                self.data = DataSchema.model_validate_json(raw)
         except FileNotFoundError:
             self.data = DataSchema(invoices=[])
+            self._replay_wal()
             self.save()
-        except (json.decoder.JSONDecodeError, TypeError, ValidationError) as e:
+            return True
+        except ValidationError as e:
             logger.error(e)
+            return False
+        except DECOMPRESSION_ERRORS as e:
+            logger.error("Cannot read %s: %s", self.settings.DATABASE_PATH, e)
+            return False
+        self._replay_wal()
+        self._file_state = (stats, hashlib.sha256(content).hexdigest())
+        return True
 
+    @metrics.timed("database_save_seconds")
+    @tracer.traced("database.save")
     def save(self) -> None:
-        """Save data to json file."""
+        """Save data to json file atomically, in codec of the file."""
         filename = self.output_file or self.settings.DATABASE_PATH
-        with Path.open(filename, "w") as f:
-            f.write(self.data.model_dump_json(indent=4))
+        codec = file_codec(filename, self.settings.DATABASE_CODEC)
+        with open_data_writer(filename, codec) as f:
+            f.write(encode_data(self.data, codec))
+        if self.settings.DATABASE_SNAPSHOT and Path(filename) == Path(
+            self.settings.DATABASE_PATH
+        ):
+            from task3_dsw.snapshot import write_snapshot
+
+            write_snapshot(self.snapshot_path, self.data.invoices, filename)
+        self._wal_saved(filename)
+
+    @property
+    def snapshot_path(self) -> Path:
+        """Return path of binary snapshot written next to database file."""
+        return Path(f"{self.settings.DATABASE_PATH}.snap")
+
+    def has_wal_records(self) -> bool:
+        """Return True if write-ahead log holds changes not saved in database file."""
+        wal_path = self.wal.path
+        return wal_path.exists() and wal_path.stat().st_size > 0
+
+    def open_snapshot(self) -> Snapshot | None:
+        """
+        Open snapshot of database file without loading it.
+
+        Returns
+        -------
+            Snapshot or None if there is no snapshot up to date with
+            database file and write-ahead log
+        """
+        if self.has_wal_records():
+            return None
+        from task3_dsw.snapshot import Snapshot
+
+        return Snapshot.open(self.snapshot_path, self.settings.DATABASE_PATH)
+
+    def commit(self) -> None:
+        """
+        Append invoices changed since last commit to write-ahead log.
+
+        Database file is saved only when log has WAL_CHECKPOINT_INTERVAL
+        records, so a single change costs one small fsynced append.
+        """
+        records = []
+        for invoice_id in self._pending:
+            invoice = self.get_invoice_by_id(invoice_id)
+            if invoice is not None:
+                records.append(invoice.model_dump_json())
+        self.wal.append(records)
+        self._pending.clear()
+        if len(self.wal) >= self.settings.WAL_CHECKPOINT_INTERVAL:
+            logger.debug("Checkpoint write-ahead log %s", self.wal.path)
+            self.save()
+        if self._file_state is not None:
+            # Own append to the log is already in memory
+            self._file_state = (self._file_stats(), self._file_state[1])
+
+    def refresh(self) -> bool:
+        """
+        Load database again only if its file or write-ahead log changed on disk.
+
+        Files are compared by modification time and size with their state after
+        last load, commit or save. Database file touched without change of
+        content is recognised by its digest and is not loaded again.
+
+        Returns
+        -------
+            bool: True if database was loaded
+        """
+        stats = self._file_stats()
+        if self._file_state is not None:
+            known_stats, known_digest = self._file_state
+            if stats == known_stats:
+                return False
+            if stats[1] == known_stats[1]:
+                digest = self._file_digest()
+                if digest == known_digest:
+                    self._file_state = (stats, digest)
+                    return False
+        self.load()
+        return True
+
+    def _file_stats(self) -> tuple[tuple[int, int] | None, tuple[int, int] | None]:
+        """Return modification time and size of database file and write-ahead log."""
+        return (_stat(Path(self.settings.DATABASE_PATH)), _stat(self.wal.path))
+
+    def _file_digest(self) -> str | None:
+        """Return digest of database file or None if it does not exist."""
+        try:
+            with Path(self.settings.DATABASE_PATH).open("rb") as f:
+                return hashlib.file_digest(f, "sha256").hexdigest()
+        except FileNotFoundError:
+            return None
+
+    def _remember_files(self) -> None:
+        """Remember state of database file and write-ahead log for refresh."""
+        self._file_state = (self._file_stats(), self._file_digest())
+
+    def mark_changed(self, invoice: Invoice) -> None:
+        """
+        Remember invoice changed outside of database methods.
+
+        Args:
+        ----
+            invoice: Invoice changed in place
+        """
+        self._pending[invoice.id] = None
+
+    def discard_changes(self) -> None:
+        """Forget invoices changed since last commit, saved by caller elsewhere."""
+        self._pending.clear()
+
+    def _replay_wal(self) -> None:
+        """Apply invoices logged in write-ahead log after last save."""
+        records = self.wal.read()
+        if records:
+            logger.debug("Replay %s records of %s", len(records), self.wal.path)
+        for record in records:
+            self._restore_invoice(Invoice.model_validate_json(record))
+
+    def _restore_invoice(self, invoice: Invoice) -> int:
+        """
+        Put logged version of invoice in place of the loaded one.
+
+        Returns
+        -------
+            int: position of invoice
+        """
+        if self.get_invoice_by_id(invoice.id) is None:
+            self.add_invoice(invoice)
+            self._pending.pop(invoice.id, None)
+            return len(self.data.invoices) - 1
+        position = self._invoice_positions[invoice.id]
+        self.data.invoices[position] = invoice
+        for payment_index, payment in enumerate(invoice.payments):
+            self._payment_positions[payment.id] = (position, payment_index)
+        return position
+
+    def _wal_saved(self, filename: str | Path) -> None:
+        """Clear write-ahead log once database file holds all its records."""
+        if Path(filename) == Path(self.settings.DATABASE_PATH):
+            self._pending.clear()
+            self.wal.clear()
+            self._remember_files()
 
     def add_invoice(self, invoice: AddInvoice) -> Invoice:
         """
@@ -148,15 +600,49 @@ class Database:
 
         Args:
         ----
-            invoice: Invoice
+            invoice: Invoice, or AddInvoice stored as Invoice
 
         Returns:
         -------
-            Invoice
+            Invoice stored in database
+
+        Raises:
+        ------
+            ValueError: if invoice with the same id is in database
         """
+        if self.get_invoice_by_id(invoice.id) is not None:
+            msg = f"Invoice {invoice.id} is already in database."
+            raise ValueError(msg)
+        if not isinstance(invoice, Invoice):
+            invoice = Invoice.model_validate(invoice.model_dump())
         self.data.invoices.append(invoice)
+        self._pending[invoice.id] = None
+        if self.data.invoices is self._indexed_invoices:
+            invoice_index = len(self.data.invoices) - 1
+            self._invoice_positions[invoice.id] = invoice_index
+            for payment_index, payment in enumerate(invoice.payments):
+                self._payment_positions[payment.id] = (invoice_index, payment_index)
         return invoice
 
+    def get_invoice_by_id(self, invoice_id: str) -> Invoice | None:
+        """
+        Get invoice from database by id.
+
+        Args:
+        ----
+            invoice_id: str
+
+        Returns:
+        -------
+            Invoice or None if invoice not exists
+        """
+        if self.data.invoices is not self._indexed_invoices:
+            self._build_positions()
+        invoice_index = self._invoice_positions.get(invoice_id)
+        if invoice_index is None:
+            return None
+        return self.data.invoices[invoice_index]
+
     def add_payment(self, invoice: Invoice, payment: Payment) -> Payment:
         """
         Add payment to database.
@@ -164,14 +650,19 @@ class Database:
         Args:
         ----
             invoice: Invoice
-            payment: Payment
+            payment: Payment, or AddPayment stored as Payment
 
         Returns:
         -------
-            Payment
+            Payment stored in database
         """
-        invoice_index = self.data.invoices.index(invoice)
-        self.data.invoices[invoice_index].payments.append(payment)
+        if not isinstance(payment, Payment):
+            payment = Payment.model_validate(payment.model_dump())
+        invoice_index = self._invoice_position(invoice)
+        payments = self.data.invoices[invoice_index].payments
+        payments.append(payment)
+        self._payment_positions[payment.id] = (invoice_index, len(payments) - 1)
+        self._pending[self.data.invoices[invoice_index].id] = None
         return payment
 
     def get_invoice(self, invoice_index: int) -> Invoice:
@@ -215,7 +706,7 @@ class Database:
             Payment
         """
         try:
-            return self.data.invoices[self.data.invoices.index(invoice)].payments[
+            return self.data.invoices[self._invoice_position(invoice)].payments[
                 payment_index
             ]
         except IndexError:
@@ -251,11 +742,60 @@ class Database:
             list[Payment]
         """
         try:
-            return self.data.invoices[self.data.invoices.index(invoice)].payments
+            return self.data.invoices[self._invoice_position(invoice)].payments
         except (ValueError, IndexError) as e:
             logger.error(f"Invoice not found. {e}")
             return None
 
+    @staticmethod
+    def payment_input_hash(invoice: Invoice, payment: Payment) -> str:
+        """
+        Return hash of inputs of payment calculation and exchange rate used.
+
+        Args:
+        ----
+            invoice: Invoice of payment
+            payment: Payment
+
+        Returns:
+        -------
+            str: hex digest
+        """
+        exchange_rate = payment.exchange_rate
+        return content_hash(
+            invoice.amount,
+            invoice.currency,
+            invoice.date,
+            payment.amount,
+            payment.currency,
+            payment.date,
+            exchange_rate.model_dump(mode="json") if exchange_rate else None,
+        )
+
+    @classmethod
+    def invoice_input_hash(cls, invoice: Invoice) -> str:
+        """
+        Return hash of inputs of invoice calculation and exchange rates used.
+
+        Args:
+        ----
+            invoice: Invoice
+
+        Returns:
+        -------
+            str: hex digest
+        """
+        exchange_rate = invoice.exchange_rate
+        return content_hash(
+            invoice.amount,
+            invoice.currency,
+            invoice.date,
+            exchange_rate.model_dump(mode="json") if exchange_rate else None,
+            [cls.payment_input_hash(invoice, payment) for payment in invoice.payments],
+        )
+
+    @metrics.timed("calculate_payments_seconds")
+    @tracer.traced("database.calculate_payments")
     def calulate_payments_for_invoice(
         self, invoice: Invoice
     ) -> tuple[int, float, InvoiceStatus]:
@@ -272,7 +812,8 @@ class Database:
             tuple[sum_of_payments(int), invoice_amount(float), InvoiceStatus]
         """
         try:
-            invoice_index = self.data.invoices.index(invoice)
+            invoice_index = self._invoice_position(invoice)
+            self._pending[self.data.invoices[invoice_index].id] = None
             invoice_amount = invoice.amount
             if invoice.currency != "PLN":
                 invoice_exchange_rate = self.nbp_api_client.get_exchange_rate(
@@ -318,6 +859,8 @@ class Database:
             logger.error(f"Invoice not found. {e}")
             return None
 
+    @metrics.timed("calculate_difference_seconds")
+    @tracer.traced("database.calculate_difference")
     def calculate_difference(
         self, invoice: Invoice, payment: Payment
     ) -> tuple[ExchangeRateSchemaResponse, ExchangeRateSchemaResponse, float]:
@@ -334,8 +877,9 @@ class Database:
             tuple[ExchangeRateSchemaResponse, ExchangeRateSchemaResponse, float]
         """
         try:
-            invoice_index = self.data.invoices.index(invoice)
-            payment_index = self.data.invoices[invoice_index].payments.index(payment)
+            invoice_index = self._invoice_position(invoice)
+            payment_index = self._payment_position(invoice_index, payment)
+            self._pending[self.data.invoices[invoice_index].id] = None
 
             exchange_rate_difference = 0
             invoice_exchange_rate = None
@@ -404,3 +948,86 @@ class Database:
             raise NBPApiError(e) from e
         else:
             return rounded_exchange_rate_difference
+
+
+class TrackedDatabase(Database, abc.ABC):
+    """
+    Database which saves only invoices changed since load.
+
+    Subclasses write invoices with numbers collected in _dirty.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        nbp_api_client: NBPApiClient,
+        output_file: str | None = None,
+    ) -> None:
+        """Initialize TrackedDatabase."""
+        super().__init__(settings, nbp_api_client, output_file)
+        self._dirty: set[int] = set()
+        self._loaded_data = self.data
+
+    def _mark_loaded(self) -> None:
+        """Remember data as saved, nothing is changed yet."""
+        self._loaded_data = self.data
+        self._dirty.clear()
+
+    def _needs_full_write(self, filename: str | Path) -> bool:
+        """Return True if all invoices must be written to filename."""
+        return (
+            Path(filename) != Path(self.settings.DATABASE_PATH)
+            or self.data is not self._loaded_data
+            or not Path(filename).exists()
+        )
+
+    def mark_changed(self, invoice: Invoice) -> None:
+        """Remember invoice changed outside of database methods."""
+        super().mark_changed(invoice)
+        self._dirty.add(self._invoice_position(invoice))
+
+    def _restore_invoice(self, invoice: Invoice) -> int:
+        """Put logged version of invoice in place and mark it as changed."""
+        position = super()._restore_invoice(invoice)
+        self._dirty.add(position)
+        return position
+
+    @abc.abstractmethod
+    def compact(self) -> int:
+        """
+        Reclaim space left by old versions of invoices.
+
+        Returns
+        -------
+            int: number of bytes reclaimed
+        """
+
+    def add_invoice(self, invoice: AddInvoice) -> Invoice:
+        """Add invoice to database and mark it as changed."""
+        invoice = super().add_invoice(invoice)
+        self._dirty.add(len(self.data.invoices) - 1)
+        return invoice
+
+    def add_payment(self, invoice: Invoice, payment: Payment) -> Payment:
+        """Add payment to database and mark its invoice as changed."""
+        payment = super().add_payment(invoice, payment)
+        self._dirty.add(self._invoice_position(invoice))
+        return payment
+
+    def calulate_payments_for_invoice(
+        self, invoice: Invoice
+    ) -> tuple[int, float, InvoiceStatus]:
+        """Calculate payments for invoice and mark it as changed."""
+        result = super().calulate_payments_for_invoice(invoice)
+        if result is not None:
+            self._dirty.add(self._invoice_position(invoice))
+        return result
+
+    def calculate_difference(
+        self, invoice: Invoice, payment: Payment
+    ) -> tuple[ExchangeRateSchemaResponse, ExchangeRateSchemaResponse, float]:
+        """Calculate exchange rate difference and mark invoice as changed."""
+        result = super().calculate_difference(invoice, payment)
+        with contextlib.suppress(ValueError):
+            self._dirty.add(self._invoice_position(invoice))
+        return result
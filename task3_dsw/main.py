@@ -1,20 +1,32 @@
-"""Main module of the program."""
+"""
+Main module of the program.
 
+Modules of storage, NBP api and modes are imported inside the functions using
+them, so that parsing arguments and running one mode imports only what it needs.
+"""
+from __future__ import annotations
 
 import argparse
+from typing import TYPE_CHECKING
 
 from task3_dsw import settings
-from task3_dsw.database import Database
 from task3_dsw.logger import logger
-from task3_dsw.menu import (
-    AddInvoiceAction,
-    AddPaymentAction,
-    CalculateExchangeRateDifferenceAction,
-    CheckInvoiceStatusAction,
-    ExitAction,
-    InteractiveMenu,
-)
-from task3_dsw.nbp_api import NBPApiClient, NBPApiError
+from task3_dsw.metrics import metrics
+from task3_dsw.settings import BATCH_ENGINES, DATABASE_BACKENDS, DATABASE_CODECS
+from task3_dsw.tracing import tracer
+
+if TYPE_CHECKING:
+    from task3_dsw.cassette import CassetteTransport
+    from task3_dsw.database import Database
+    from task3_dsw.nbp_api import BaseNBPApiClient, NBPApiClient
+    from task3_dsw.resilience import ResilientTransport
+
+# Output file of batch mode when -o is not given, named after format of backend
+DEFAULT_OUTPUT_FILES = {
+    "json": "output.json",
+    "ndjson": "output.ndjson",
+    "sqlite": "output.sqlite3",
+}
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -41,97 +53,421 @@ def create_parser() -> argparse.ArgumentParser:
         type=str,
         help="File with invoices",
     )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=DATABASE_BACKENDS,
+        help="Storage backend of database.",
+    )
+    parser.add_argument(
+        "--codec",
+        choices=DATABASE_CODECS,
+        help="Codec of saved json files, .gz and .xz files are always compressed.",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Compact database file of ndjson or sqlite backend and exit.",
+    )
     parser.add_argument("-v", "--verbose", action="store_true", help="Verbose mode.")
-    parser.add_argument("-o", "--output", type=str, help="Nazwa pliku wynikowego")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        help="Nazwa pliku wynikowego, domyslnie output.json, output.ndjson lub output.sqlite3",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.NBP_CONCURRENCY,
+        help="Maximum number of concurrent requests to NBP api in batch mode.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes calculating invoices in batch mode.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=int,
+        default=0,
+        help="Save results every N invoices in batch mode, by default only at the end.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Process invoices one at a time with constant memory in batch mode.",
+    )
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Keep invoices in compact array columns in batch mode.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=BATCH_ENGINES,
+        default="scalar",
+        help="Engine calculating invoices in batch mode, numpy needs numpy installed.",
+    )
+    parser.add_argument(
+        "--import-rates",
+        nargs="+",
+        metavar="CSV",
+        help="Import NBP archive csv files of table A to offline rate store and exit.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Take exchange rates from offline rate store.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip invoices and payments unchanged since last batch run.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve database over local HTTP/JSON api until interrupted.",
+    )
+    parser.add_argument(
+        "--host",
+        default=settings.SERVER_HOST,
+        help="Address of HTTP/JSON api.",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=settings.SERVER_PORT,
+        help="Port of HTTP/JSON api.",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        metavar="REQUESTS",
+        help="Maximum number of requests to NBP api per second, 0 for no limit.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print json summary of requests, cache hits and stage timings.",
+    )
+    parser.add_argument(
+        "--prometheus",
+        metavar="FILE",
+        help="Write metrics to file in Prometheus text format.",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write spans of the run to Chrome trace-event json file.",
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record",
+        metavar="CASSETTE",
+        help="Save responses of NBP api to cassette file.",
+    )
+    cassette.add_argument(
+        "--replay",
+        metavar="CASSETTE",
+        help="Serve responses of NBP api from cassette file without network.",
+    )
 
     return parser
 
 
-def main() -> None:
-    """Main function of the program."""
-    # Create parser for command line arguments and parse them
-    parser = create_parser()
-    args = parser.parse_args()
+def create_transport(
+    args: argparse.Namespace,
+) -> CassetteTransport | ResilientTransport:
+    """Create transport of NBP clients, recorded or replayed if asked in args."""
+    from task3_dsw.cassette import CassetteTransport
+    from task3_dsw.resilience import ResilientTransport
 
-    # if args.currencies exists then set settings.CURRENCIES to args.currencies -> https://trello.com/c/JDvW1IvO
-    if args.currencies:
-        settings.CURRENCIES = args.currencies
+    if args.replay or args.record:
+        # Cassette must see every request, so persistent cache is not used with it
+        settings.RATE_CACHE_PATH = ":memory:"
+    if args.replay:
+        return CassetteTransport(args.replay, "replay")
+    if args.rate_limit is not None:
+        settings.NBP_RATE_LIMIT = args.rate_limit
+    transport = ResilientTransport.from_settings(settings)
+    if args.record:
+        return CassetteTransport(
+            args.record, "record", transport=transport, async_transport=transport
+        )
+    return transport
 
-    if args.verbose:
-        settings.DEBUG = args.verbose
-        logger.setLevel("DEBUG")
 
-    # initialize NBPApiClient
-    nbp_api_client = NBPApiClient()
+def report_metrics(args: argparse.Namespace) -> None:
+    """Print metrics summary and write Prometheus and trace files in args."""
+    if args.stats:
+        print(metrics.to_json())
+    try:
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
+        if args.trace:
+            tracer.save(args.trace)
+    except OSError as e:
+        logger.error(e)
 
-    # initialize Database
-    database = Database(settings=settings, nbp_api_client=nbp_api_client)
-    database.load()
 
-    if args.interactive:
-        logger.debug("We are in interactive mode.")
-        # initialize InteractiveMenu
-        interactive_menu = InteractiveMenu()
-        interactive_menu.add_action(
-            AddInvoiceAction(
-                name="Dodaj fakture",
-                tag="add_invoice",
-                description="Akcja dodawania faktury do bazy danych",
-                database=database,
+def compact_database(filename: str | None, nbp_api_client: NBPApiClient) -> None:
+    """Compact database file and log number of reclaimed bytes."""
+    from task3_dsw.database import TrackedDatabase
+    from task3_dsw.storage import create_database
+
+    if filename:
+        settings.DATABASE_PATH = filename
+    database = create_database(settings=settings, nbp_api_client=nbp_api_client)
+    if not isinstance(database, TrackedDatabase):
+        logger.error("Only ndjson and sqlite databases can be compacted.")
+        return
+    try:
+        reclaimed = database.compact()
+    except FileNotFoundError as e:
+        logger.error(e)
+        return
+    print(f"Compacted {settings.DATABASE_PATH}, reclaimed {reclaimed} bytes.")
+
+
+def import_rates(filenames: list[str]) -> None:
+    """Import NBP archive csv files to offline rate store."""
+    import time
+
+    from task3_dsw.rate_store import RateStore
+
+    store = RateStore(settings.RATE_STORE_PATH)
+    try:
+        for filename in filenames:
+            start = time.perf_counter()
+            try:
+                count = store.import_csv(filename)
+            except (OSError, ValueError) as e:
+                logger.error(e)
+                continue
+            print(
+                f"Imported {count} rates from {filename} "
+                f"in {time.perf_counter() - start:.2f}s."
             )
+    finally:
+        store.close()
+
+
+def run_interactive(database: Database, nbp_api_client: BaseNBPApiClient) -> None:
+    """Run program in interactive mode."""
+    from task3_dsw.menu import (
+        AddInvoiceAction,
+        AddPaymentAction,
+        CalculateExchangeRateDifferenceAction,
+        CheckInvoiceStatusAction,
+        ExitAction,
+        InteractiveMenu,
+    )
+
+    logger.debug("We are in interactive mode.")
+    # initialize InteractiveMenu
+    interactive_menu = InteractiveMenu()
+    interactive_menu.add_action(
+        AddInvoiceAction(
+            name="Dodaj fakture",
+            tag="add_invoice",
+            description="Akcja dodawania faktury do bazy danych",
+            database=database,
         )
-        interactive_menu.add_action(
-            AddPaymentAction(
-                name="Dodaj płatność",
-                tag="add_payment",
-                description="Dodaj płatność",
-                database=database,
-            )
+    )
+    interactive_menu.add_action(
+        AddPaymentAction(
+            name="Dodaj płatność",
+            tag="add_payment",
+            description="Dodaj płatność",
+            database=database,
         )
-        interactive_menu.add_action(
-            CalculateExchangeRateDifferenceAction(
-                name="Oblicz różnice kursów",
-                tag="calculate_exchange_rate_difference",
-                description="Akcja obliczania różnic kursów",
-                database=database,
-                nbp_api_client=nbp_api_client,
-            )
+    )
+    interactive_menu.add_action(
+        CalculateExchangeRateDifferenceAction(
+            name="Oblicz różnice kursów",
+            tag="calculate_exchange_rate_difference",
+            description="Akcja obliczania różnic kursów",
+            database=database,
+            nbp_api_client=nbp_api_client,
+        )
+    )
+    interactive_menu.add_action(
+        CheckInvoiceStatusAction(
+            name="Sprawdź status faktury",
+            tag="check_invoice_status",
+            description="Akcja sprawdzania statusu faktury.\nWymaga podania numeru faktury.\nDla uproszeczenia przekszalcamy wartosc faktury oraz płatności do PLN.",
+            database=database,
+            nbp_api_client=nbp_api_client,
+        )
+    )
+    interactive_menu.add_action(
+        ExitAction(name="Wyjdź", tag="exit", description="Wyjdź")
+    )
+    interactive_menu.run()
+
+
+def run_batch_mode(args: argparse.Namespace, nbp_api_client: BaseNBPApiClient) -> None:
+    """Run program in non-interactive mode for file given in args."""
+    import asyncio
+
+    from task3_dsw.batch import run_batch, run_batch_compact, run_batch_stream
+    from task3_dsw.nbp_api import AsyncNBPApiClient, NBPApiError
+    from task3_dsw.storage import create_database
+
+    logger.debug("We are in non-interactive mode.")
+    try:
+        if args.file is None:
+            raise ValueError("File with invoices is not provided.")  # noqa: TRY301, TRY003, EM101
+        settings.DATABASE_PATH = args.file
+        database = create_database(
+            settings=settings,
+            nbp_api_client=nbp_api_client,
+            output_file=args.output
+            or DEFAULT_OUTPUT_FILES.get(settings.DATABASE_BACKEND, "output.json"),
         )
-        interactive_menu.add_action(
-            CheckInvoiceStatusAction(
-                name="Sprawdź status faktury",
-                tag="check_invoice_status",
-                description="Akcja sprawdzania statusu faktury.\nWymaga podania numeru faktury.\nDla uproszeczenia przekszalcamy wartosc faktury oraz płatności do PLN.",
-                database=database,
-                nbp_api_client=nbp_api_client,
+        # Offline store answers without network, nothing to fetch up front
+        async_nbp_api_client = (
+            None
+            if args.offline
+            else AsyncNBPApiClient(
+                cache=nbp_api_client.cache,
+                concurrency=args.concurrency,
+                transport=nbp_api_client.transport,
             )
         )
-        interactive_menu.add_action(
-            ExitAction(name="Wyjdź", tag="exit", description="Wyjdź")
+        if args.stream or args.low_memory:
+            if settings.DATABASE_BACKEND != "json":
+                raise ValueError("Streaming and low memory mode require json backend.")  # noqa: TRY301, TRY003, EM101
+            if args.engine != "scalar":
+                raise ValueError("Streaming and low memory mode use scalar engine.")  # noqa: TRY301, TRY003, EM101
+            run = run_batch_stream if args.stream else run_batch_compact
+            result = asyncio.run(
+                run(database, async_nbp_api_client, incremental=args.incremental)
+            )
+        else:
+            if not database.load():
+                # Invalid file is logged, output is left untouched
+                return
+            result = asyncio.run(
+                run_batch(
+                    database,
+                    async_nbp_api_client,
+                    workers=args.workers,
+                    checkpoint=args.checkpoint,
+                    incremental=args.incremental,
+                    engine=args.engine,
+                )
+            )
+        if args.incremental:
+            print(
+                f"Processed {result.invoices} invoices, "
+                f"skipped {result.skipped} unchanged invoices and payments."
+            )
+    except (OSError, ValueError, NBPApiError) as exc:
+        logger.error(exc)
+    finally:
+        logger.debug("Exchange rate cache: %s", nbp_api_client.cache.stats())
+
+
+def apply_settings(args: argparse.Namespace) -> None:
+    """Override settings and enable metrics and tracing as asked in args."""
+    # if args.currencies exists then set settings.CURRENCIES to args.currencies -> https://trello.com/c/JDvW1IvO
+    if args.currencies:
+        settings.CURRENCIES = args.currencies
+
+    if args.verbose:
+        settings.DEBUG = args.verbose
+        logger.setLevel("DEBUG")
+
+    if args.backend:
+        settings.DATABASE_BACKEND = args.backend
+
+    if args.codec:
+        settings.DATABASE_CODEC = args.codec
+
+    # Served database is given with -f, batch mode reads -f itself
+    if args.serve and args.file:
+        settings.DATABASE_PATH = args.file
+
+    metrics.enabled = args.stats or args.prometheus is not None
+    tracer.enabled = args.trace is not None
+
+
+def create_nbp_api_client(
+    args: argparse.Namespace, transport: CassetteTransport | ResilientTransport
+) -> BaseNBPApiClient:
+    """Create NBP client with persistent exchange rate cache, offline if asked."""
+    from task3_dsw.cache import RateCache
+    from task3_dsw.nbp_api import NBPApiClient, OfflineNBPApiClient
+    from task3_dsw.rate_store import RateStore
+
+    nbp_api_client = NBPApiClient(
+        cache=RateCache(
+            path=settings.RATE_CACHE_PATH,
+            max_entries=settings.RATE_CACHE_MAX_ENTRIES,
+        ),
+        transport=transport,
+    )
+    if args.offline:
+        return OfflineNBPApiClient(
+            RateStore(settings.RATE_STORE_PATH),
+            fallback=nbp_api_client if settings.RATE_STORE_FALLBACK else None,
         )
-        interactive_menu.run()
+    return nbp_api_client
+
+
+def run_with_database(
+    args: argparse.Namespace, nbp_api_client: BaseNBPApiClient
+) -> None:
+    """Run interactive menu or server on database of settings."""
+    from task3_dsw.storage import create_database
+
+    database = create_database(settings=settings, nbp_api_client=nbp_api_client)
+    if args.interactive:
+        # Menu lists invoices from snapshot and loads database once one is chosen
+        run_interactive(database, nbp_api_client)
     else:
-        logger.debug("We are in non-interactive mode.")
-        try:
-            if args.file is None:
-                raise ValueError("File with invoices is not provided.")  # noqa: TRY301, TRY003, EM101
-            if args.file:
-                settings.DATABASE_PATH = args.file
-                database = Database(
-                    settings=settings,
-                    nbp_api_client=nbp_api_client,
-                    output_file="output.json" if args.output is None else args.output,
-                )
-                database.load()
-                invoices = database.get_invoices()
-                for invoice in invoices:
-                    database.calulate_payments_for_invoice(invoice)
-                    payments = database.get_payments(invoice)
-                    for payment in payments:
-                        database.calculate_difference(invoice, payment)
-                    database.save()
-        except (ValueError, NBPApiError) as exc:
-            logger.error(exc)
+        from task3_dsw.server import serve
+
+        database.load()
+        serve(database, args.host, args.port)
+
+
+def main() -> None:
+    """Main function of the program."""
+    # Create parser for command line arguments and parse them
+    parser = create_parser()
+    args = parser.parse_args()
+
+    apply_settings(args)
+
+    if args.import_rates:
+        import_rates(args.import_rates)
+        return
+
+    try:
+        transport = create_transport(args)
+    except (OSError, ValueError) as e:
+        logger.error(e)
+        return
+
+    # Closing transport writes recorded cassette, also when menu exits
+    with transport:
+        nbp_api_client = create_nbp_api_client(args, transport)
+
+        if args.compact:
+            compact_database(args.file, nbp_api_client)
+            return
+
+        # Batch mode loads file given with -f itself, other modes database of settings
+        if args.interactive or args.serve:
+            run_with_database(args, nbp_api_client)
+        else:
+            run_batch_mode(args, nbp_api_client)
+    report_metrics(args)
 
 
 if __name__ == "__main__":
@@ -3,11 +3,20 @@ from __future__ import annotations
 
 import os
 import sys
+from typing import TYPE_CHECKING
 
 from task3_dsw.database import AddInvoice, AddPayment, Database, Invoice, Payment
 from task3_dsw.logger import logger
 from task3_dsw.nbp_api import NBPApiClient, NBPApiError
 
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from task3_dsw.snapshot import InvoiceRow
+
+# Number of invoices printed at once
+PAGE_SIZE = 50
+
 
 class Action:
     """Action class for creating action in interactive menu."""
@@ -44,25 +53,34 @@ class WithDatabaseAction(Action):
             avaiable_currency += ", PLN"
         return avaiable_currency
 
-    def print_available_invoices(self, invoices: list[Invoice]) -> str:
+    def print_available_invoices(
+        self, invoices: Sequence[Invoice | InvoiceRow], start: int = 0
+    ) -> bool:
         """
-        Print available invoices.
+        Print page of available invoices.
 
         Args:
         ----
-            invoices: list of invoices
+            invoices: invoices or rows of database snapshot
+            start: index of first printed invoice
 
         Returns:
         -------
-            str: string with invoices
+            bool: True if there are more invoices after the page
         """
+        end = min(start + PAGE_SIZE, len(invoices))
         # With id number to choice in menu
         available_invoice = "\n".join(
-            [f"{invoices.index(invoice)} - {invoice}" for invoice in invoices]
+            [f"{index} - {invoices[index]}" for index in range(start, end)]
         )
         print(
             f"Dostepne faktury: \n Invoice index - <id | amount | currency | date> \n {available_invoice}"
         )
+        if end < len(invoices):
+            print(
+                f"Faktury {start}-{end - 1} z {len(invoices)}, Enter - nastepna strona"
+            )
+        return end < len(invoices)
 
     def print_available_payments(self, payments: list[Payment]) -> str:
         """
@@ -79,7 +97,7 @@ class WithDatabaseAction(Action):
         """
         # With id number to choice in menu
         available_payments = "\n".join(
-            [f"{payments.index(payment)} - {payment}" for payment in payments]
+            [f"{index} - {payment}" for index, payment in enumerate(payments)]
         )
         print(
             f"Dostepne płatności dla tej faktury: \n  Invoice index - <id | invoice_id | currency | date> \n {available_payments}"
@@ -93,10 +111,25 @@ class WithDatabaseAction(Action):
         -------
             int: invoice index
         """
-        self.database.load()
-        invoices = self.database.get_invoices()
-        self.print_available_invoices(invoices)
-        invoice_index = int(input("Wprowadz index faktury: "))
+        # Snapshot lists invoices without parsing database file
+        snapshot = self.database.open_snapshot()
+        if snapshot is None:
+            self.database.refresh()
+        invoices = snapshot if snapshot is not None else self.database.get_invoices()
+        start = 0
+        try:
+            while True:
+                more = self.print_available_invoices(invoices, start)
+                answer = input("Wprowadz index faktury: ")
+                if answer or not more:
+                    break
+                start += PAGE_SIZE
+        finally:
+            if snapshot is not None:
+                snapshot.close()
+        if snapshot is not None:
+            self.database.refresh()
+        invoice_index = int(answer)
 
         # Get invoice from database
         invoice = self.database.get_invoice(invoice_index=invoice_index)
@@ -127,8 +160,8 @@ class WithDatabaseAction(Action):
         self.print_available_payments(payments)
 
         payment_index = int(input("Wprowadz index płatności: "))
-        # Load data from database
-        self.database.load()
+        # Load data from database if its file changed
+        self.database.refresh()
 
         try:
             return payments[payment_index]
@@ -160,10 +193,8 @@ class AddInvoiceAction(WithDatabaseAction):
             currency = input(f"Wprowadź walute [{avaiable_currency}]: ")
             date = input("Wprowadź date: [YYYY-MM-DD]: ")
 
-            # Load data from database
-            self.database.load()
-
-            # Add invoice to database
+            # Add invoice to database, loaded again if its file changed
+            self.database.refresh()
             invoice_schema = self.database.add_invoice(
                 invoice=AddInvoice(
                     amount=amount,
@@ -172,9 +203,9 @@ class AddInvoiceAction(WithDatabaseAction):
                 )
             )
 
-            # Save data to database
+            # Log new invoice in write-ahead log of database
             logger.debug("Added invoice: %s", invoice_schema)
-            self.database.save()
+            self.database.commit()
         except ValueError as e:
             logger.error("Invalid value: %s", e)
         except FileNotFoundError as e:
@@ -197,8 +228,6 @@ class AddPaymentAction(WithDatabaseAction):
             amount = float(input("Wprowadź kwote: "))
             currency = input(f"Wprowadź walute [{avaiable_currency}]: ")
             date = input("Wprowadź date: [YYYY-MM-DD]: ")
-            # Load data from database
-            self.database.load()
 
             # Add payment to database
             payment_schema = self.database.add_payment(
@@ -206,9 +235,9 @@ class AddPaymentAction(WithDatabaseAction):
                 payment=AddPayment(amount=amount, currency=currency, date=date),
             )
 
-            # Save data to database
+            # Log changed invoice in write-ahead log of database
             logger.debug("Added payment: %s", payment_schema)
-            self.database.save()
+            self.database.commit()
         except ValueError as e:
             logger.error("Invalid value: %s", e)
 
@@ -234,8 +263,6 @@ class CalculateExchangeRateDifferenceAction(WithDatabaseAction):
     def execute(self) -> None:
         """Execute action for calculating exchange rate difference."""
         try:
-            # Load data from database
-            self.database.load()
             invoice = self.ask_for_invoice_index()
 
             if invoice is None:
@@ -260,7 +287,7 @@ class CalculateExchangeRateDifferenceAction(WithDatabaseAction):
 Różnica: {exchange_rate_difference} {payment.currency} \n
 """
             )
-            self.database.save()
+            self.database.commit()
         except ValueError as e:
             logger.error("Invalid value: %s", e)
 
@@ -289,7 +316,6 @@ class CheckInvoiceStatusAction(WithDatabaseAction):
     def execute(self) -> None:
         """Execute action for checking invoice status."""
         try:
-            self.database.load()
             invoice = self.ask_for_invoice_index()
             if invoice is None:
                 return
@@ -298,7 +324,7 @@ class CheckInvoiceStatusAction(WithDatabaseAction):
                 invoice_amount,
                 status,
             ) = self.database.calulate_payments_for_invoice(invoice=invoice)
-            self.database.save()
+            self.database.commit()
             print(
                 f"Kwota faktury: <{invoice.amount} | {invoice.currency}> {invoice_amount:.2f} PLN"
             )
@@ -336,8 +362,8 @@ class InteractiveMenu:
 
     def print_actions(self) -> None:
         """Print all actions in interactive menu."""
-        for action in self.actions:
-            print("{}. {}".format(self.actions.index(action) + 1, action))  # noqa: UP032
+        for index, action in enumerate(self.actions, start=1):
+            print(f"{index}. {action}")
 
     def run_action(self, action_id: int) -> None:
         """
@@ -0,0 +1,214 @@
+"""Registry of runtime metrics: counters, gauges and histograms of durations."""
+from __future__ import annotations
+
+import bisect
+import functools
+import json
+import math
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, ParamSpec, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import TracebackType
+
+__all__ = ["Histogram", "MetricsRegistry", "metrics"]
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# Upper bounds of histogram buckets in seconds
+DEFAULT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+PREFIX = "task3_dsw_"
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets."""
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Initialize empty Histogram."""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add value to histogram."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def summary(self) -> dict[str, float]:
+        """Return count, sum, mean and maximum of observed values."""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class _Timer:
+    """Context manager observing its duration in histogram."""
+
+    __slots__ = ("_registry", "_name", "_start")
+
+    def __init__(self, registry: MetricsRegistry, name: str) -> None:
+        """Initialize _Timer."""
+        self._registry = registry
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        """Start timer."""
+        self._start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Observe time elapsed since start."""
+        self._registry.observe(self._name, time.perf_counter() - self._start)
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms of one process.
+
+    Nothing is recorded until registry is enabled, so instrumented code
+    pays only for a flag check. Metrics of batch worker processes are not
+    collected.
+    """
+
+    def __init__(self) -> None:
+        """Initialize disabled MetricsRegistry."""
+        self.enabled = False
+        self.counters: dict[str, float] = {}
+        self.gauges: dict[str, float] = {}
+        self.histograms: dict[str, Histogram] = {}
+
+    def reset(self) -> None:
+        """Forget all recorded metrics."""
+        self.counters.clear()
+        self.gauges.clear()
+        self.histograms.clear()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increase counter by value."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: float) -> None:
+        """Set gauge to value."""
+        if self.enabled:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Add value to histogram."""
+        if self.enabled:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def time(self, name: str) -> _Timer:
+        """Return context manager observing its duration in histogram."""
+        return _Timer(self, name)
+
+    def timed(self, name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+        """
+        Decorate function to observe duration of every call in histogram.
+
+        Args:
+        ----
+            name: name of histogram
+
+        Returns:
+        -------
+            decorator
+        """
+
+        def decorator(func: Callable[P, R]) -> Callable[P, R]:
+            @functools.wraps(func)
+            def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def summary(self) -> dict[str, dict]:
+        """
+        Return recorded metrics as dictionary serializable to json.
+
+        Returns
+        -------
+            dict with counters, gauges and summaries of histograms
+        """
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": dict(sorted(self.gauges.items())),
+            "histograms": {
+                name: histogram.summary()
+                for name, histogram in sorted(self.histograms.items())
+            },
+        }
+
+    def to_json(self) -> str:
+        """Return summary as json text."""
+        return json.dumps(self.summary(), indent=4)
+
+    def to_prometheus(self) -> str:
+        """
+        Return recorded metrics in Prometheus text exposition format.
+
+        Returns
+        -------
+            str: metrics with names prefixed with task3_dsw_
+        """
+        lines = []
+        for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+            for name, value in sorted(values.items()):
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                lines.append(f"{PREFIX}{name} {_format(value)}")
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            cumulative = 0
+            bounds = (*histogram.bounds, math.inf)
+            for bound, count in zip(bounds, histogram.counts, strict=True):
+                cumulative += count
+                lines.append(
+                    f'{PREFIX}{name}_bucket{{le="{_format(bound)}"}} {cumulative}'
+                )
+            lines.append(f"{PREFIX}{name}_sum {_format(histogram.sum)}")
+            lines.append(f"{PREFIX}{name}_count {histogram.count}")
+        return "".join(f"{line}\n" for line in lines)
+
+    def write_prometheus(self, filename: str | Path) -> None:
+        """Write recorded metrics to file in Prometheus text format."""
+        Path(filename).write_text(self.to_prometheus())
+
+
+def _format(value: float) -> str:
+    """Format number as Prometheus sample value."""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+metrics = MetricsRegistry()
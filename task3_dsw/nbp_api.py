@@ -1,14 +1,38 @@
 """Api client for National Bank of Polish."""
 from __future__ import annotations
 
-import datetime  # noqa: TCH003
+import asyncio
+import datetime
+import time
+from typing import TYPE_CHECKING
 
 import httpx
 from pydantic import BaseModel, field_validator
 
+from task3_dsw.cache import RateCache
+from task3_dsw.metrics import metrics
 from task3_dsw.settings import (
     settings,
 )
+from task3_dsw.tracing import NULL_SPAN, tracer
+
+if TYPE_CHECKING:
+    from typing import Self
+
+    from task3_dsw.rate_store import RateStore, StoredRate
+    from task3_dsw.tracing import Span
+
+__all__ = [
+    "AsyncNBPApiClient",
+    "BaseNBPApiClient",
+    "ExchangeRateRangeSchema",
+    "ExchangeRateSchema",
+    "ExchangeRateSchemaResponse",
+    "NBPApiClient",
+    "NBPApiError",
+    "OfflineNBPApiClient",
+    "RateSchema",
+]
 
 
 class NBPApiError(Exception):
@@ -31,6 +55,23 @@ class ExchangeRateSchema(BaseModel):
         return v
 
 
+class ExchangeRateRangeSchema(BaseModel):
+    """Schema for exchange rates in a range of dates."""
+
+    table: str = "a"
+    code: str
+    start_date: datetime.date
+    end_date: datetime.date
+
+    @field_validator("code")
+    def currency_is_valid(cls, v) -> str:  # noqa: N805, ANN001
+        """Validate currency code."""
+        if v not in settings.CURRENCIES:
+            msg = f"Currency code {v} is not valid."
+            raise ValueError(msg)
+        return v
+
+
 class RateSchema(BaseModel):
     """Schema for rate."""
 
@@ -48,18 +89,157 @@ class ExchangeRateSchemaResponse(BaseModel):
     rates: list[RateSchema]
 
 
-class NBPApiClient:
-    """Class for making requests to api National Bank of Polish."""
+def _record_request(start: float, response: httpx.Response | None) -> None:
+    """Record request to NBP api in metrics, response is None on transport error."""
+    metrics.inc("nbp_requests_total")
+    metrics.observe("nbp_request_seconds", time.perf_counter() - start)
+    if response is not None and response.status_code == httpx.codes.NOT_FOUND:
+        metrics.inc("nbp_not_found_total")
+    elif response is None or response.is_error:
+        metrics.inc("nbp_errors_total")
+
+
+class BaseNBPApiClient:
+    """Base class for clients of api National Bank of Polish."""
 
     api_url: str
     headers: dict
-    client: httpx.Client
+    cache: RateCache
 
-    def __init__(self) -> None:
-        """Initialize NBPApiClient."""
-        self.api_url = "http://api.nbp.pl/api/"
+    def __init__(self, cache: RateCache | None = None) -> None:
+        """
+        Initialize BaseNBPApiClient.
+
+        Args:
+        ----
+            cache: cache consulted before the network, in memory cache if None
+        """
+        self.api_url = settings.NBP_API_URL
         self.headers = {"Accept": "application/json"}
-        self.client = httpx.Client(base_url=self.api_url, headers=self.headers)
+        self.cache = cache if cache is not None else RateCache()
+
+    @staticmethod
+    def _rate_endpoint(data: ExchangeRateSchema) -> str:
+        """Return endpoint of exchange rate for one day."""
+        return f"exchangerates/rates/{data.table}/{data.code}/{data.date}/"
+
+    @staticmethod
+    def _range_endpoint(data: ExchangeRateRangeSchema) -> str:
+        """Return endpoint of exchange rates in range of dates."""
+        return f"exchangerates/rates/{data.table}/{data.code}/{data.start_date}/{data.end_date}/"
+
+    def _from_cache(
+        self, data: ExchangeRateSchema, span: Span = NULL_SPAN
+    ) -> ExchangeRateSchemaResponse | None:
+        """
+        Get exchange rate from cache and tag span with cache hit or miss.
+
+        Returns
+        -------
+            ExchangeRateSchemaResponse or None if rate is not cached
+
+        Raises
+        ------
+            NBPApiError: If cache remembers that no rate was published.
+        """
+        cached = self.cache.get(data.table, data.code, data.date)
+        span.set("cache", "miss" if cached is None else "hit")
+        if cached is None:
+            metrics.inc("rate_cache_misses_total")
+            return None
+        metrics.inc("rate_cache_hits_total")
+        if cached.negative:
+            msg = f"NBPAPIError: No exchange rate for {data.code} on {data.date}."
+            raise NBPApiError(msg)
+        return ExchangeRateSchemaResponse.model_validate_json(cached.payload)
+
+    def _handle_rate_response(
+        self, data: ExchangeRateSchema, response: httpx.Response
+    ) -> ExchangeRateSchemaResponse:
+        """Validate response with exchange rate for one day and cache it."""
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            # Rate for a past date will never be published, remember it
+            if (
+                exc.response.status_code == httpx.codes.NOT_FOUND
+                and data.date < datetime.date.today()  # noqa: DTZ011
+            ):
+                self.cache.set(data.table, data.code, data.date, None)
+            msg = f"NBPAPIError: {exc}"
+            raise NBPApiError(msg) from exc
+        self.cache.set(data.table, data.code, data.date, response.text)
+        return ExchangeRateSchemaResponse(**response.json())
+
+    def _handle_range_response(
+        self, data: ExchangeRateRangeSchema, response: httpx.Response
+    ) -> ExchangeRateSchemaResponse:
+        """Validate response with exchange rates in range and cache every day."""
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code != httpx.codes.NOT_FOUND:
+                msg = f"NBPAPIError: {exc}"
+                raise NBPApiError(msg) from exc
+            exchange_rates = ExchangeRateSchemaResponse(
+                table=data.table, currency="", code=data.code, rates=[]
+            )
+        else:
+            exchange_rates = ExchangeRateSchemaResponse(**response.json())
+
+        published = {rate.effectiveDate: rate for rate in exchange_rates.rates}
+        today = datetime.date.today()  # noqa: DTZ011
+        entries = []
+        for offset in range((data.end_date - data.start_date).days + 1):
+            date = data.start_date + datetime.timedelta(days=offset)
+            if date in published:
+                payload = exchange_rates.model_copy(
+                    update={"rates": [published[date]]}
+                ).model_dump_json()
+                entries.append((data.table, data.code, date, payload))
+            elif date < today:
+                entries.append((data.table, data.code, date, None))
+        self.cache.set_many(entries)
+        return exchange_rates
+
+
+class NBPApiClient(BaseNBPApiClient):
+    """Class for making requests to api National Bank of Polish."""
+
+    client: httpx.Client
+
+    def __init__(
+        self,
+        cache: RateCache | None = None,
+        transport: httpx.BaseTransport | None = None,
+    ) -> None:
+        """
+        Initialize NBPApiClient.
+
+        Args:
+        ----
+            cache: cache consulted before the network, in memory cache if None
+            transport: transport sending requests, network if None
+        """
+        super().__init__(cache=cache)
+        self.transport = transport
+        self.client = httpx.Client(
+            base_url=self.api_url, headers=self.headers, transport=transport
+        )
+
+    def _get(self, endpoint: str) -> httpx.Response:
+        """Send GET request and record it in metrics."""
+        with tracer.span("nbp.request", endpoint=endpoint) as span:
+            start = time.perf_counter()
+            try:
+                response = self.client.get(endpoint)
+            except httpx.HTTPError as exc:
+                _record_request(start, None)
+                msg = f"NBPAPIError: {exc}"
+                raise NBPApiError(msg) from exc
+            _record_request(start, response)
+            span.set("status", response.status_code)
+        return response
 
     def get_exchange_rate(self, data: ExchangeRateSchema) -> ExchangeRateSchemaResponse:
         """
@@ -77,12 +257,236 @@ class NBPApiClient:
         ------
             NBPApiError: If currency code is invalid or if an HTTP error occurred.
         """
-        try:
-            endpoint = f"exchangerates/rates/{data.table}/{data.code}/{data.date}/"
-            response = self.client.get(endpoint)
-            response.raise_for_status()
-        except (httpx.HTTPStatusError, httpx.HTTPError) as exc:
-            msg = f"NBPAPIError: {exc}"
-            raise NBPApiError(msg) from exc
-        else:
-            return ExchangeRateSchemaResponse(**response.json())
+        with tracer.span("nbp.rate", code=data.code, date=data.date) as span:
+            cached = self._from_cache(data, span)
+            if cached is not None:
+                return cached
+            response = self._get(self._rate_endpoint(data))
+            return self._handle_rate_response(data, response)
+
+    def get_exchange_rates(
+        self, data: ExchangeRateRangeSchema
+    ) -> ExchangeRateSchemaResponse:
+        """
+        Get exchange rates for every day in given range and store them in cache.
+
+        Days without a published rate are cached as missing, so later calls to
+        get_exchange_rate for any day in the range do not hit the network.
+
+        Args:
+        ----
+            data: ExchangeRateRangeSchema
+
+        Returns:
+        -------
+            ExchangeRateSchemaResponse with rates empty if none were published
+
+        Raises:
+        ------
+            NBPApiError: If an HTTP error other than missing data occurred.
+        """
+        response = self._get(self._range_endpoint(data))
+        return self._handle_range_response(data, response)
+
+
+class AsyncNBPApiClient(BaseNBPApiClient):
+    """Asynchronous client for api National Bank of Polish."""
+
+    client: httpx.AsyncClient
+
+    def __init__(
+        self,
+        cache: RateCache | None = None,
+        concurrency: int = 8,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """
+        Initialize AsyncNBPApiClient.
+
+        Args:
+        ----
+            cache: cache consulted before the network, in memory cache if None
+            concurrency: maximum number of requests in flight
+            transport: transport sending requests, network if None
+        """
+        super().__init__(cache=cache)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.transport = transport
+        self.client = httpx.AsyncClient(
+            base_url=self.api_url,
+            headers=self.headers,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+        )
+
+    async def __aenter__(self) -> Self:
+        """Enter async context manager."""
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        """Close connection pool on exit."""
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close connection pool."""
+        await self.client.aclose()
+
+    async def _get(self, endpoint: str) -> httpx.Response:
+        """Send GET request, waiting for a free slot if concurrency limit is hit."""
+        async with self.semaphore:
+            with tracer.span("nbp.request", endpoint=endpoint) as span:
+                start = time.perf_counter()
+                try:
+                    response = await self.client.get(endpoint)
+                except httpx.HTTPError as exc:
+                    _record_request(start, None)
+                    msg = f"NBPAPIError: {exc}"
+                    raise NBPApiError(msg) from exc
+                _record_request(start, response)
+                span.set("status", response.status_code)
+        return response
+
+    async def get_exchange_rate(
+        self, data: ExchangeRateSchema
+    ) -> ExchangeRateSchemaResponse:
+        """
+        Get exchange rate for given currency code.
+
+        Args:
+        ----
+            data: ExchangeRateSchema
+
+        Returns:
+        -------
+            ExchangeRateSchemaResponse
+
+        Raises:
+        ------
+            NBPApiError: If currency code is invalid or if an HTTP error occurred.
+        """
+        with tracer.span("nbp.rate", code=data.code, date=data.date) as span:
+            cached = self._from_cache(data, span)
+            if cached is not None:
+                return cached
+            response = await self._get(self._rate_endpoint(data))
+            return self._handle_rate_response(data, response)
+
+    async def get_exchange_rates(
+        self, data: ExchangeRateRangeSchema
+    ) -> ExchangeRateSchemaResponse:
+        """
+        Get exchange rates for every day in given range and store them in cache.
+
+        Args:
+        ----
+            data: ExchangeRateRangeSchema
+
+        Returns:
+        -------
+            ExchangeRateSchemaResponse with rates empty if none were published
+
+        Raises:
+        ------
+            NBPApiError: If an HTTP error other than missing data occurred.
+        """
+        response = await self._get(self._range_endpoint(data))
+        return self._handle_range_response(data, response)
+
+
+class OfflineNBPApiClient(BaseNBPApiClient):
+    """
+    Client serving exchange rates of table A from offline rate store.
+
+    Rates missing in the store are asked from fallback client, or raise
+    NBPApiError if there is no fallback. A day covered by imported archive
+    files without a rate had no rate published, so fallback is not asked.
+    """
+
+    def __init__(self, store: RateStore, fallback: NBPApiClient | None = None) -> None:
+        """
+        Initialize OfflineNBPApiClient.
+
+        Args:
+        ----
+            store: rate store with imported archive files
+            fallback: client asked for rates missing in store, None to stay offline
+        """
+        super().__init__(cache=fallback.cache if fallback is not None else None)
+        self.store = store
+        self.fallback = fallback
+
+    def get_exchange_rate(self, data: ExchangeRateSchema) -> ExchangeRateSchemaResponse:
+        """
+        Get exchange rate for given currency code.
+
+        Args:
+        ----
+            data: ExchangeRateSchema
+
+        Returns:
+        -------
+            ExchangeRateSchemaResponse
+
+        Raises:
+        ------
+            NBPApiError: If no rate was published or it is missing in store.
+        """
+        if data.table.upper() == "A":
+            stored = self.store.get(data.code, data.date)
+            if stored is not None:
+                return self._response(data.code, {data.date: stored})
+            if self.store.covers(data.date):
+                msg = f"NBPAPIError: No exchange rate for {data.code} on {data.date}."
+                raise NBPApiError(msg)
+        if self.fallback is None:
+            msg = f"NBPAPIError: Exchange rate for {data.code} on {data.date} is not in offline store."
+            raise NBPApiError(msg)
+        return self.fallback.get_exchange_rate(data)
+
+    def get_exchange_rates(
+        self, data: ExchangeRateRangeSchema
+    ) -> ExchangeRateSchemaResponse:
+        """
+        Get exchange rates for every day in given range.
+
+        Args:
+        ----
+            data: ExchangeRateRangeSchema
+
+        Returns:
+        -------
+            ExchangeRateSchemaResponse with rates empty if none were published
+
+        Raises:
+        ------
+            NBPApiError: If range is not covered by store and there is no fallback.
+        """
+        if data.table.upper() == "A" and (
+            self.fallback is None or self.store.covers(data.start_date, data.end_date)
+        ):
+            return self._response(
+                data.code,
+                self.store.get_range(data.code, data.start_date, data.end_date),
+            )
+        if self.fallback is None:
+            msg = f"NBPAPIError: Table {data.table} is not in offline store."
+            raise NBPApiError(msg)
+        return self.fallback.get_exchange_rates(data)
+
+    @staticmethod
+    def _response(
+        code: str, rates: dict[datetime.date, StoredRate]
+    ) -> ExchangeRateSchemaResponse:
+        """Build api response from stored rates."""
+        currency = next((rate.currency for rate in rates.values()), "")
+        return ExchangeRateSchemaResponse(
+            table="A",
+            currency=currency,
+            code=code,
+            rates=[
+                RateSchema(no=rate.no, effectiveDate=date, mid=rate.mid)
+                for date, rate in rates.items()
+            ],
+        )
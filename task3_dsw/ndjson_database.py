@@ -0,0 +1,269 @@
+"""Append-only database storing one invoice per json line."""
+from __future__ import annotations
+
+import json
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
+
+from pydantic import ValidationError
+
+from task3_dsw.database import (
+    DataSchema,
+    Invoice,
+    TrackedDatabase,
+    atomic_open,
+    paused_gc,
+)
+from task3_dsw.logger import logger
+from task3_dsw.metrics import metrics
+from task3_dsw.tracing import tracer
+
+if TYPE_CHECKING:
+    from task3_dsw.nbp_api import NBPApiClient
+    from task3_dsw.settings import Settings
+
+__all__ = ["NDJSONDatabase"]
+
+# Index header: magic and size of data file covered by the index
+INDEX_HEADER = struct.Struct("<4sQ")
+INDEX_MAGIC = b"T3IX"
+OFFSET_SIZE = 8
+
+
+class NDJSONDatabase(TrackedDatabase):
+    """
+    Append-only json lines database.
+
+    Every line of the file holds one version of one invoice. Changed
+    invoices are appended as new lines, and the sidecar index maps invoice
+    number to byte offset of its latest version. Old versions stay in the
+    file until compact() is called.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        nbp_api_client: NBPApiClient,
+        output_file: str | None = None,
+    ) -> None:
+        """Initialize NDJSONDatabase."""
+        super().__init__(settings, nbp_api_client, output_file)
+        self._offsets = array("Q")
+
+    @staticmethod
+    def index_path(filename: str | Path) -> Path:
+        """Return path of index file for database file."""
+        return Path(f"{filename}.idx")
+
+    @metrics.timed("database_load_seconds")
+    @tracer.traced("database.load")
+    def load(self) -> bool:
+        """
+        Load data from json lines file.
+
+        Index is rebuilt from the data file when it is missing or out of date.
+
+        Returns
+        -------
+            bool: False if file is not valid, it is logged and data is kept
+        """
+        path = Path(self.settings.DATABASE_PATH)
+        try:
+            self._offsets = self._read_index(path)
+            with path.open("rb") as f, paused_gc():
+                invoices = [
+                    Invoice.model_validate(self._read_record(f, offset)["invoice"])
+                    for offset in self._offsets
+                ]
+        except FileNotFoundError:
+            self.data = DataSchema(invoices=[])
+            self._mark_loaded()
+            self._replay_wal()
+            self.save()
+            return True
+        except (json.decoder.JSONDecodeError, KeyError, ValidationError) as e:
+            logger.error(e)
+            return False
+        self.data = DataSchema.model_construct(invoices=invoices)
+        self._mark_loaded()
+        self._replay_wal()
+        self._remember_files()
+        return True
+
+    def read_invoice(self, invoice_number: int) -> Invoice | None:
+        """
+        Read single invoice from file with one seek, without loading database.
+
+        Args:
+        ----
+            invoice_number: int
+
+        Returns:
+        -------
+            Invoice or None if invoice does not exist
+        """
+        path = Path(self.settings.DATABASE_PATH)
+        offsets = self._read_index(path)
+        if not 0 <= invoice_number < len(offsets):
+            return None
+        with path.open("rb") as f:
+            record = self._read_record(f, offsets[invoice_number])
+        return Invoice.model_validate(record["invoice"])
+
+    @metrics.timed("database_save_seconds")
+    @tracer.traced("database.save")
+    def save(self) -> None:
+        """
+        Save data to json lines file.
+
+        Only invoices changed since load are appended to the database file.
+        Other output file is written from scratch.
+        """
+        filename = self.output_file or self.settings.DATABASE_PATH
+        path = Path(self.settings.DATABASE_PATH)
+        if self._needs_full_write(filename):
+            offsets = self._write_all(filename)
+            if Path(filename) == path:
+                self._offsets = offsets
+                self._mark_loaded()
+            self._wal_saved(filename)
+            return
+        self._append(path, sorted(self._dirty))
+        self._dirty.clear()
+        self._wal_saved(path)
+
+    def compact(self) -> int:
+        """
+        Rewrite database file without old versions of invoices.
+
+        Returns
+        -------
+            int: number of bytes reclaimed
+        """
+        path = Path(self.settings.DATABASE_PATH)
+        offsets = self._read_index(path)
+        size = path.stat().st_size
+        new_offsets = array("Q")
+        with atomic_open(path, "wb") as target, path.open("rb") as source:
+            for offset in offsets:
+                source.seek(offset)
+                new_offsets.append(target.tell())
+                target.write(source.readline())
+            new_size = target.tell()
+        self._write_index(path, new_offsets, new_size)
+        self._offsets = new_offsets
+        logger.debug("Compacted %s, reclaimed %s bytes", path, size - new_size)
+        return size - new_size
+
+    @staticmethod
+    def _encode(invoice_number: int, invoice: Invoice) -> bytes:
+        """Encode invoice as json line."""
+        line = f'{{"number":{invoice_number},"invoice":{invoice.model_dump_json()}}}\n'
+        return line.encode()
+
+    @staticmethod
+    def _read_record(f: IO[bytes], offset: int) -> dict:
+        """Read json line starting at offset."""
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def _write_all(self, filename: str | Path) -> array:
+        """Write all invoices to new file with its index."""
+        offsets = array("Q")
+        with atomic_open(filename, "wb") as f:
+            for number, invoice in enumerate(self.data.invoices):
+                offsets.append(f.tell())
+                f.write(self._encode(number, invoice))
+            size = f.tell()
+        self._write_index(filename, offsets, size)
+        return offsets
+
+    def _append(self, path: Path, invoice_numbers: list[int]) -> None:
+        """Append invoices to database file and point index at new lines."""
+        if not invoice_numbers:
+            return
+        with path.open("ab") as f:
+            for number in invoice_numbers:
+                offset = f.tell()
+                f.write(self._encode(number, self.data.invoices[number]))
+                if number < len(self._offsets):
+                    self._offsets[number] = offset
+                else:
+                    self._offsets.append(offset)
+            size = f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+        index_path = self.index_path(path)
+        if not index_path.exists():
+            self._write_index(path, self._offsets, size)
+            return
+        with index_path.open("r+b") as f:
+            for number in invoice_numbers:
+                f.seek(INDEX_HEADER.size + number * OFFSET_SIZE)
+                f.write(struct.pack("<Q", self._offsets[number]))
+            f.seek(0)
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, size))
+
+    def _write_index(self, filename: str | Path, offsets: array, size: int) -> None:
+        """Write whole index file."""
+        with atomic_open(self.index_path(filename), "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, size))
+            f.write(offsets.tobytes())
+
+    def _read_index(self, path: Path) -> array:
+        """
+        Read index of database file, rebuilding it if it is out of date.
+
+        Raises
+        ------
+            FileNotFoundError: if database file not found
+        """
+        size = path.stat().st_size
+        offsets = array("Q")
+        covered = 0
+        try:
+            raw = self.index_path(path).read_bytes()
+            magic, covered = INDEX_HEADER.unpack_from(raw)
+            if magic != INDEX_MAGIC or covered > size:
+                covered = 0
+            else:
+                offsets.frombytes(raw[INDEX_HEADER.size :])
+        except (FileNotFoundError, struct.error, ValueError):
+            covered = 0
+        if covered == size:
+            return offsets
+        logger.debug("Rebuild index of %s from byte %s", path, covered)
+        if covered == 0:
+            offsets = array("Q")
+        size = self._scan(path, covered, offsets)
+        self._write_index(path, offsets, size)
+        return offsets
+
+    @staticmethod
+    def _scan(path: Path, start: int, offsets: array) -> int:
+        """
+        Add lines of database file from start to offsets.
+
+        Incomplete last line left by a crash is cut off.
+
+        Returns
+        -------
+            int: size of the file
+        """
+        with path.open("r+b") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    f.truncate(offset)
+                    break
+                number = json.loads(line)["number"]
+                if number < len(offsets):
+                    offsets[number] = offset
+                else:
+                    offsets.append(offset)
+                offset += len(line)
+            return offset
@@ -0,0 +1,184 @@
+"""Planner fetching exchange rates for whole dataset with NBP range queries."""
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from task3_dsw.logger import logger
+from task3_dsw.nbp_api import (
+    AsyncNBPApiClient,
+    ExchangeRateRangeSchema,
+    NBPApiClient,
+    NBPApiError,
+)
+
+if TYPE_CHECKING:
+    import datetime
+    from collections.abc import Iterable, Iterator
+
+    from task3_dsw.database import Invoice
+
+__all__ = ["MAX_RANGE_DAYS", "RatePlanner", "iter_required_rates"]
+
+# NBP api does not allow range queries longer than 93 days
+MAX_RANGE_DAYS = 93
+
+
+def iter_required_rates(invoice: Invoice) -> Iterator[tuple[str, datetime.date]]:
+    """
+    Yield (currency, date) pairs needed to calculate invoice.
+
+    Mirrors rates requested by Database.calulate_payments_for_invoice and
+    Database.calculate_difference.
+
+    Args:
+    ----
+        invoice: Invoice
+
+    Yields:
+    ------
+        tuple[currency code, date]
+    """
+    if invoice.currency != "PLN":
+        yield invoice.currency, invoice.date
+    for payment in invoice.payments:
+        if payment.currency != "PLN":
+            yield payment.currency, payment.date
+        if invoice.currency == payment.currency:
+            continue
+        if invoice.currency == "PLN":
+            yield payment.currency, invoice.date
+            yield payment.currency, payment.date
+        else:
+            yield invoice.currency, invoice.date
+            yield invoice.currency, payment.date
+
+
+class RatePlanner:
+    """Turn exchange rates needed by invoices into a few NBP range queries."""
+
+    def __init__(
+        self,
+        nbp_api_client: NBPApiClient | AsyncNBPApiClient,
+        table: str = "A",
+        max_days: int = MAX_RANGE_DAYS,
+    ) -> None:
+        """
+        Initialize RatePlanner.
+
+        Args:
+        ----
+            nbp_api_client: sync or async client used to fetch and cache exchange rates
+            table: NBP table
+            max_days: maximum number of days covered by one query
+        """
+        self.nbp_api_client = nbp_api_client
+        self.table = table
+        self.max_days = max_days
+
+    def collect(self, invoices: Iterable[Invoice]) -> dict[str, set[datetime.date]]:
+        """
+        Collect distinct dates of exchange rates not cached yet, per currency.
+
+        Args:
+        ----
+            invoices: invoices to scan
+
+        Returns:
+        -------
+            dict[currency code, set of dates]
+        """
+        cache = self.nbp_api_client.cache
+        needed: dict[str, set[datetime.date]] = {}
+        for invoice in invoices:
+            for code, date in iter_required_rates(invoice):
+                if date in needed.get(code, ()):
+                    continue
+                if not cache.has(self.table, code, date):
+                    needed.setdefault(code, set()).add(date)
+        return needed
+
+    def plan(
+        self, needed: dict[str, set[datetime.date]]
+    ) -> list[ExchangeRateRangeSchema]:
+        """
+        Group needed dates into range queries no longer than max_days.
+
+        Args:
+        ----
+            needed: dict[currency code, set of dates]
+
+        Returns:
+        -------
+            list[ExchangeRateRangeSchema]
+        """
+        queries = []
+        for code in sorted(needed):
+            dates = sorted(needed[code])
+            start_date = end_date = dates[0]
+            for date in dates[1:]:
+                if (date - start_date).days >= self.max_days:
+                    queries.append(self._query(code, start_date, end_date))
+                    start_date = date
+                end_date = date
+            queries.append(self._query(code, start_date, end_date))
+        return queries
+
+    def _query(
+        self, code: str, start_date: datetime.date, end_date: datetime.date
+    ) -> ExchangeRateRangeSchema:
+        """Create range query."""
+        return ExchangeRateRangeSchema(
+            table=self.table, code=code, start_date=start_date, end_date=end_date
+        )
+
+    def prefetch(self, invoices: Iterable[Invoice]) -> int:
+        """
+        Fetch and cache all exchange rates needed by invoices.
+
+        Queries which fail are skipped, their rates are fetched one by one
+        during calculation.
+
+        Args:
+        ----
+            invoices: invoices to scan
+
+        Returns:
+        -------
+            int: number of range queries sent
+        """
+        queries = self.plan(self.collect(invoices))
+        for query in queries:
+            try:
+                self.nbp_api_client.get_exchange_rates(query)
+            except NBPApiError as e:  # noqa: PERF203
+                logger.error("Prefetch of %s failed: %s", query, e)
+        logger.debug("Prefetched exchange rates with %s range queries", len(queries))
+        return len(queries)
+
+    async def aprefetch(self, invoices: Iterable[Invoice]) -> int:
+        """
+        Fetch and cache all exchange rates needed by invoices concurrently.
+
+        Requires AsyncNBPApiClient, which limits number of requests in flight.
+
+        Args:
+        ----
+            invoices: invoices to scan
+
+        Returns:
+        -------
+            int: number of range queries sent
+        """
+        queries = self.plan(self.collect(invoices))
+        results = await asyncio.gather(
+            *(self.nbp_api_client.get_exchange_rates(query) for query in queries),
+            return_exceptions=True,
+        )
+        for query, result in zip(queries, results, strict=True):
+            if isinstance(result, NBPApiError):
+                logger.error("Prefetch of %s failed: %s", query, result)
+            elif isinstance(result, Exception):
+                raise result
+        logger.debug("Prefetched exchange rates with %s range queries", len(queries))
+        return len(queries)
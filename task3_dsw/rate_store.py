@@ -0,0 +1,220 @@
+"""Offline store of NBP table A exchange rates imported from archive files."""
+from __future__ import annotations
+
+import csv
+import datetime
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+__all__ = ["RateStore", "StoredRate"]
+
+# Column header of archive file, e.g. "1USD" or "100HUF"
+CURRENCY_COLUMN = re.compile(r"^(\d+)([A-Z]{3})$")
+FULL_TABLE_NUMBER_COLUMN = "pełny numer tabeli"
+TABLE_NUMBER_COLUMN = "nr tabeli"
+CURRENCY_NAME_ROW = "nazwa waluty"
+ARCHIVE_ENCODING = "cp1250"
+
+
+class StoredRate(NamedTuple):
+    """
+    Exchange rate kept in rate store.
+
+    Attributes
+    ----------
+        no: str - full number of NBP table
+        mid: float - average rate for one unit of currency
+        currency: str - name of currency
+    """
+
+    no: str
+    mid: float
+    currency: str
+
+
+class RateStore:
+    """
+    SQLite store with rates of NBP table A for every imported day.
+
+    Rates are imported from yearly archive csv files published by NBP
+    (archiwum_tab_a_YYYY.csv). Store remembers which dates are covered by
+    imported files, so a missing rate on a covered date means no rate was
+    published that day.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """
+        Initialize RateStore.
+
+        Args:
+        ----
+            path: path to sqlite file, ":memory:" for a store living in memory
+        """
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS rates (
+                    code TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    mid REAL NOT NULL,
+                    no TEXT NOT NULL,
+                    PRIMARY KEY (code, date)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS currencies (
+                    code TEXT PRIMARY KEY,
+                    name TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS coverage (
+                    start TEXT NOT NULL,
+                    end TEXT NOT NULL
+                );
+                """
+            )
+
+    def import_csv(self, filename: str | Path) -> int:
+        """
+        Import rates from NBP archive csv file of table A.
+
+        Args:
+        ----
+            filename: path to archive csv file
+
+        Returns:
+        -------
+            int: number of imported rates
+
+        Raises:
+        ------
+            ValueError: if file is not an archive of table A
+        """
+        with Path(filename).open(encoding=ARCHIVE_ENCODING, newline="") as f:
+            rows = list(csv.reader(f, delimiter=";"))
+        header = next((row for row in rows if row and row[0] == "data"), None)
+        if header is None or TABLE_NUMBER_COLUMN not in header:
+            msg = f"{filename} is not NBP table A archive file."
+            raise ValueError(msg)
+        # Older archives have only short number of table
+        full_number = FULL_TABLE_NUMBER_COLUMN in header
+        number_column = header.index(
+            FULL_TABLE_NUMBER_COLUMN if full_number else TABLE_NUMBER_COLUMN
+        )
+        columns = [
+            (index, match.group(2), int(match.group(1)))
+            for index, column in enumerate(header)
+            if (match := CURRENCY_COLUMN.match(column.strip()))
+        ]
+        rates = []
+        names = {}
+        for row in rows:
+            if not row:
+                continue
+            if row[0] == CURRENCY_NAME_ROW:
+                names = {code: row[index] for index, code, _ in columns}
+                continue
+            if not (len(row[0]) == 8 and row[0].isdigit()):  # noqa: PLR2004
+                continue
+            date = datetime.datetime.strptime(row[0], "%Y%m%d").date()  # noqa: DTZ007
+            number = row[number_column]
+            if not full_number:
+                number = f"{int(number):03}/A/NBP/{date.year}"
+            rates.extend(
+                (
+                    code,
+                    str(date),
+                    float(row[index].replace(",", ".")) / units,
+                    number,
+                )
+                for index, code, units in columns
+                if index < len(row) and row[index]
+            )
+        if not rates:
+            return 0
+        dates = sorted({rate[1] for rate in rates})
+        # Days before first table of the year have no rates published either
+        start = dates[0][:4] + "-01-01"
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO rates VALUES (?, ?, ?, ?)", rates
+            )
+            self._connection.executemany(
+                "INSERT INTO currencies VALUES (?, ?) ON CONFLICT (code) "
+                "DO UPDATE SET name = excluded.name WHERE excluded.name != ''",
+                [(code, names.get(code, "")) for _, code, _ in columns],
+            )
+            self._connection.execute(
+                "INSERT INTO coverage VALUES (?, ?)", (start, dates[-1])
+            )
+        return len(rates)
+
+    def get(self, code: str, date: datetime.date | str) -> StoredRate | None:
+        """
+        Get exchange rate from store.
+
+        Args:
+        ----
+            code: currency code
+            date: date of exchange rate
+
+        Returns:
+        -------
+            StoredRate or None if rate is not stored
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT no, mid, COALESCE(name, '') FROM rates "
+                "LEFT JOIN currencies USING (code) WHERE code = ? AND date = ?",
+                (code, str(date)),
+            ).fetchone()
+        return StoredRate(*row) if row is not None else None
+
+    def get_range(
+        self, code: str, start: datetime.date, end: datetime.date
+    ) -> dict[datetime.date, StoredRate]:
+        """
+        Get exchange rates stored for days in range.
+
+        Returns
+        -------
+            dict[datetime.date, StoredRate]: rates by effective date
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT date, no, mid, COALESCE(name, '') FROM rates "
+                "LEFT JOIN currencies USING (code) "
+                "WHERE code = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (code, str(start), str(end)),
+            ).fetchall()
+        return {
+            datetime.date.fromisoformat(date): StoredRate(no, mid, name)
+            for date, no, mid, name in rows
+        }
+
+    def covers(self, start: datetime.date, end: datetime.date | None = None) -> bool:
+        """Return True if every day from start to end is covered by imported files."""
+        end = end or start
+        with self._lock:
+            spans = self._connection.execute(
+                "SELECT start, end FROM coverage ORDER BY start"
+            ).fetchall()
+        day = start
+        for span_start, span_end in spans:
+            if datetime.date.fromisoformat(span_start) > day:
+                break
+            day = max(
+                day, datetime.date.fromisoformat(span_end) + datetime.timedelta(1)
+            )
+            if day > end:
+                return True
+        return False
+
+    def close(self) -> None:
+        """Close connection to sqlite file."""
+        self._connection.close()
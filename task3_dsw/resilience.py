@@ -0,0 +1,427 @@
+"""Transport retrying, rate limiting and coalescing requests to NBP api."""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, NamedTuple
+
+import httpx
+
+from task3_dsw.logger import logger
+from task3_dsw.metrics import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from task3_dsw.settings import Settings
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "ResilientTransport",
+    "TokenBucket",
+]
+
+# Statuses of responses worth retrying, NBP answers 404 when there is no rate
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Request refused because circuit breaker is open."""
+
+
+class TokenBucket:
+    """
+    Token bucket limiting rate of requests.
+
+    Tokens are reserved in advance, so callers waiting at the same time
+    get consecutive slots instead of racing for the next token.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initialize full TokenBucket.
+
+        Args:
+        ----
+            rate: tokens added per second
+            burst: maximum number of tokens
+            clock: monotonic clock in seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take one token.
+
+        Returns
+        -------
+            float: seconds to wait before token may be used
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker failing fast after consecutive failures.
+
+    After threshold failures in a row the circuit opens and requests are
+    refused. When reset_timeout passes one request is let through: success
+    closes the circuit, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initialize closed CircuitBreaker.
+
+        Args:
+        ----
+            threshold: number of consecutive failures opening the circuit
+            reset_timeout: seconds after which open circuit lets one request through
+            clock: monotonic clock in seconds
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Return "closed", "open" or "half-open"."""
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Return True if request may be sent."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self) -> None:
+        """Record successful request, closing the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self) -> None:
+        """Record failed request, opening the circuit after threshold failures."""
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning("Circuit breaker of NBP api opened.")
+                self._opened_at = self._clock()
+                self._probing = False
+
+
+class _Answer(NamedTuple):
+    """Read response shared by coalesced requests."""
+
+    status_code: int
+    headers: httpx.Headers
+    content: bytes
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> _Answer:
+        """Return answer of read response."""
+        return cls(response.status_code, response.headers, response.content)
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        """Return new response to request."""
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=request,
+        )
+
+
+class _Flight:
+    """Request in flight in another thread."""
+
+    __slots__ = ("done", "answer", "error")
+
+    def __init__(self) -> None:
+        """Initialize _Flight."""
+        self.done = threading.Event()
+        self.answer: _Answer | None = None
+        self.error: BaseException | None = None
+
+
+class ResilientTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Transport retrying failed requests at a limited rate.
+
+    Every attempt waits for a token of rate limiter and passes circuit
+    breaker. Timeouts, connection errors and responses with RETRY_STATUSES
+    are retried with jittered exponential backoff. Identical requests sent
+    at the same time share one call to inner transport. Same instance can
+    be used by sync and async clients.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        transport: httpx.BaseTransport | None = None,
+        async_transport: httpx.AsyncBaseTransport | None = None,
+        *,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        rate_limit: float = 0.0,
+        burst: int = 1,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """
+        Initialize ResilientTransport.
+
+        Args:
+        ----
+            transport: transport sending sync requests, network if None
+            async_transport: transport sending async requests, network if None
+            retries: number of retries after first attempt
+            backoff: delay before first retry in seconds, doubled for next ones
+            max_backoff: maximum delay before retry in seconds
+            rate_limit: maximum number of requests per second, 0 for no limit
+            burst: number of requests which may be sent at once
+            breaker: circuit breaker, one failing fast after 5 failures if None
+        """
+        self._transport = transport
+        self._async_transport = async_transport
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit > 0 else None
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._flights: dict[str, _Flight] = {}
+        self._async_flights: dict[str, asyncio.Future[_Answer]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: Settings,
+        transport: httpx.BaseTransport | None = None,
+        async_transport: httpx.AsyncBaseTransport | None = None,
+    ) -> ResilientTransport:
+        """
+        Create transport configured by NBP_* settings.
+
+        Args:
+        ----
+            settings: Settings
+            transport: transport sending sync requests, network if None
+            async_transport: transport sending async requests, network if None
+
+        Returns:
+        -------
+            ResilientTransport
+        """
+        return cls(
+            transport,
+            async_transport,
+            retries=settings.NBP_RETRIES,
+            backoff=settings.NBP_BACKOFF,
+            max_backoff=settings.NBP_MAX_BACKOFF,
+            rate_limit=settings.NBP_RATE_LIMIT,
+            burst=settings.NBP_RATE_BURST,
+            breaker=CircuitBreaker(
+                settings.NBP_BREAKER_THRESHOLD, settings.NBP_BREAKER_RESET
+            ),
+        )
+
+    @staticmethod
+    def _key(request: httpx.Request) -> str:
+        """Return key of identical requests."""
+        return f"{request.method} {request.url}"
+
+    def _delay(self, attempt: int, answer: _Answer | None) -> float:
+        """Return seconds to wait before retry after failed attempt."""
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        # Equal jitter: spread retries of many clients, keep half of delay
+        delay = delay / 2 + random.uniform(0, delay / 2)  # noqa: S311
+        if answer is not None:
+            retry_after = answer.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, min(self.max_backoff, float(retry_after)))
+        return delay
+
+    def _before_attempt(self, request: httpx.Request) -> float:
+        """Check circuit breaker and return seconds to wait for rate limiter."""
+        if not self.breaker.allow():
+            metrics.inc("nbp_circuit_open_total")
+            msg = "Circuit breaker of NBP api is open."
+            raise CircuitOpenError(msg, request=request)
+        wait = self.bucket.reserve() if self.bucket is not None else 0.0
+        if wait:
+            metrics.observe("nbp_throttled_seconds", wait)
+        return wait
+
+    def _after_attempt(
+        self, attempt: int, answer: _Answer | None, error: Exception | None
+    ) -> float | None:
+        """
+        Record result of attempt.
+
+        Returns
+        -------
+            seconds to wait before retry or None if result is final
+        """
+        if answer is not None and answer.status_code not in RETRY_STATUSES:
+            self.breaker.success()
+            return None
+        self.breaker.failure()
+        if attempt >= self.retries:
+            return None
+        metrics.inc("nbp_retries_total")
+        logger.debug(
+            "Retry NBP request after %s",
+            error if answer is None else f"status {answer.status_code}",
+        )
+        return self._delay(attempt, answer)
+
+    def _send(self, request: httpx.Request) -> _Answer:
+        """Send request with retries."""
+        if self._transport is None:
+            self._transport = httpx.HTTPTransport()
+        attempt = 0
+        while True:
+            time.sleep(self._before_attempt(request))
+            answer = error = None
+            try:
+                response = self._transport.handle_request(request)
+                try:
+                    response.read()
+                finally:
+                    response.close()
+                answer = _Answer.from_response(response)
+            except httpx.TransportError as exc:
+                error = exc
+            delay = self._after_attempt(attempt, answer, error)
+            if delay is None:
+                if answer is None:
+                    raise error
+                return answer
+            time.sleep(delay)
+            attempt += 1
+
+    async def _asend(self, request: httpx.Request) -> _Answer:
+        """Send async request with retries."""
+        if self._async_transport is None:
+            self._async_transport = httpx.AsyncHTTPTransport()
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._before_attempt(request))
+            answer = error = None
+            try:
+                response = await self._async_transport.handle_async_request(request)
+                try:
+                    await response.aread()
+                finally:
+                    await response.aclose()
+                answer = _Answer.from_response(response)
+            except httpx.TransportError as exc:
+                error = exc
+            delay = self._after_attempt(attempt, answer, error)
+            if delay is None:
+                if answer is None:
+                    raise error
+                return answer
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Send request or wait for identical request in flight."""
+        key = self._key(request)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            metrics.inc("nbp_coalesced_total")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.answer.to_response(request)
+        try:
+            flight.answer = self._send(request)
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.answer.to_response(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send async request or wait for identical request in flight."""
+        key = self._key(request)
+        future = self._async_flights.get(key)
+        if future is not None:
+            metrics.inc("nbp_coalesced_total")
+            answer = await asyncio.shield(future)
+            return answer.to_response(request)
+        future = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            answer = await self._asend(request)
+        except Exception as exc:
+            future.set_exception(exc)
+            # Exception is raised here, waiting requests get it from future
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(answer)
+        finally:
+            del self._async_flights[key]
+        return answer.to_response(request)
+
+    def close(self) -> None:
+        """Close inner sync transport."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def aclose(self) -> None:
+        """Close inner async transport."""
+        if self._async_transport is not None:
+            await self._async_transport.aclose()
+            self._async_transport = None
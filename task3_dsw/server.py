@@ -0,0 +1,365 @@
+"""Local HTTP/JSON api keeping database and NBP client warm between requests."""
+from __future__ import annotations
+
+import asyncio
+import datetime  # noqa: TCH003
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import TYPE_CHECKING, NamedTuple
+from urllib.parse import unquote, urlsplit
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from task3_dsw.database import AddInvoice, AddPayment
+from task3_dsw.logger import logger
+from task3_dsw.metrics import metrics
+from task3_dsw.nbp_api import NBPApiError
+from task3_dsw.tracing import tracer
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from task3_dsw.database import Database, Invoice, Payment
+
+__all__ = ["ApiError", "DatabaseServer", "serve"]
+
+# Limits of request head and body in bytes
+MAX_HEAD_SIZE = 16 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class ApiError(Exception):
+    """Error answered to client with status and message."""
+
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        """Initialize ApiError."""
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class NewRecord(BaseModel):
+    """Fields of invoice or payment set by client, the rest is set by server."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    amount: float
+    currency: str
+    date: datetime.date
+
+
+class Request(NamedTuple):
+    """Parsed HTTP request."""
+
+    method: str
+    path: str
+    headers: dict[str, str]
+    body: bytes
+
+
+class DatabaseServer:
+    """
+    Asyncio HTTP/1.1 server answering json requests with Database methods.
+
+    Database and NBP client are used from one worker thread, so requests
+    are applied one at a time in order of arrival while the event loop
+    keeps reading other connections. Every change is committed to the
+    write-ahead log before it is answered.
+
+    Endpoints:
+        GET  /health
+        POST /invoices                                  NewRecord json
+        GET  /invoices/{id}
+        POST /invoices/{id}/payments                    NewRecord json
+        GET  /invoices/{id}/status
+        GET  /invoices/{id}/payments/{id}/difference
+    """
+
+    def __init__(self, database: Database) -> None:
+        """
+        Initialize DatabaseServer.
+
+        Args:
+        ----
+            database: loaded Database
+        """
+        self.database = database
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="database"
+        )
+        self._routes: list[tuple[str, re.Pattern, Callable[..., object]]] = [
+            ("GET", re.compile(r"/health"), self.health),
+            ("POST", re.compile(r"/invoices"), self.add_invoice),
+            ("GET", re.compile(r"/invoices/([^/]+)"), self.get_invoice),
+            ("POST", re.compile(r"/invoices/([^/]+)/payments"), self.add_payment),
+            ("GET", re.compile(r"/invoices/([^/]+)/status"), self.invoice_status),
+            (
+                "GET",
+                re.compile(r"/invoices/([^/]+)/payments/([^/]+)/difference"),
+                self.exchange_rate_difference,
+            ),
+        ]
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        """
+        Start listening for connections.
+
+        Args:
+        ----
+            host: address to listen on
+            port: port to listen on, 0 for any free port
+
+        Returns:
+        -------
+            asyncio.Server
+        """
+        return await asyncio.start_server(
+            self._handle_connection, host, port, limit=MAX_HEAD_SIZE
+        )
+
+    def close(self) -> None:
+        """Wait for running request and save database."""
+        self._executor.shutdown(wait=True)
+        self.database.save()
+
+    # Operations run in database thread
+
+    def health(self, _: bytes) -> dict:
+        """Return number of invoices in database."""
+        return {"status": "ok", "invoices": len(self.database.get_invoices())}
+
+    def add_invoice(self, body: bytes) -> tuple[HTTPStatus, BaseModel]:
+        """Add invoice given as NewRecord json, with id generated by server."""
+        invoice = AddInvoice(**NewRecord.model_validate_json(body).model_dump())
+        try:
+            invoice = self.database.add_invoice(invoice)
+        except ValueError as e:
+            raise ApiError(HTTPStatus.CONFLICT, str(e)) from e
+        self.database.commit()
+        return HTTPStatus.CREATED, invoice
+
+    def get_invoice(self, _: bytes, invoice_id: str) -> Invoice:
+        """Return invoice."""
+        return self._invoice(invoice_id)
+
+    def add_payment(self, body: bytes, invoice_id: str) -> tuple[HTTPStatus, BaseModel]:
+        """Add payment given as NewRecord json to invoice, with id generated by server."""
+        fields = NewRecord.model_validate_json(body)
+        invoice = self._invoice(invoice_id)
+        payment = self.database.add_payment(invoice, AddPayment(**fields.model_dump()))
+        self.database.commit()
+        return HTTPStatus.CREATED, payment
+
+    def invoice_status(self, _: bytes, invoice_id: str) -> dict:
+        """Calculate status of invoice with amounts in PLN."""
+        invoice = self._invoice(invoice_id)
+        result = self.database.calulate_payments_for_invoice(invoice)
+        if result is None:
+            msg = f"Status of invoice {invoice_id} could not be calculated."
+            raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, msg)
+        sum_of_payments, invoice_amount, status = result
+        self.database.commit()
+        return {
+            "id": invoice.id,
+            "status": status,
+            "invoice_amount": invoice_amount,
+            "sum_of_payments": sum_of_payments,
+        }
+
+    def exchange_rate_difference(
+        self, _: bytes, invoice_id: str, payment_id: str
+    ) -> dict:
+        """Calculate exchange rate difference of payment."""
+        invoice = self._invoice(invoice_id)
+        payment = self._payment(invoice, payment_id)
+        difference = self.database.calculate_difference(invoice, payment)
+        self.database.commit()
+        return {
+            "id": payment.id,
+            "exchange_rate_difference": difference,
+            "currency": payment.currency,
+        }
+
+    def _invoice(self, invoice_id: str) -> Invoice:
+        """Return invoice or raise ApiError if it does not exist."""
+        invoice = self.database.get_invoice_by_id(invoice_id)
+        if invoice is None:
+            msg = f"Invoice {invoice_id} not found."
+            raise ApiError(HTTPStatus.NOT_FOUND, msg)
+        return invoice
+
+    @staticmethod
+    def _payment(invoice: Invoice, payment_id: str) -> Payment:
+        """Return payment of invoice or raise ApiError if it does not exist."""
+        for payment in invoice.payments:
+            if payment.id == payment_id:
+                return payment
+        msg = f"Payment {payment_id} not found."
+        raise ApiError(HTTPStatus.NOT_FOUND, msg)
+
+    # HTTP
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer requests of one keep-alive connection."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ApiError as e:
+                    await self._respond(
+                        writer, e.status, {"error": e.message}, keep_alive=False
+                    )
+                    return
+                if request is None:
+                    return
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                status, payload = await self._dispatch(request)
+                await self._respond(writer, status, payload, keep_alive=keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Request | None:
+        """
+        Read one request from connection.
+
+        Returns
+        -------
+            Request or None if connection was closed
+
+        Raises
+        ------
+            ApiError: if request is malformed or too large
+        """
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Incomplete request.") from e
+        except asyncio.LimitOverrunError as e:
+            msg = "Request head too large."
+            raise ApiError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, msg) from e
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ")
+            headers = {
+                name.strip().lower(): value.strip()
+                for name, value in (line.split(":", 1) for line in lines[1:] if line)
+            }
+            length = int(headers.get("content-length", 0))
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed request.") from e
+        if length < 0:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Malformed request.")
+        if length > MAX_BODY_SIZE:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, unquote(urlsplit(target).path), headers, body)
+
+    async def _dispatch(self, request: Request) -> tuple[HTTPStatus, object]:
+        """Run operation of request in database thread and return its answer."""
+        start = time.perf_counter()
+        with tracer.span("server.request", method=request.method, path=request.path):
+            try:
+                operation, args = self._route(request)
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, operation, request.body, *args
+                )
+            except ApiError as e:
+                result = e.status, {"error": e.message}
+            except ValidationError as e:
+                errors = json.loads(e.json(include_url=False, include_input=False))
+                result = HTTPStatus.UNPROCESSABLE_ENTITY, {"error": errors}
+            except NBPApiError as e:
+                result = HTTPStatus.BAD_GATEWAY, {"error": str(e)}
+            except Exception:  # noqa: BLE001
+                # Connection stays usable, client gets json error instead of nothing
+                logger.exception("Request %s %s failed", request.method, request.path)
+                result = (
+                    HTTPStatus.INTERNAL_SERVER_ERROR,
+                    {"error": "Internal server error."},
+                )
+        status, payload = (
+            result if isinstance(result, tuple) else (HTTPStatus.OK, result)
+        )
+        metrics.inc("server_requests_total")
+        metrics.observe("server_request_seconds", time.perf_counter() - start)
+        return status, payload
+
+    def _route(self, request: Request) -> tuple[Callable[..., object], tuple]:
+        """Return operation and path arguments of request."""
+        allowed = False
+        for method, pattern, operation in self._routes:
+            match = pattern.fullmatch(request.path.rstrip("/"))
+            if match is None:
+                continue
+            if method == request.method:
+                return operation, match.groups()
+            allowed = True
+        if allowed:
+            msg = f"Method {request.method} not allowed."
+            raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, msg)
+        msg = f"Path {request.path} not found."
+        raise ApiError(HTTPStatus.NOT_FOUND, msg)
+
+    @staticmethod
+    async def _respond(
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        payload: object,
+        *,
+        keep_alive: bool,
+    ) -> None:
+        """Write json response."""
+        if isinstance(payload, BaseModel):
+            body = payload.model_dump_json().encode()
+        else:
+            body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+
+def serve(database: Database, host: str, port: int) -> None:
+    """
+    Serve database until interrupted, then save it.
+
+    Args:
+    ----
+        database: loaded Database
+        host: address to listen on
+        port: port to listen on
+    """
+    server = DatabaseServer(database)
+
+    async def run() -> None:
+        listener = await server.start(host, port)
+        addresses = ", ".join(
+            f"{socket.getsockname()[0]}:{socket.getsockname()[1]}"
+            for socket in listener.sockets
+        )
+        print(f"Serving {database.settings.DATABASE_PATH} on {addresses}.")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logger.debug("Server interrupted.")
+    finally:
+        server.close()
@@ -3,6 +3,12 @@ from __future__ import annotations
 
 from pydantic_settings import BaseSettings
 
+# Choices of command line options, kept here so that parsing arguments does not
+# import storage backends, codecs or calculation engines
+DATABASE_BACKENDS = ("json", "ndjson", "sqlite")
+DATABASE_CODECS = ("compact", "pretty", "gzip", "lzma")
+BATCH_ENGINES = ("scalar", "numpy")
+
 
 class Settings(BaseSettings):
     """
@@ -12,12 +18,50 @@ class Settings(BaseSettings):
     ----------
         DEBUG: bool - debug mode
         CURRENCIES: list[str] - list of valid currencies
+        DATABASE_BACKEND: str - storage backend of database, "json", "ndjson" or "sqlite"
+        DATABASE_CODEC: str - codec of json files, "compact", "pretty", "gzip" or "lzma"
+        DATABASE_SNAPSHOT: bool - write binary snapshot next to json database file
+        NBP_API_URL: str - base url of NBP api
+        RATE_CACHE_PATH: str - path to exchange rate cache, ":memory:" to disable persistence
+        RATE_CACHE_MAX_ENTRIES: int - maximum number of cached exchange rates
+        NBP_CONCURRENCY: int - maximum number of concurrent requests to NBP api
+        NBP_RETRIES: int - number of retries of failed request to NBP api
+        NBP_BACKOFF: float - seconds before first retry, doubled for next ones
+        NBP_MAX_BACKOFF: float - maximum number of seconds before retry
+        NBP_RATE_LIMIT: float - maximum number of requests to NBP api per second, 0 for no limit
+        NBP_RATE_BURST: int - number of requests to NBP api which may be sent at once
+        NBP_BREAKER_THRESHOLD: int - number of failed requests in a row stopping requests to NBP api
+        NBP_BREAKER_RESET: float - seconds after which stopped requests are tried again
+        WAL_CHECKPOINT_INTERVAL: int - number of logged changes saved to database file at once
+        RATE_STORE_PATH: str - path to offline store of rates imported from NBP archive files
+        RATE_STORE_FALLBACK: bool - ask NBP api for rates missing in offline store
+        SERVER_HOST: str - address of HTTP/JSON api served with --serve
+        SERVER_PORT: int - port of HTTP/JSON api served with --serve
 
     """
 
     DEBUG: bool = False
     DATABASE_PATH: str = "./data/database.json"
+    DATABASE_BACKEND: str = "json"
+    DATABASE_CODEC: str = "compact"
+    DATABASE_SNAPSHOT: bool = True
     CURRENCIES: list[str] = ["EUR", "USD", "GBP", "PLN"]
+    NBP_API_URL: str = "http://api.nbp.pl/api/"
+    RATE_CACHE_PATH: str = "./data/rates.sqlite3"
+    RATE_CACHE_MAX_ENTRIES: int = 100_000
+    NBP_CONCURRENCY: int = 8
+    NBP_RETRIES: int = 3
+    NBP_BACKOFF: float = 0.5
+    NBP_MAX_BACKOFF: float = 10.0
+    NBP_RATE_LIMIT: float = 10.0
+    NBP_RATE_BURST: int = 10
+    NBP_BREAKER_THRESHOLD: int = 5
+    NBP_BREAKER_RESET: float = 30.0
+    WAL_CHECKPOINT_INTERVAL: int = 100
+    RATE_STORE_PATH: str = "./data/nbp_rates.sqlite3"
+    RATE_STORE_FALLBACK: bool = True
+    SERVER_HOST: str = "127.0.0.1"
+    SERVER_PORT: int = 8080
 
 
 settings = Settings()
@@ -0,0 +1,317 @@
+"""Binary columnar snapshot of json database file, read through mmap."""
+from __future__ import annotations
+
+import datetime
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from task3_dsw.database import InvoiceStatus, atomic_open
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from types import TracebackType
+    from typing import Self
+
+    from task3_dsw.database import Invoice
+
+__all__ = ["InvoiceRow", "PaymentRow", "Snapshot", "write_snapshot"]
+
+MAGIC = b"T3SNAP" + (b"LE" if sys.byteorder == "little" else b"BE")
+VERSION = 1
+STATUSES = list(InvoiceStatus)
+# Columns in order of file: name and array typecode, "B" for string data
+COLUMNS = (
+    ("invoice_amount", "d"),
+    ("invoice_date", "i"),
+    ("invoice_currency", "B"),
+    ("invoice_status", "B"),
+    ("invoice_payments", "Q"),
+    ("invoice_id_offsets", "Q"),
+    ("invoice_ids", "B"),
+    ("invoice_id_order", "Q"),
+    ("payment_amount", "d"),
+    ("payment_date", "i"),
+    ("payment_currency", "B"),
+    ("payment_id_offsets", "Q"),
+    ("payment_ids", "B"),
+    ("codes", "B"),
+)
+# Magic, version, size and modification time of source file in nanoseconds
+HEADER = struct.Struct("=8sIQq")
+SECTION = struct.Struct("=QQ")
+ALIGNMENT = 8
+
+
+class InvoiceRow(NamedTuple):
+    """Invoice fields kept in snapshot, printed like Invoice."""
+
+    id: str
+    amount: float
+    currency: str
+    date: datetime.date
+    status: InvoiceStatus
+    payment_count: int
+
+    def __str__(self) -> str:
+        """Return string representation of invoice."""
+        return f"<{self.amount} | {self.currency} | {self.date} | {self.status}>"
+
+
+class PaymentRow(NamedTuple):
+    """Payment fields kept in snapshot, printed like Payment."""
+
+    id: str
+    amount: float
+    currency: str
+    date: datetime.date
+
+    def __str__(self) -> str:
+        """Return string representation of payment."""
+        return f"<{self.amount} | {self.currency} | {self.date}>"
+
+
+def _source_stamp(source: str | Path) -> tuple[int, int]:
+    """Return size and modification time of source file."""
+    stat = Path(source).stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def write_snapshot(
+    filename: str | Path, invoices: Iterable[Invoice], source: str | Path
+) -> None:
+    """
+    Write snapshot of invoices saved in source file.
+
+    Args:
+    ----
+        filename: path to snapshot file
+        invoices: invoices saved in source file
+        source: path to json database file, snapshot is valid until it changes
+    """
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+    codes: dict[str, int] = {}
+    invoice_ids = []
+    payment_ids = bytearray()
+    columns["invoice_payments"].append(0)
+    columns["invoice_id_offsets"].append(0)
+    columns["payment_id_offsets"].append(0)
+    for invoice in invoices:
+        invoice_ids.append(invoice.id.encode())
+        columns["invoice_id_offsets"].append(
+            columns["invoice_id_offsets"][-1] + len(invoice_ids[-1])
+        )
+        columns["invoice_amount"].append(invoice.amount)
+        columns["invoice_date"].append(invoice.date.toordinal())
+        columns["invoice_currency"].append(
+            codes.setdefault(invoice.currency, len(codes))
+        )
+        columns["invoice_status"].append(STATUSES.index(InvoiceStatus(invoice.status)))
+        for payment in invoice.payments:
+            payment_ids += payment.id.encode()
+            columns["payment_id_offsets"].append(len(payment_ids))
+            columns["payment_amount"].append(payment.amount)
+            columns["payment_date"].append(payment.date.toordinal())
+            columns["payment_currency"].append(
+                codes.setdefault(payment.currency, len(codes))
+            )
+        columns["invoice_payments"].append(len(columns["payment_amount"]))
+    columns["invoice_ids"].frombytes(b"".join(invoice_ids))
+    # Positions of invoices sorted by id, for lookups by binary search
+    columns["invoice_id_order"].extend(
+        sorted(range(len(invoice_ids)), key=invoice_ids.__getitem__)
+    )
+    columns["payment_ids"].frombytes(payment_ids)
+    columns["codes"].frombytes("\n".join(codes).encode())
+
+    size, mtime = _source_stamp(source)
+    offset = HEADER.size + SECTION.size * len(COLUMNS)
+    sections = []
+    for name, _ in COLUMNS:
+        offset += -offset % ALIGNMENT
+        length = len(columns[name]) * columns[name].itemsize
+        sections.append((offset, length))
+        offset += length
+    with atomic_open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size, mtime))
+        for section in sections:
+            f.write(SECTION.pack(*section))
+        for (name, _), (section_offset, _) in zip(COLUMNS, sections, strict=True):
+            f.write(bytes(section_offset - f.tell()))
+            columns[name].tofile(f)
+
+
+class Snapshot:
+    """
+    Read-only view of invoices in snapshot file.
+
+    File is mapped to memory and columns are read in place, so listing a
+    page of invoices or looking one up touches only a few pages of file.
+    """
+
+    def __init__(self, filename: str | Path) -> None:
+        """
+        Open snapshot file.
+
+        Args:
+        ----
+            filename: path to snapshot file
+
+        Raises:
+        ------
+            ValueError: if file is not a snapshot of this version
+        """
+        with Path(filename).open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = buffer = memoryview(self._mmap)
+        self._columns = {}
+        try:
+            magic, version, self.source_size, self.source_mtime = HEADER.unpack_from(
+                buffer
+            )
+            for index, (name, typecode) in enumerate(COLUMNS):
+                offset, length = SECTION.unpack_from(
+                    buffer, HEADER.size + SECTION.size * index
+                )
+                with buffer[offset : offset + length] as section:
+                    self._columns[name] = section.cast(typecode)
+        except (struct.error, TypeError) as e:
+            self.close()
+            msg = f"{filename} is not a valid snapshot."
+            raise ValueError(msg) from e
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            msg = f"{filename} is not a snapshot of version {VERSION}."
+            raise ValueError(msg)
+        self._codes = bytes(self._columns["codes"]).decode().split("\n")
+
+    @classmethod
+    def open(cls, filename: str | Path, source: str | Path) -> Snapshot | None:
+        """
+        Open snapshot if it is up to date with source file.
+
+        Args:
+        ----
+            filename: path to snapshot file
+            source: path to json database file
+
+        Returns:
+        -------
+            Snapshot or None if snapshot is missing, invalid or stale
+        """
+        try:
+            snapshot = cls(filename)
+        except (OSError, ValueError):
+            return None
+        try:
+            stamp = _source_stamp(source)
+        except OSError:
+            stamp = None
+        if stamp != (snapshot.source_size, snapshot.source_mtime):
+            snapshot.close()
+            return None
+        return snapshot
+
+    def __len__(self) -> int:
+        """Return number of invoices."""
+        return len(self._columns["invoice_amount"])
+
+    def __getitem__(self, index: int) -> InvoiceRow:
+        """Return invoice at index."""
+        if not 0 <= index < len(self):
+            msg = f"Invoice index {index} out of range."
+            raise IndexError(msg)
+        columns = self._columns
+        return InvoiceRow(
+            id=self._string("invoice", index),
+            amount=columns["invoice_amount"][index],
+            currency=self._codes[columns["invoice_currency"][index]],
+            date=datetime.date.fromordinal(columns["invoice_date"][index]),
+            status=STATUSES[columns["invoice_status"][index]],
+            payment_count=columns["invoice_payments"][index + 1]
+            - columns["invoice_payments"][index],
+        )
+
+    def __iter__(self) -> Iterator[InvoiceRow]:
+        """Iterate over invoices."""
+        for index in range(len(self)):
+            yield self[index]
+
+    def payments(self, index: int) -> list[PaymentRow]:
+        """
+        Return payments of invoice at index.
+
+        Args:
+        ----
+            index: index of invoice
+
+        Returns:
+        -------
+            list[PaymentRow]
+        """
+        columns = self._columns
+        start, end = columns["invoice_payments"][index : index + 2]
+        return [
+            PaymentRow(
+                id=self._string("payment", position),
+                amount=columns["payment_amount"][position],
+                currency=self._codes[columns["payment_currency"][position]],
+                date=datetime.date.fromordinal(columns["payment_date"][position]),
+            )
+            for position in range(start, end)
+        ]
+
+    def index_of(self, invoice_id: str) -> int | None:
+        """
+        Find invoice by id with binary search.
+
+        Args:
+        ----
+            invoice_id: id of invoice
+
+        Returns:
+        -------
+            int: index of invoice or None if not found
+        """
+        order = self._columns["invoice_id_order"]
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if self._string("invoice", order[middle]) < invoice_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(order) and self._string("invoice", order[low]) == invoice_id:
+            return order[low]
+        return None
+
+    def _string(self, kind: str, index: int) -> str:
+        """Return id of invoice or payment at index."""
+        offsets = self._columns[f"{kind}_id_offsets"]
+        return bytes(
+            self._columns[f"{kind}_ids"][offsets[index] : offsets[index + 1]]
+        ).decode()
+
+    def close(self) -> None:
+        """Release columns and unmap file."""
+        for column in self._columns.values():
+            column.release()
+        self._columns = {}
+        self._buffer.release()
+        self._mmap.close()
+
+    def __enter__(self) -> Self:
+        """Return snapshot."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close snapshot."""
+        self.close()
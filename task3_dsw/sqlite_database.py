@@ -0,0 +1,295 @@
+"""Database storing invoices and payments in SQLite tables."""
+from __future__ import annotations
+
+import contextlib
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pydantic import ValidationError
+
+from task3_dsw.database import (
+    DataSchema,
+    Invoice,
+    InvoiceStatus,
+    Payment,
+    TrackedDatabase,
+    paused_gc,
+)
+from task3_dsw.logger import logger
+from task3_dsw.metrics import metrics
+from task3_dsw.nbp_api import ExchangeRateSchemaResponse
+from task3_dsw.tracing import tracer
+
+if TYPE_CHECKING:
+    import datetime
+    from collections.abc import Iterator
+
+__all__ = ["SQLiteDatabase"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    number INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    exchange_rate TEXT,
+    input_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS payments (
+    invoice_number INTEGER NOT NULL REFERENCES invoices (number) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    date TEXT NOT NULL,
+    exchange_rate TEXT,
+    exchange_rate_difference REAL,
+    input_hash TEXT,
+    PRIMARY KEY (invoice_number, position)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS invoices_id ON invoices (id);
+CREATE INDEX IF NOT EXISTS invoices_date ON invoices (date);
+CREATE INDEX IF NOT EXISTS invoices_currency ON invoices (currency);
+CREATE INDEX IF NOT EXISTS invoices_status ON invoices (status);
+CREATE INDEX IF NOT EXISTS payments_date ON payments (date);
+CREATE INDEX IF NOT EXISTS payments_currency ON payments (currency);
+"""
+
+
+class SQLiteDatabase(TrackedDatabase):
+    """
+    SQLite database with invoices and payments in indexed tables.
+
+    Changed invoices are written in one transaction on save, so a failed
+    save leaves the file unchanged.
+    """
+
+    @contextlib.contextmanager
+    def _connect(self, filename: str | Path) -> Iterator[sqlite3.Connection]:
+        """Open connection to sqlite file with schema created."""
+        connection = sqlite3.connect(filename)
+        try:
+            connection.executescript(SCHEMA)
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @metrics.timed("database_load_seconds")
+    @tracer.traced("database.load")
+    def load(self) -> bool:
+        """
+        Load data from sqlite file, creating empty database if file not found.
+
+        Returns
+        -------
+            bool: False if file is not valid, it is logged and data is kept
+        """
+        path = Path(self.settings.DATABASE_PATH)
+        if not path.exists():
+            self.data = DataSchema(invoices=[])
+            self._mark_loaded()
+            self._replay_wal()
+            self.save()
+            return True
+        try:
+            with self._connect(path) as connection, paused_gc():
+                invoices = self._select_invoices(connection, "", ())
+        except (sqlite3.DatabaseError, ValidationError) as e:
+            logger.error(e)
+            return False
+        self.data = DataSchema.model_construct(invoices=invoices)
+        self._mark_loaded()
+        self._replay_wal()
+        self._remember_files()
+        return True
+
+    @metrics.timed("database_save_seconds")
+    @tracer.traced("database.save")
+    def save(self) -> None:
+        """Save changed invoices to sqlite file in one transaction."""
+        filename = self.output_file or self.settings.DATABASE_PATH
+        if self._needs_full_write(filename):
+            # Build new file next to the old one and swap them
+            with tempfile.TemporaryDirectory(dir=Path(filename).parent) as tmpdir:
+                new_filename = Path(tmpdir) / Path(filename).name
+                with self._connect(new_filename) as connection:
+                    self._write(connection, range(len(self.data.invoices)))
+                new_filename.replace(filename)
+            if Path(filename) == Path(self.settings.DATABASE_PATH):
+                self._mark_loaded()
+            self._wal_saved(filename)
+            return
+        with self._connect(filename) as connection:
+            self._write(connection, sorted(self._dirty))
+        self._dirty.clear()
+        self._wal_saved(filename)
+
+    def compact(self) -> int:
+        """
+        Rebuild sqlite file to reclaim free pages.
+
+        Returns
+        -------
+            int: number of bytes reclaimed
+        """
+        path = Path(self.settings.DATABASE_PATH)
+        size = path.stat().st_size
+        connection = sqlite3.connect(path)
+        try:
+            connection.execute("VACUUM")
+        finally:
+            connection.close()
+        return size - path.stat().st_size
+
+    def find_invoices(
+        self,
+        status: InvoiceStatus | None = None,
+        currency: str | None = None,
+        date_from: datetime.date | None = None,
+        date_to: datetime.date | None = None,
+    ) -> list[Invoice]:
+        """
+        Find invoices in sqlite file using indexes, without loading database.
+
+        Args:
+        ----
+            status: status of invoice
+            currency: currency of invoice
+            date_from: first date of invoice
+            date_to: last date of invoice
+
+        Returns:
+        -------
+            list[Invoice]
+        """
+        conditions = []
+        parameters = []
+        for condition, value in (
+            ("invoices.status = ?", status.value if status else None),
+            ("invoices.currency = ?", currency),
+            ("invoices.date >= ?", date_from),
+            ("invoices.date <= ?", date_to),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(str(value))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect(self.settings.DATABASE_PATH) as connection:
+            return self._select_invoices(connection, where, parameters)
+
+    @staticmethod
+    def _select_invoices(
+        connection: sqlite3.Connection, where: str, parameters: tuple | list
+    ) -> list[Invoice]:
+        """Select invoices matching where clause with their payments."""
+        rows = connection.execute(
+            f"SELECT * FROM invoices {where} ORDER BY number",  # noqa: S608
+            parameters,
+        ).fetchall()
+        payments: dict[int, list[Payment]] = {row[0]: [] for row in rows}
+        for payment_row in connection.execute(
+            "SELECT * FROM payments ORDER BY invoice_number, position"
+            if not where
+            else f"SELECT payments.* FROM payments JOIN invoices ON number = invoice_number {where} "  # noqa: S608
+            "ORDER BY invoice_number, position",
+            parameters,
+        ):
+            (
+                invoice_number,
+                _,
+                payment_id,
+                amount,
+                currency,
+                date,
+                exchange_rate,
+                difference,
+                payment_hash,
+            ) = payment_row
+            payments[invoice_number].append(
+                Payment(
+                    id=payment_id,
+                    amount=amount,
+                    currency=currency,
+                    date=date,
+                    exchange_rate=_load_exchange_rate(exchange_rate),
+                    exchange_rate_difference=difference,
+                    input_hash=payment_hash,
+                )
+            )
+        return [
+            Invoice(
+                id=invoice_id,
+                amount=amount,
+                currency=currency,
+                date=date,
+                status=status,
+                exchange_rate=_load_exchange_rate(exchange_rate),
+                payments=payments[number],
+                input_hash=invoice_hash,
+            )
+            for (
+                number,
+                invoice_id,
+                amount,
+                currency,
+                date,
+                status,
+                exchange_rate,
+                invoice_hash,
+            ) in rows
+        ]
+
+    def _write(
+        self, connection: sqlite3.Connection, invoice_numbers: range | list[int]
+    ) -> None:
+        """Replace rows of invoices with given numbers and their payments."""
+        for number in invoice_numbers:
+            invoice = self.data.invoices[number]
+            connection.execute(
+                "INSERT OR REPLACE INTO invoices VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    number,
+                    invoice.id,
+                    invoice.amount,
+                    invoice.currency,
+                    str(invoice.date),
+                    InvoiceStatus(invoice.status).value,
+                    _dump_exchange_rate(invoice.exchange_rate),
+                    invoice.input_hash,
+                ),
+            )
+            connection.execute(
+                "DELETE FROM payments WHERE invoice_number = ?", (number,)
+            )
+            connection.executemany(
+                "INSERT INTO payments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        number,
+                        position,
+                        payment.id,
+                        payment.amount,
+                        payment.currency,
+                        str(payment.date),
+                        _dump_exchange_rate(payment.exchange_rate),
+                        payment.exchange_rate_difference,
+                        payment.input_hash,
+                    )
+                    for position, payment in enumerate(invoice.payments)
+                ],
+            )
+
+
+def _dump_exchange_rate(exchange_rate: ExchangeRateSchemaResponse | None) -> str | None:
+    """Serialize exchange rate to json column."""
+    return exchange_rate.model_dump_json() if exchange_rate is not None else None
+
+
+def _load_exchange_rate(value: str | None) -> ExchangeRateSchemaResponse | None:
+    """Deserialize exchange rate from json column."""
+    return ExchangeRateSchemaResponse.model_validate_json(value) if value else None
@@ -0,0 +1,52 @@
+"""Selection of database storage backend."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from task3_dsw.database import Database
+from task3_dsw.ndjson_database import NDJSONDatabase
+from task3_dsw.sqlite_database import SQLiteDatabase
+
+if TYPE_CHECKING:
+    from task3_dsw.nbp_api import NBPApiClient
+    from task3_dsw.settings import Settings
+
+__all__ = ["BACKENDS", "create_database"]
+
+BACKENDS: dict[str, type[Database]] = {
+    "json": Database,
+    "ndjson": NDJSONDatabase,
+    "sqlite": SQLiteDatabase,
+}
+
+
+def create_database(
+    settings: Settings,
+    nbp_api_client: NBPApiClient,
+    output_file: str | None = None,
+) -> Database:
+    """
+    Create database of backend selected in settings.
+
+    Args:
+    ----
+        settings: Settings with DATABASE_BACKEND
+        nbp_api_client: NBPApiClient
+        output_file: path to output file
+
+    Returns:
+    -------
+        Database
+
+    Raises:
+    ------
+        ValueError: if backend is not known
+    """
+    try:
+        database_class = BACKENDS[settings.DATABASE_BACKEND]
+    except KeyError as e:
+        msg = f"Database backend {settings.DATABASE_BACKEND} is not valid."
+        raise ValueError(msg) from e
+    return database_class(
+        settings=settings, nbp_api_client=nbp_api_client, output_file=output_file
+    )
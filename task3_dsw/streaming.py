@@ -0,0 +1,204 @@
+"""Streaming reader and writer of invoices in json database files."""
+from __future__ import annotations
+
+import json
+import textwrap
+from typing import IO, TYPE_CHECKING
+
+from task3_dsw.database import (
+    DECOMPRESSION_ERRORS,
+    Invoice,
+    open_data_reader,
+    open_data_writer,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+    from types import TracebackType
+    from typing import Self
+
+__all__ = ["InvoiceWriter", "iter_invoices"]
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+
+
+class _JSONStream:
+    """Buffered reader of json values from a text file, read chunk by chunk."""
+
+    def __init__(self, f: IO[str], chunk_size: int) -> None:
+        """Initialize _JSONStream."""
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Read next chunk, dropping consumed part of buffer."""
+        if self.eof:
+            return False
+        try:
+            chunk = self.f.read(self.chunk_size)
+        except DECOMPRESSION_ERRORS as e:
+            msg = f"Cannot read compressed json file: {e}"
+            raise ValueError(msg) from e
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return next non whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                msg = "Unexpected end of json file."
+                raise ValueError(msg)
+
+    def expect(self, char: str) -> None:
+        """Consume char or raise ValueError."""
+        if self.peek() != char:
+            msg = f"Expected {char!r} at position {self.pos} of json chunk."
+            raise ValueError(msg)
+        self.pos += 1
+
+    def value(self) -> object:
+        """Decode next json value, reading more chunks until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # number at the end of buffer may continue in next chunk
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_invoices(
+    filename: str | Path, chunk_size: int = CHUNK_SIZE
+) -> Iterator[Invoice]:
+    """
+    Yield validated invoices from json database file one at a time.
+
+    Only one invoice is kept in memory, so memory use does not grow with
+    size of the file.
+
+    Args:
+    ----
+        filename: path to json database file
+        chunk_size: number of characters read at once
+
+    Yields:
+    ------
+        Invoice
+
+    Raises:
+    ------
+        ValueError: if file is not a valid database file
+        ValidationError: if invoice is not valid
+    """
+    with open_data_reader(filename) as f:
+        stream = _JSONStream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key == "invoices":
+                stream.expect("[")
+                if stream.peek() == "]":
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield Invoice.model_validate(stream.value())
+                        if stream.peek() == "]":
+                            stream.pos += 1
+                            break
+                        stream.expect(",")
+            else:
+                stream.value()
+            if stream.peek() == "}":
+                return
+            stream.expect(",")
+
+
+class InvoiceWriter:
+    """
+    Writer of json database file, invoice by invoice.
+
+    Produces the same file as Database.save with the same codec and
+    replaces filename atomically when closed.
+    """
+
+    def __init__(self, filename: str | Path, codec: str = "compact") -> None:
+        """
+        Initialize InvoiceWriter.
+
+        Args:
+        ----
+            filename: path to output file
+            codec: codec of output file, one of database.CODECS
+        """
+        self.filename = filename
+        self.codec = codec
+        self.count = 0
+        self._context = None
+        self._file = None
+
+    def __enter__(self) -> Self:
+        """Open temporary output file."""
+        self._context = open_data_writer(self.filename, self.codec)
+        self._file = self._context.__enter__()
+        self._write(
+            '{\n    "invoices": [' if self.codec == "pretty" else '{"invoices":['
+        )
+        return self
+
+    def _write(self, text: str) -> None:
+        """Write text to output file."""
+        self._file.write(text.encode())
+
+    def write(self, invoice: Invoice) -> None:
+        """
+        Write invoice to output file.
+
+        Args:
+        ----
+            invoice: Invoice
+        """
+        if self.codec == "pretty":
+            separator = ",\n" if self.count else "\n"
+            self._write(
+                separator + textwrap.indent(invoice.model_dump_json(indent=4), " " * 8)
+            )
+        else:
+            self._write(("," if self.count else "") + invoice.model_dump_json())
+        self.count += 1
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> bool | None:
+        """Finish output file and replace filename with it."""
+        if exc_type is None:
+            if self.codec == "pretty":
+                self._write("\n    ]\n}" if self.count else "]\n}")
+            else:
+                self._write("]}")
+        return self._context.__exit__(exc_type, exc, traceback)
@@ -0,0 +1,224 @@
+"""Tracing of nested spans exported as Chrome trace-event json."""
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, ParamSpec, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import TracebackType
+    from typing import Self
+
+__all__ = ["NULL_SPAN", "Span", "Tracer", "tracer"]
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class Span:
+    """Span of time recorded by tracer when it is closed."""
+
+    __slots__ = ("_tracer", "name", "args", "start", "tid")
+
+    def __init__(self, tracer: Tracer, name: str, args: dict[str, object]) -> None:
+        """Initialize Span."""
+        self._tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+        self.tid = 0
+
+    def set(self, key: str, value: object) -> None:
+        """Set argument of span shown in trace viewer."""
+        self.args[key] = value
+
+    def __enter__(self) -> Self:
+        """Start span."""
+        self.tid = self._tracer.track()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Record span, with name of exception if one was raised."""
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self._tracer.record(self, end)
+
+
+class _NullSpan:
+    """Span returned when tracing is disabled, records nothing."""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: object) -> None:
+        """Ignore argument."""
+
+    def __enter__(self) -> Self:
+        """Return null span."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Do nothing."""
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Recorder of spans of one process.
+
+    Spans of a thread or of an asyncio task are shown on their own track,
+    spans opened inside other spans are nested. When tracer is disabled
+    span() returns NULL_SPAN and traced functions are called directly.
+    Spans of batch worker processes are not recorded.
+    """
+
+    def __init__(self) -> None:
+        """Initialize disabled Tracer."""
+        self.enabled = False
+        self.events: list[tuple[str, int, int, int, dict[str, object]]] = []
+        self._origin = time.perf_counter_ns()
+        self._tracks: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Forget recorded spans."""
+        with self._lock:
+            self.events = []
+            self._tracks = {}
+            self._origin = time.perf_counter_ns()
+
+    def span(self, name: str, **args: object) -> Span | _NullSpan:
+        """
+        Return context manager recording span.
+
+        Args:
+        ----
+            name: name of span
+            **args: arguments of span shown in trace viewer
+
+        Returns:
+        -------
+            Span or NULL_SPAN if tracing is disabled
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def traced(self, name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+        """
+        Decorate function to record every call as span.
+
+        Args:
+        ----
+            name: name of span
+
+        Returns:
+        -------
+            decorator
+        """
+
+        def decorator(func: Callable[P, R]) -> Callable[P, R]:
+            @functools.wraps(func)
+            def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, name, {}):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def track(self) -> int:
+        """Return number of track of current asyncio task or thread."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        with self._lock:
+            return self._tracks.setdefault(key, len(self._tracks) + 1)
+
+    def record(self, span: Span, end: int) -> None:
+        """Record closed span."""
+        with self._lock:
+            self.events.append(
+                (
+                    span.name,
+                    span.start - self._origin,
+                    end - span.start,
+                    span.tid,
+                    span.args,
+                )
+            )
+
+    def trace_events(self) -> list[dict[str, object]]:
+        """
+        Return recorded spans as Chrome trace events.
+
+        Returns
+        -------
+            list of complete events with times in microseconds
+        """
+        pid = os.getpid()
+        events: list[dict[str, object]] = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": "task3_dsw"},
+            }
+        ]
+        for name, start, duration, tid, args in self.events:
+            event = {
+                "name": name,
+                "cat": name.partition(".")[0],
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+            }
+            if args:
+                event["args"] = args
+            events.append(event)
+        return events
+
+    def save(self, filename: str | Path) -> None:
+        """
+        Write recorded spans to Chrome trace-event json file.
+
+        File opens in Perfetto UI or chrome://tracing.
+
+        Args:
+        ----
+            filename: path to trace file
+        """
+        with Path(filename).open("w") as f:
+            json.dump(
+                {"traceEvents": self.trace_events(), "displayTimeUnit": "ms"},
+                f,
+                default=str,
+            )
+
+
+tracer = Tracer()
@@ -0,0 +1,83 @@
+"""Write-ahead log of changed invoices."""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import IO
+
+from task3_dsw.logger import logger
+
+__all__ = ["WriteAheadLog"]
+
+
+class WriteAheadLog:
+    """
+    Append-only log with one json record per line.
+
+    Every append is flushed and fsynced before it returns, so records
+    survive a crash. Incomplete last line left by a crash is ignored and
+    cut off on next read.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize WriteAheadLog."""
+        self.path = Path(path)
+        self._file: IO[bytes] | None = None
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return number of records in log."""
+        return self._count
+
+    def append(self, records: list[str]) -> None:
+        """
+        Append records to log with one fsync.
+
+        Args:
+        ----
+            records: list of json strings without new lines
+        """
+        if not records:
+            return
+        if self._file is None:
+            self._file = self.path.open("ab")
+        self._file.write("".join(f"{record}\n" for record in records).encode())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._count += len(records)
+
+    def read(self) -> list[str]:
+        """
+        Read complete records from log.
+
+        Returns
+        -------
+            list[str]: json records in order of appending
+        """
+        try:
+            with self.path.open("r+b") as f:
+                records = []
+                offset = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        logger.debug("Cut incomplete record of %s", self.path)
+                        f.truncate(offset)
+                        break
+                    records.append(line.decode())
+                    offset += len(line)
+        except FileNotFoundError:
+            records = []
+        self._count = len(records)
+        return records
+
+    def clear(self) -> None:
+        """Remove all records after they are saved in database file."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self._count = 0
+
+    def close(self) -> None:
+        """Close log file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,7 +1,12 @@
+import datetime
+import json
 from pathlib import Path
 import tempfile
 from unittest.mock import Mock
+import httpx
 import pytest
+from task3_dsw.batch import calculate_invoice
+from task3_dsw.cassette import CassetteTransport
 from task3_dsw.database import Database, Invoice, InvoiceStatus
 from task3_dsw.database import Payment
 from task3_dsw.nbp_api import NBPApiClient
@@ -18,10 +23,40 @@ def nbp_api_client_mock():
     """Mock for NBPApiClient."""
     return Mock()
 
+CASSETTE_PATH = Path(__file__).parent / "cassettes" / "nbp.json"
+
+
 @pytest.fixture
 def nbp_api_client():
-    """Mock for NBPApiClient."""
-    return NBPApiClient()
+    """NBPApiClient replaying recorded responses of NBP api."""
+    return NBPApiClient(transport=CassetteTransport(CASSETTE_PATH))
+
+def fake_nbp_rate(code, date):
+    """Deterministic rate published by fake NBP api on weekdays."""
+    return {"no": f"{date.timetuple().tm_yday:03}/A/NBP/{date.year}", "effectiveDate": str(date), "mid": round(4 + date.timetuple().tm_yday / 1000, 4)}
+
+
+@pytest.fixture
+def fake_nbp_transport():
+    """Transport serving fake NBP api, requested paths are stored in calls."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        parts = request.url.path.strip("/").split("/")
+        table, code = parts[3], parts[4]
+        start = datetime.date.fromisoformat(parts[5])
+        end = datetime.date.fromisoformat(parts[-1])
+        days = (start + datetime.timedelta(days=day) for day in range((end - start).days + 1))
+        rates = [fake_nbp_rate(code, day) for day in days if day.weekday() < 5]
+        if not rates:
+            return httpx.Response(404, text="404 NotFound - Not Found - Brak danych")
+        return httpx.Response(200, json={"table": table, "currency": code.lower(), "code": code, "rates": rates})
+
+    transport = httpx.MockTransport(handler)
+    transport.calls = calls
+    return transport
+
 
 @pytest.fixture
 def test_invoice_schema():
@@ -56,4 +91,77 @@ def test_database(settings, nbp_api_client):
         settings.DATABASE_PATH = database_path
         database = Database(settings=settings, nbp_api_client=nbp_api_client)
         database.load()
-        yield database
\ No newline at end of file
+        yield database
+
+
+LEDGER = {
+    "invoices": [
+        {
+            "id": "invoice-1",
+            "amount": 100.0,
+            "currency": "EUR",
+            "date": "2024-01-02",
+            "status": "Nie zaplacona",
+            "exchange_rate": None,
+            "payments": [
+                {"id": "payment-1-1", "amount": 400.0, "currency": "PLN", "date": "2024-01-03", "exchange_rate": None, "exchange_rate_difference": 0.0},
+            ],
+        },
+        {
+            "id": "invoice-2",
+            "amount": 500.0,
+            "currency": "PLN",
+            "date": "2024-02-01",
+            "status": "Nie zaplacona",
+            "exchange_rate": None,
+            "payments": [
+                {"id": "payment-2-1", "amount": 50.0, "currency": "USD", "date": "2024-02-05", "exchange_rate": None, "exchange_rate_difference": 0.0},
+                {"id": "payment-2-2", "amount": 100.0, "currency": "USD", "date": "2024-05-06", "exchange_rate": None, "exchange_rate_difference": 0.0},
+            ],
+        },
+        {
+            "id": "invoice-3",
+            "amount": 10.0,
+            "currency": "PLN",
+            "date": "2024-03-01",
+            "status": "Nie zaplacona",
+            "exchange_rate": None,
+            "payments": [],
+        },
+    ]
+}
+
+
+@pytest.fixture
+def ledger():
+    return json.loads(json.dumps(LEDGER))
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(LEDGER))
+    return path
+
+
+@pytest.fixture
+def batch_database(ledger_path, fake_nbp_transport):
+    settings = Settings(DATABASE_PATH=str(ledger_path), CURRENCIES=["EUR", "USD", "PLN"])
+    nbp_api_client = NBPApiClient()
+    nbp_api_client.client = httpx.Client(base_url=nbp_api_client.api_url, transport=fake_nbp_transport)
+    database = Database(settings=settings, nbp_api_client=nbp_api_client, output_file=str(ledger_path.parent / "output.json"))
+    database.load()
+    return database
+
+
+@pytest.fixture
+def expected_results(ledger_path, fake_nbp_transport):
+    """Results of calculating ledger one rate request at a time."""
+    settings = Settings(DATABASE_PATH=str(ledger_path), CURRENCIES=["EUR", "USD", "PLN"])
+    nbp_api_client = NBPApiClient()
+    nbp_api_client.client = httpx.Client(base_url=nbp_api_client.api_url, transport=fake_nbp_transport)
+    database = Database(settings=settings, nbp_api_client=nbp_api_client)
+    database.load()
+    for invoice in database.get_invoices():
+        calculate_invoice(database, invoice)
+    return database.data
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from task3_dsw.batch import process_invoices, run_batch
+from task3_dsw.database import AddPayment, InvoiceStatus
+from task3_dsw.nbp_api import AsyncNBPApiClient
+from task3_dsw.planner import RatePlanner
+
+def test_run_batch_fetches_rates_concurrently(batch_database, fake_nbp_transport, ledger_path, expected_results):
+    requests_before = len(fake_nbp_transport.calls)
+    async_client = AsyncNBPApiClient(cache=batch_database.nbp_api_client.cache, concurrency=2)
+    async_client.client = httpx.AsyncClient(base_url=async_client.api_url, transport=fake_nbp_transport)
+    asyncio.run(run_batch(batch_database, async_client))
+
+    # one range query per currency and quarter, nothing fetched one by one
+    assert len(fake_nbp_transport.calls) - requests_before == 3
+    statuses = [invoice.status for invoice in batch_database.get_invoices()]
+    assert statuses[2] == InvoiceStatus.UNPAID
+    assert batch_database.data == expected_results
+    output = json.loads((ledger_path.parent / "output.json").read_text())
+    assert len(output["invoices"]) == 3
+
+
+def test_process_invoices_with_workers(batch_database, fake_nbp_transport, expected_results):
+    RatePlanner(batch_database.nbp_api_client).prefetch(batch_database.get_invoices())
+    requests_before = len(fake_nbp_transport.calls)
+    process_invoices(batch_database, workers=2)
+
+    # workers got rates from the prefetched cache
+    assert len(fake_nbp_transport.calls) == requests_before
+    assert batch_database.data == expected_results
+
+
+@pytest.mark.parametrize(("checkpoint", "saves"), [(0, 1), (2, 2), (1, 4)])
+def test_process_invoices_saves_at_checkpoints(batch_database, mocker, checkpoint, saves):
+    save = mocker.spy(batch_database, "save")
+    process_invoices(batch_database, checkpoint=checkpoint)
+    assert save.call_count == saves
+
+
+def test_incremental_batch_skips_unchanged(batch_database, fake_nbp_transport, ledger_path, expected_results):
+    process_invoices(batch_database)
+    assert process_invoices(batch_database, incremental=True) == 6
+
+    # new payment changes its invoice, other payments of it are skipped
+    batch_database.add_payment(batch_database.get_invoice(1), AddPayment(amount=10, currency="USD", date="2024-05-07"))
+    batch_database.data.invoices[0].payments[0].amount = 300.0
+    requests_before = len(fake_nbp_transport.calls)
+    async_client = AsyncNBPApiClient(cache=batch_database.nbp_api_client.cache)
+    async_client.client = httpx.AsyncClient(base_url=async_client.api_url, transport=fake_nbp_transport)
+    result = asyncio.run(run_batch(batch_database, async_client, incremental=True))
+
+    assert result == (3, 2 + 1)
+    assert len(fake_nbp_transport.calls) - requests_before == 1
+    payments = batch_database.data.invoices[1].payments
+    assert payments[2].exchange_rate is not None
+    assert payments[2].input_hash == batch_database.payment_input_hash(batch_database.data.invoices[1], payments[2])
+    assert process_invoices(batch_database, incremental=True) == 7
+
+
+def test_incremental_batch_with_workers(batch_database, expected_results):
+    RatePlanner(batch_database.nbp_api_client).prefetch(batch_database.get_invoices())
+    process_invoices(batch_database, workers=2)
+    assert batch_database.data == expected_results
+    assert process_invoices(batch_database, workers=2, incremental=True) == 6
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+from benchmarks.fake_nbp import FakeNBPServer
+from benchmarks.ledger import generate_ledger, parse_currencies
+from benchmarks.suite import compare, scaling
+from task3_dsw.database import DataSchema
+from task3_dsw.nbp_api import ExchangeRateSchema, NBPApiClient, NBPApiError
+from task3_dsw.settings import settings
+
+
+def test_generate_ledger(tmp_path):
+    path = tmp_path / "ledger.json"
+    payments = generate_ledger(path, 50, payments_per_invoice=2, currencies=parse_currencies("EUR=1,PLN=1"))
+    data = DataSchema(**json.loads(path.read_text()))
+    assert len(data.invoices) == 50
+    assert sum(len(invoice.payments) for invoice in data.invoices) == payments
+    assert {invoice.currency for invoice in data.invoices} == {"EUR", "PLN"}
+
+    generate_ledger(tmp_path / "same.json", 50, payments_per_invoice=2, currencies={"EUR": 1, "PLN": 1})
+    assert (tmp_path / "same.json").read_text() == path.read_text()
+
+
+def test_fake_nbp_server(monkeypatch):
+    with FakeNBPServer() as server:
+        monkeypatch.setattr(settings, "NBP_API_URL", server.url)
+        client = NBPApiClient()
+        response = client.get_exchange_rate(ExchangeRateSchema(table="A", code="USD", date="2024-01-02"))
+        assert response.rates[0].no == "002/A/NBP/2024"
+        with pytest.raises(NBPApiError):
+            client.get_exchange_rate(ExchangeRateSchema(table="A", code="USD", date="2024-01-06"))
+        assert server.requests == 2
+
+
+def test_report_comparison():
+    results = [
+        {"scenario": "load", "invoices": 100, "seconds": 0.1, "requests": 0},
+        {"scenario": "load", "invoices": 1000, "seconds": 5.0, "requests": 0},
+        {"scenario": "calculate", "invoices": 100, "seconds": 0.2, "requests": 10},
+        {"scenario": "calculate", "invoices": 1000, "seconds": 2.0, "requests": 50},
+    ]
+    assert scaling(results) == {"load": 5.0, "calculate": 1.0}
+
+    old = {"results": [{**result, "seconds": 1.0, "requests": 10} for result in results]}
+    regressions = compare({"results": results}, old, tolerance=0.25)
+    assert [(regression["scenario"], regression["invoices"]) for regression in regressions] == [("load", 1000), ("calculate", 1000)]
@@ -0,0 +1,77 @@
+import httpx
+import pytest
+from task3_dsw.cache import RateCache
+from task3_dsw.nbp_api import ExchangeRateSchema, NBPApiClient, NBPApiError
+
+EUR_RESPONSE = {'table': 'A', 'currency': 'euro', 'code': 'EUR', 'rates': [{'no': '001/A/NBP/2024', 'effectiveDate': '2024-01-02', 'mid': 4.3434}]}
+
+
+def mock_client(handler, cache=None):
+    """Create NBPApiClient which sends requests to handler instead of api.nbp.pl."""
+    client = NBPApiClient(cache=cache)
+    client.client = httpx.Client(base_url=client.api_url, transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_rate_cache_hit_and_miss():
+    cache = RateCache()
+    assert cache.get("A", "EUR", "2024-01-02") is None
+    cache.set("a", "EUR", "2024-01-02", '{"table": "A"}')
+    entry = cache.get("A", "EUR", "2024-01-02")
+    assert entry.payload == '{"table": "A"}'
+    assert not entry.negative
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_rate_cache_negative_entry():
+    cache = RateCache()
+    cache.set("A", "EUR", "2024-01-06", None)
+    assert cache.get("A", "EUR", "2024-01-06").negative
+
+
+def test_rate_cache_evicts_oldest_entries():
+    cache = RateCache(max_entries=2)
+    cache.set_many([("A", "EUR", f"2024-01-0{day}", "{}") for day in range(1, 4)])
+    assert len(cache) == 2
+    assert cache.get("A", "EUR", "2024-01-01") is None
+    assert cache.get("A", "EUR", "2024-01-03") is not None
+
+
+def test_rate_cache_is_persistent(tmp_path):
+    path = str(tmp_path / "rates.sqlite3")
+    cache = RateCache(path)
+    cache.set("A", "EUR", "2024-01-02", "{}")
+    cache.close()
+    assert RateCache(path).get("A", "EUR", "2024-01-02") is not None
+
+
+def test_nbp_api_client_uses_cache():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json=EUR_RESPONSE)
+
+    client = mock_client(handler)
+    data = ExchangeRateSchema(code="EUR", table="A", date="2024-01-02")
+    first = client.get_exchange_rate(data)
+    second = client.get_exchange_rate(data)
+    assert first == second
+    assert second.rates[0].mid == 4.3434
+    assert len(calls) == 1
+    assert client.cache.stats()["hits"] == 1
+
+
+def test_nbp_api_client_caches_missing_rate():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(404, text="404 NotFound - Not Found - Brak danych")
+
+    client = mock_client(handler)
+    data = ExchangeRateSchema(code="EUR", table="A", date="2024-01-06")
+    for _ in range(2):
+        with pytest.raises(NBPApiError):
+            client.get_exchange_rate(data)
+    assert len(calls) == 1
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import pytest
+from task3_dsw.cassette import CassetteTransport
+from task3_dsw.nbp_api import AsyncNBPApiClient, ExchangeRateSchema, NBPApiClient, NBPApiError
+
+
+def rate_request(code, date):
+    return ExchangeRateSchema(code=code, date=date)
+
+
+def test_cassette_records_and_replays(tmp_path, settings, fake_nbp_transport):
+    path = tmp_path / "cassette.json"
+    recorder = NBPApiClient(transport=CassetteTransport(path, "record", transport=fake_nbp_transport))
+    recorded = recorder.get_exchange_rate(rate_request("EUR", "2024-01-02"))
+    with pytest.raises(NBPApiError):
+        recorder.get_exchange_rate(rate_request("EUR", "2024-01-06"))
+    assert len(fake_nbp_transport.calls) == 2
+    assert not path.exists()
+    recorder.client.close()
+    assert len(json.loads(path.read_text())["interactions"]) == 2
+
+    replayer = NBPApiClient(transport=CassetteTransport(path))
+    assert replayer.get_exchange_rate(rate_request("EUR", "2024-01-02")) == recorded
+    with pytest.raises(NBPApiError, match="404"):
+        replayer.get_exchange_rate(rate_request("EUR", "2024-01-06"))
+    with pytest.raises(NBPApiError, match="not recorded"):
+        replayer.get_exchange_rate(rate_request("USD", "2024-01-02"))
+    assert len(fake_nbp_transport.calls) == 2
+
+
+def test_cassette_records_async_requests(tmp_path, fake_nbp_transport):
+    path = tmp_path / "cassette.json"
+
+    async def fetch(transport):
+        async with AsyncNBPApiClient(transport=transport) as client:
+            return await client.get_exchange_rate(rate_request("USD", "2024-01-03"))
+
+    recorded = asyncio.run(fetch(CassetteTransport(path, "record", async_transport=fake_nbp_transport)))
+    assert asyncio.run(fetch(CassetteTransport(path))) == recorded
+    assert len(fake_nbp_transport.calls) == 1
+
+
+def test_cassette_rejects_invalid_files(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CassetteTransport(tmp_path / "missing.json")
+    path = tmp_path / "invalid.json"
+    path.write_text("[]")
+    with pytest.raises(ValueError):
+        CassetteTransport(path, "record")
+    with pytest.raises(ValueError):
+        CassetteTransport(path, "rewind")
+
+
+def test_nbp_api_client_fixture_replays_real_responses(nbp_api_client):
+    response = nbp_api_client.get_exchange_rate(rate_request("USD", "2024-01-02"))
+    assert response.currency == "dolar amerykański"
+    assert response.rates[0].mid == 3.9432
+    with pytest.raises(NBPApiError):
+        nbp_api_client.get_exchange_rate(rate_request("USD", "2021-01-01"))
+
+
+def test_cassette_is_written_once(tmp_path, fake_nbp_transport, mocker):
+    path = tmp_path / "cassette.json"
+    transport = CassetteTransport(path, "record", transport=fake_nbp_transport)
+    save = mocker.spy(transport, "save")
+    with transport:
+        recorder = NBPApiClient(transport=transport)
+        for day in range(2, 6):
+            recorder.get_exchange_rate(rate_request("EUR", f"2024-01-0{day}"))
+    assert save.call_count == 1
+    assert len(json.loads(path.read_text())["interactions"]) == 4
+    transport.close()
+    assert save.call_count == 1
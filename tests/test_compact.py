@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from task3_dsw import batch
+from task3_dsw.batch import calculate_invoice, run_batch_compact
+from task3_dsw.compact import CompactLedger
+from task3_dsw.database import DataSchema, Database
+from task3_dsw.nbp_api import AsyncNBPApiClient
+
+
+def test_compact_ledger_roundtrip(tmp_path, ledger):
+    data = DataSchema(**ledger)
+    compact = CompactLedger.from_invoices(data.invoices)
+    assert len(compact) == 3
+    assert compact.payment_count == 3
+    assert [invoice.model_dump() for invoice in compact] == [invoice.model_dump() for invoice in data.invoices]
+
+    path = tmp_path / "output.json"
+    compact.save(path)
+    assert path.read_text() == data.model_dump_json()
+
+
+def test_compact_ledger_stores_calculated_invoice(batch_database, expected_results):
+    compact = CompactLedger.from_invoices(batch_database.get_invoices())
+    for index, invoice in enumerate(batch_database.get_invoices()):
+        calculate_invoice(batch_database, invoice)
+        compact[index] = invoice
+    assert [invoice.model_dump() for invoice in compact] == [invoice.model_dump() for invoice in expected_results.invoices]
+
+    with pytest.raises(ValueError):
+        compact[0] = batch_database.get_invoices()[1]
+
+
+def test_run_batch_compact(batch_database, fake_nbp_transport, ledger_path, expected_results):
+    async_client = AsyncNBPApiClient(cache=batch_database.nbp_api_client.cache)
+    async_client.client = httpx.AsyncClient(base_url=async_client.api_url, transport=fake_nbp_transport)
+    database = Database(settings=batch_database.settings, nbp_api_client=batch_database.nbp_api_client, output_file=batch_database.output_file)
+    assert asyncio.run(run_batch_compact(database, async_client)).invoices == 3
+
+    output = json.loads((ledger_path.parent / "output.json").read_text())
+    assert DataSchema(**output) == expected_results
+
+
+def test_run_batch_compact_keeps_pending_changes_bounded(batch_database, monkeypatch):
+    pending = []
+    calculate = batch.calculate_invoice
+
+    def calculate_invoice(database, invoice, **kwargs):
+        pending.append(len(database._pending))
+        return calculate(database, invoice, **kwargs)
+
+    monkeypatch.setattr(batch, "calculate_invoice", calculate_invoice)
+    database = Database(settings=batch_database.settings, nbp_api_client=batch_database.nbp_api_client, output_file=batch_database.output_file)
+    asyncio.run(run_batch_compact(database, None))
+    assert pending == [0, 0, 0]
+    assert not database._pending
@@ -1,7 +1,13 @@
 
+import gc
+import json
+import os
+import stat
 import tempfile
+
+import pytest
 from task3_dsw.settings import settings
-from task3_dsw.database import DataSchema, Database, Invoice, Payment
+from task3_dsw.database import AddInvoice, AddPayment, DataSchema, Database, Invoice, InvoiceStatus, Payment, atomic_open, file_codec, paused_gc, UMASK
 
 
 def test_database_load(test_database, test_invoice_schema: Invoice):
@@ -51,4 +57,149 @@ def test_database_get_payments(test_database, test_payment_schema: Payment):
     test_database.add_payment(test_payment_schema)
     payments = test_database.get_payments()
     assert len(payments) == 1
-    assert payments[0] == test_payment_schema
\ No newline at end of file
+    assert payments[0] == test_payment_schema
+
+def test_atomic_open_keeps_old_file_on_error(tmp_path):
+    """Test that failed write does not touch existing file."""
+    path = tmp_path / "database.json"
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with atomic_open(path) as f:
+            f.write("new")
+            raise RuntimeError
+    assert path.read_text() == "old"
+    assert list(tmp_path.iterdir()) == [path]
+
+    with atomic_open(path) as f:
+        f.write("new")
+    assert path.read_text() == "new"
+
+
+def test_atomic_open_keeps_permissions(tmp_path, mocker):
+    """Test that replaced file keeps its mode and directory is synced after rename."""
+    path = tmp_path / "database.json"
+    path.write_text("old")
+    path.chmod(0o640)
+    fsync = mocker.spy(os, "fsync")
+    with atomic_open(path) as f:
+        f.write("new")
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+    assert fsync.call_count == 2
+
+    new = tmp_path / "new.json"
+    with atomic_open(new) as f:
+        f.write("new")
+    assert stat.S_IMODE(new.stat().st_mode) == 0o666 & ~UMASK
+
+def test_database_lookup_by_id(batch_database):
+    """Test that equal looking invoices and payments resolve to their own records."""
+    twin = AddInvoice(amount=10.0, currency="PLN", date="2024-03-01")
+    stored = batch_database.add_invoice(twin)
+    assert batch_database.get_invoice_by_id(twin.id) is batch_database.data.invoices[3] is stored
+    assert batch_database.get_invoice_by_id("missing") is None
+    with pytest.raises(ValueError, match=twin.id):
+        batch_database.add_invoice(twin)
+    assert len(batch_database.data.invoices) == 4
+    # Added models are stored as Invoice and Payment, printed in menu like loaded ones
+    assert type(stored) is Invoice
+    assert str(stored) == f"<10.0 | PLN | 2024-03-01 | {InvoiceStatus.UNPAID}>"
+
+    payment = AddPayment(amount=5.0, currency="USD", date="2024-03-04")
+    stored_payment = batch_database.add_payment(batch_database.get_invoice(3), payment)
+    assert batch_database.data.invoices[3].payments == [stored_payment]
+    assert type(stored_payment) is Payment
+    assert stored_payment.model_dump() == payment.model_dump()
+    assert batch_database.data.invoices[2].payments == []
+
+    batch_database.calculate_difference(batch_database.get_invoice(3), payment)
+    assert batch_database.data.invoices[3].payments[0].exchange_rate is not None
+    assert batch_database.data.invoices[2].payments == []
+
+
+def test_database_lookup_after_data_replaced(batch_database, ledger):
+    """Test that positions are rebuilt when invoices are replaced."""
+    batch_database.data = DataSchema(**ledger)
+    invoice = batch_database.get_invoice_by_id("invoice-2")
+    assert batch_database.get_payments(invoice) == invoice.payments
+    with pytest.raises(ValueError):
+        batch_database._invoice_position(AddInvoice(amount=1, currency="PLN", date="2024-03-01"))
+
+
+def test_database_load_large_file(batch_database, ledger, ledger_path):
+    """Test that json file is parsed and validated in one pass with collector paused."""
+    ledger["invoices"] *= 2000
+    ledger_path.write_text(json.dumps(ledger))
+    batch_database.load()
+    assert len(batch_database.get_invoices()) == 6000
+    assert batch_database.get_invoices()[3] == DataSchema(**ledger).invoices[0]
+    assert gc.isenabled()
+
+    ledger_path.write_text('{"invoices": [{"amount": 1}')
+    batch_database.load()
+    assert gc.isenabled()
+
+
+def test_paused_gc_restores_collector():
+    """Test that collector is enabled again after error and stays disabled if it was."""
+    with pytest.raises(RuntimeError), paused_gc():
+        assert not gc.isenabled()
+        raise RuntimeError
+    assert gc.isenabled()
+
+    gc.disable()
+    try:
+        with paused_gc():
+            pass
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+
+@pytest.mark.parametrize(
+    ("codec", "filename", "magic"),
+    [
+        ("compact", "database.json", b'{"invoices":['),
+        ("pretty", "database.json", b'{\n    "invoices": ['),
+        ("gzip", "database.json", b"\x1f\x8b"),
+        ("compact", "database.json.gz", b"\x1f\x8b"),
+        ("lzma", "database.json", b"\xfd7zXZ\x00"),
+        ("pretty", "database.json.xz", b"\xfd7zXZ\x00"),
+    ],
+)
+def test_database_codecs(batch_database, expected_results, tmp_path, codec, filename, magic):
+    """Test that every codec gives the same data back and is detected on load."""
+    path = tmp_path / filename
+    batch_database.settings.DATABASE_CODEC = codec
+    batch_database.output_file = str(path)
+    batch_database.data = expected_results
+    batch_database.save()
+    assert path.read_bytes().startswith(magic)
+
+    batch_database.settings.DATABASE_CODEC = "pretty"
+    batch_database.settings.DATABASE_PATH = str(path)
+    batch_database.data = DataSchema(invoices=[])
+    batch_database.load()
+    assert batch_database.data == expected_results
+
+
+@pytest.mark.parametrize("filename", ["database.json.gz", "database.json.xz"])
+def test_database_load_truncated_compressed_file(batch_database, expected_results, tmp_path, filename):
+    """Test that truncated compressed file is reported as invalid and data is kept."""
+    path = tmp_path / filename
+    batch_database.output_file = str(path)
+    batch_database.data = expected_results
+    batch_database.save()
+    path.write_bytes(path.read_bytes()[:-20])
+
+    batch_database.settings.DATABASE_PATH = str(path)
+    assert batch_database.load() is False
+    assert batch_database.data == expected_results
+
+
+def test_file_codec():
+    """Test that compression is chosen by suffix and unknown codecs are rejected."""
+    assert file_codec("output.json", "pretty") == "pretty"
+    assert file_codec("output.json.gz", "pretty") == "gzip"
+    assert file_codec("output.json.xz", "compact") == "lzma"
+    with pytest.raises(ValueError):
+        file_codec("output.json", "bson")
@@ -0,0 +1,115 @@
+import gzip
+import json
+import lzma
+import subprocess
+import sys
+
+import pytest
+from benchmarks.fake_nbp import FakeNBPServer
+from task3_dsw import main
+from task3_dsw.database import AddInvoice, DataSchema, Database
+from task3_dsw.settings import Settings, settings
+from task3_dsw.storage import BACKENDS, create_database
+
+# Import time of main module on top of settings, which always load pydantic-settings
+IMPORT_TIME_BUDGET_US = 100_000
+
+
+def test_import_of_main_is_lazy():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import task3_dsw.main"], capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in result.stderr.splitlines()[1:]:
+        _, total, name = line.split("|")
+        cumulative[name.strip()] = int(total)
+    for module in ("httpx", "task3_dsw.nbp_api", "task3_dsw.database", "task3_dsw.batch", "task3_dsw.menu", "task3_dsw.server"):
+        assert module not in cumulative
+    assert cumulative["task3_dsw.main"] - cumulative["task3_dsw.settings"] < IMPORT_TIME_BUDGET_US
+
+
+def test_choices_of_options_match_implementations():
+    from task3_dsw.batch import ENGINES
+    from task3_dsw.database import CODECS
+
+    assert tuple(BACKENDS) == main.DATABASE_BACKENDS
+    assert CODECS == main.DATABASE_CODECS
+    assert ENGINES == main.BATCH_ENGINES
+
+
+@pytest.fixture
+def run_main(monkeypatch):
+    """Run main with arguments against fake NBP api, restoring settings it changes."""
+    for name in ("DATABASE_PATH", "DATABASE_BACKEND", "CURRENCIES", "RATE_CACHE_PATH", "NBP_API_URL"):
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+    settings.RATE_CACHE_PATH = ":memory:"
+
+    def run(*args):
+        with FakeNBPServer() as server:
+            settings.NBP_API_URL = server.url
+            monkeypatch.setattr(sys, "argv", ["task3_dsw", *map(str, args), "-c", "EUR", "USD", "PLN"])
+            main.main()
+
+    return run
+
+
+def test_batch_mode_loads_only_given_file(monkeypatch, run_main, ledger_path):
+    loaded = []
+    load = Database.load
+    monkeypatch.setattr(Database, "load", lambda self: loaded.append(self.settings.DATABASE_PATH) or load(self))
+    output = ledger_path.parent / "output.json"
+    run_main("-f", ledger_path, "-o", output)
+    assert loaded == [str(ledger_path)]
+    assert len(json.loads(output.read_text())["invoices"]) == 3
+
+
+def test_batch_mode_keeps_output_when_file_is_invalid(run_main, tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text('{"invoices": [{"amount": "many"}]}')
+    output = tmp_path / "output.json"
+    output.write_text("old")
+    run_main("-f", path, "-o", output)
+    assert output.read_text() == "old"
+
+
+@pytest.mark.parametrize("mode", ["--stream", "--low-memory"])
+def test_batch_mode_logs_missing_file(run_main, tmp_path, mode, caplog):
+    run_main("-f", tmp_path / "missing.json", "-o", tmp_path / "output.json", mode)
+    assert "missing.json" in caplog.text
+    assert not (tmp_path / "output.json").exists()
+
+
+@pytest.mark.parametrize(("backend", "output"), [("ndjson", "output.ndjson"), ("sqlite", "output.sqlite3")])
+def test_batch_mode_names_default_output_after_backend(run_main, monkeypatch, tmp_path, ledger, nbp_api_client, backend, output):
+    monkeypatch.chdir(tmp_path)
+    database = create_database(settings=Settings(DATABASE_PATH=str(tmp_path / "database.db"), DATABASE_BACKEND=backend), nbp_api_client=nbp_api_client)
+    database.load()
+    for invoice in DataSchema(**ledger).invoices:
+        database.add_invoice(invoice)
+    database.save()
+    run_main("-f", tmp_path / "database.db", "-b", backend)
+    assert (tmp_path / output).exists()
+    assert not (tmp_path / "output.json").exists()
+
+
+@pytest.mark.parametrize("mode", ["--stream", "--low-memory"])
+def test_batch_mode_refuses_stream_with_wal_records(run_main, tmp_path, ledger, nbp_api_client, mode, caplog):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps(ledger))
+    database = Database(settings=Settings(DATABASE_PATH=str(path)), nbp_api_client=nbp_api_client)
+    database.load()
+    database.add_invoice(AddInvoice(amount=1, currency="PLN", date="2024-03-03"))
+    database.commit()
+    run_main("-f", path, "-o", tmp_path / "output.json", mode)
+    assert "database.json.wal" in caplog.text
+    assert not (tmp_path / "output.json").exists()
+
+
+@pytest.mark.parametrize("mode", [None, "--stream", "--low-memory"])
+@pytest.mark.parametrize(("suffix", "compress"), [(".gz", gzip.compress), (".xz", lzma.compress)])
+def test_batch_mode_logs_truncated_compressed_file(run_main, tmp_path, ledger, mode, suffix, compress, caplog):
+    path = tmp_path / f"database.json{suffix}"
+    path.write_bytes(compress(json.dumps(ledger).encode())[:-20])
+    output = tmp_path / "output.json"
+    output.write_text("old")
+    run_main("-f", path, "-o", output, *filter(None, [mode]))
+    assert "ERROR" in caplog.text
+    assert output.read_text() == "old"
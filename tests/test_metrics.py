@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from task3_dsw.batch import run_batch
+from task3_dsw.metrics import MetricsRegistry, metrics
+from task3_dsw.nbp_api import AsyncNBPApiClient
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+    registry.inc("requests_total")
+    registry.observe("request_seconds", 0.1)
+    with registry.time("stage_seconds"):
+        pass
+    assert registry.summary() == {"counters": {}, "gauges": {}, "histograms": {}}
+
+
+def test_registry_summary_and_prometheus_format():
+    registry = MetricsRegistry()
+    registry.enabled = True
+    registry.inc("requests_total")
+    registry.inc("requests_total", 2)
+    registry.set("invoices_per_second", 12.5)
+    registry.observe("request_seconds", 0.003)
+    registry.observe("request_seconds", 2.0)
+
+    summary = registry.summary()
+    assert summary["counters"] == {"requests_total": 3}
+    assert summary["histograms"]["request_seconds"] == {"count": 2, "sum": 2.003, "mean": 1.0015, "max": 2.0}
+    text = registry.to_prometheus()
+    assert "# TYPE task3_dsw_requests_total counter\ntask3_dsw_requests_total 3\n" in text
+    assert "task3_dsw_invoices_per_second 12.5\n" in text
+    assert 'task3_dsw_request_seconds_bucket{le="0.001"} 0\n' in text
+    assert 'task3_dsw_request_seconds_bucket{le="0.005"} 1\n' in text
+    assert 'task3_dsw_request_seconds_bucket{le="+Inf"} 2\n' in text
+    assert "task3_dsw_request_seconds_count 2\n" in text
+
+
+def test_batch_run_records_metrics(enabled_metrics, batch_database, fake_nbp_transport):
+    async_client = AsyncNBPApiClient(cache=batch_database.nbp_api_client.cache, transport=fake_nbp_transport)
+    asyncio.run(run_batch(batch_database, async_client))
+
+    summary = enabled_metrics.summary()
+    assert summary["counters"]["nbp_requests_total"] == 3
+    assert "nbp_errors_total" not in summary["counters"]
+    assert summary["counters"]["invoices_processed_total"] == 3
+    assert summary["counters"]["rate_cache_hits_total"] > 0
+    assert summary["gauges"]["invoices_per_second"] > 0
+    histograms = summary["histograms"]
+    assert histograms["nbp_request_seconds"]["count"] == 3
+    assert histograms["database_load_seconds"]["count"] == 1
+    assert histograms["database_save_seconds"]["count"] == 1
+    assert histograms["calculate_payments_seconds"]["count"] == 3
+    assert histograms["calculate_difference_seconds"]["count"] == 3
@@ -0,0 +1,72 @@
+import pytest
+from task3_dsw.database import AddInvoice, AddPayment, DataSchema
+from task3_dsw.ndjson_database import NDJSONDatabase
+from task3_dsw.settings import Settings
+from task3_dsw.storage import create_database
+
+
+@pytest.fixture
+def ndjson_database(tmp_path, ledger, nbp_api_client):
+    """NDJSON database filled with test ledger."""
+    settings = Settings(DATABASE_PATH=str(tmp_path / "database.ndjson"), DATABASE_BACKEND="ndjson")
+    database = create_database(settings=settings, nbp_api_client=nbp_api_client)
+    database.load()
+    for invoice in DataSchema(**ledger).invoices:
+        database.add_invoice(invoice)
+    database.save()
+    return database
+
+
+def reopen(database):
+    """Load database file again with new NDJSONDatabase."""
+    other = NDJSONDatabase(settings=database.settings, nbp_api_client=database.nbp_api_client)
+    other.load()
+    return other
+
+
+def test_ndjson_database_roundtrip(ndjson_database, ledger):
+    assert isinstance(ndjson_database, NDJSONDatabase)
+    assert reopen(ndjson_database).data == DataSchema(**ledger)
+
+
+def test_ndjson_database_appends_changes(ndjson_database):
+    path = ndjson_database.settings.DATABASE_PATH
+    before = open(path, "rb").read()
+    invoice = ndjson_database.get_invoice(2)
+    ndjson_database.add_payment(invoice, AddPayment(amount=5, currency="PLN", date="2024-03-02"))
+    ndjson_database.add_invoice(AddInvoice(amount=1, currency="PLN", date="2024-03-03"))
+    ndjson_database.save()
+
+    after = open(path, "rb").read()
+    assert after.startswith(before)
+    assert after.count(b"\n") == before.count(b"\n") + 2
+    reopened = reopen(ndjson_database)
+    assert reopened.data.model_dump() == ndjson_database.data.model_dump()
+    assert len(reopened.read_invoice(2).payments) == 1
+    assert reopened.read_invoice(4) is None
+
+
+def test_ndjson_database_rebuilds_index(ndjson_database):
+    invoice = ndjson_database.get_invoice(0)
+    ndjson_database.add_payment(invoice, AddPayment(amount=5, currency="PLN", date="2024-03-02"))
+    ndjson_database.save()
+    NDJSONDatabase.index_path(ndjson_database.settings.DATABASE_PATH).unlink()
+    assert reopen(ndjson_database).data.model_dump() == ndjson_database.data.model_dump()
+
+
+def test_ndjson_database_cuts_incomplete_line(ndjson_database):
+    path = ndjson_database.settings.DATABASE_PATH
+    with open(path, "ab") as f:
+        f.write(b'{"number":0,"invoice":{"amo')
+    reopened = reopen(ndjson_database)
+    assert reopened.data.model_dump() == ndjson_database.data.model_dump()
+    assert open(path, "rb").read().endswith(b"}\n")
+
+
+def test_ndjson_database_compact(ndjson_database):
+    for _ in range(3):
+        ndjson_database.add_payment(ndjson_database.get_invoice(1), AddPayment(amount=1, currency="PLN", date="2024-03-02"))
+        ndjson_database.save()
+    assert ndjson_database.compact() > 0
+    assert reopen(ndjson_database).data.model_dump() == ndjson_database.data.model_dump()
+    assert ndjson_database.compact() == 0
@@ -0,0 +1,109 @@
+import datetime
+import random
+
+import pytest
+from task3_dsw.batch import calculate_invoice, process_invoices
+from task3_dsw.database import AddPayment, DataSchema
+from task3_dsw.planner import RatePlanner
+
+np = pytest.importorskip("numpy")
+from task3_dsw.numpy_engine import ColumnarLedger, calculate_invoices  # noqa: E402
+
+
+def random_ledger(seed, size=300):
+    """Ledger with every branch of calculations: same, PLN and foreign currencies, exact payments."""
+    generator = random.Random(seed)
+    weekdays = [
+        datetime.date(2024, 1, 1) + datetime.timedelta(days=offset)
+        for offset in range(150)
+        if (datetime.date(2024, 1, 1) + datetime.timedelta(days=offset)).weekday() < 5
+    ]
+    currencies = ["PLN", "EUR", "USD"]
+    invoices = []
+    for number in range(size):
+        currency = generator.choice(currencies)
+        amount = round(generator.uniform(1, 10_000), 2)
+        payments = []
+        for _ in range(generator.choice([0, 1, 1, 2, 3, 5])):
+            if generator.random() < 0.2:
+                payment_currency, payment_amount = currency, amount
+            else:
+                payment_currency = generator.choice(currencies)
+                payment_amount = round(generator.uniform(1, 5_000), 2)
+            payments.append(
+                {
+                    "id": f"payment-{number}-{len(payments)}",
+                    "amount": payment_amount,
+                    "currency": payment_currency,
+                    "date": str(generator.choice(weekdays)),
+                    "exchange_rate": None,
+                    "exchange_rate_difference": generator.choice([0.0, 1.5]),
+                }
+            )
+        invoices.append(
+            {
+                "id": f"invoice-{number}",
+                "amount": amount,
+                "currency": currency,
+                "date": str(generator.choice(weekdays)),
+                "status": "Nie zaplacona",
+                "exchange_rate": None,
+                "payments": payments,
+            }
+        )
+    return {"invoices": invoices}
+
+
+@pytest.fixture
+def random_database(batch_database):
+    batch_database.data = DataSchema(**random_ledger(seed=1))
+    RatePlanner(batch_database.nbp_api_client).prefetch(batch_database.get_invoices())
+    return batch_database
+
+
+def calculate_scalar(database, incremental=False):
+    return sum(calculate_invoice(database, invoice, incremental=incremental) for invoice in database.get_invoices())
+
+
+def test_columnar_ledger_layout(ledger):
+    columns = ColumnarLedger.from_invoices(DataSchema(**ledger).invoices)
+    assert columns.codes == ["PLN", "EUR", "USD"]
+    assert columns.offsets.tolist() == [0, 1, 3, 3]
+    assert columns.payment_invoice.tolist() == [0, 1, 1]
+    assert columns.payment_currency.tolist() == [0, 2, 2]
+    assert columns.invoice_amount.tolist() == [100.0, 500.0, 10.0]
+
+
+def test_numpy_engine_matches_scalar(random_database):
+    original = random_database.data.model_copy(deep=True)
+    assert calculate_scalar(random_database) == 0
+    expected = random_database.data.model_dump()
+
+    random_database.data = original
+    assert calculate_invoices(random_database, random_database.get_invoices()) == 0
+    assert random_database.data.model_dump() == expected
+    statuses = {invoice["status"] for invoice in expected["invoices"]}
+    assert len(statuses) == 3
+
+
+def test_numpy_engine_matches_scalar_incremental(random_database):
+    calculate_scalar(random_database)
+    for invoice in random_database.get_invoices()[::7]:
+        random_database.add_payment(invoice, AddPayment(amount=12.5, currency="USD", date="2024-03-04"))
+    for invoice in random_database.get_invoices()[3::11]:
+        invoice.amount += 1
+    changed = random_database.data.model_copy(deep=True)
+    skipped = calculate_scalar(random_database, incremental=True)
+    assert skipped > 0
+    expected = random_database.data.model_dump()
+
+    random_database.data = changed
+    assert calculate_invoices(random_database, random_database.get_invoices(), incremental=True) == skipped
+    assert random_database.data.model_dump() == expected
+
+
+def test_process_invoices_numpy_engine(batch_database, expected_results):
+    process_invoices(batch_database, engine="numpy")
+    assert batch_database.data == expected_results
+    with pytest.raises(ValueError):
+        process_invoices(batch_database, engine="fortran")
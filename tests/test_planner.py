@@ -0,0 +1,54 @@
+import datetime
+
+import httpx
+from task3_dsw.database import Invoice, InvoiceStatus, Payment
+from task3_dsw.nbp_api import ExchangeRateSchema, NBPApiClient
+from task3_dsw.planner import RatePlanner, iter_required_rates
+
+
+def make_invoice(currency, date, payments=()):
+    return Invoice(
+        amount=100,
+        currency=currency,
+        date=date,
+        status=InvoiceStatus.UNPAID,
+        exchange_rate=None,
+        payments=[
+            Payment(amount=100, currency=code, date=day, exchange_rate=None, exchange_rate_difference=0.0)
+            for code, day in payments
+        ],
+    )
+
+
+def test_iter_required_rates():
+    invoice = make_invoice("PLN", "2024-01-02", [("EUR", "2024-01-10"), ("PLN", "2024-01-11")])
+    assert set(iter_required_rates(invoice)) == {
+        ("EUR", datetime.date(2024, 1, 2)),
+        ("EUR", datetime.date(2024, 1, 10)),
+    }
+
+
+def test_plan_splits_dates_into_ranges():
+    planner = RatePlanner(NBPApiClient())
+    start = datetime.date(2024, 1, 1)
+    dates = {start + datetime.timedelta(days=day) for day in range(0, 200, 7)}
+    queries = planner.plan({"EUR": dates})
+    assert len(queries) == 3
+    assert all((query.end_date - query.start_date).days < 93 for query in queries)
+    assert queries[0].start_date == start
+
+
+def test_prefetch_serves_rates_from_cache(fake_nbp_transport):
+    calls = fake_nbp_transport.calls
+    client = NBPApiClient()
+    client.client = httpx.Client(base_url=client.api_url, transport=fake_nbp_transport)
+    invoices = [
+        make_invoice("EUR", "2024-01-02", [("EUR", "2024-01-03"), ("PLN", "2024-01-04")]),
+        make_invoice("EUR", "2024-02-01", [("PLN", "2024-02-05")]),
+    ]
+    assert RatePlanner(client).prefetch(invoices) == 1
+    rate = client.get_exchange_rate(ExchangeRateSchema(table="A", code="EUR", date="2024-02-05"))
+    assert rate.rates[0].effectiveDate == datetime.date(2024, 2, 5)
+    assert len(calls) == 1
+    # second run has nothing left to fetch
+    assert RatePlanner(client).prefetch(invoices) == 0
@@ -0,0 +1,100 @@
+import datetime
+import time
+
+import httpx
+import pytest
+from task3_dsw.nbp_api import ExchangeRateRangeSchema, ExchangeRateSchema, NBPApiClient, NBPApiError, OfflineNBPApiClient
+from task3_dsw.rate_store import RateStore
+
+ARCHIVE = """data;1USD;1EUR;100HUF;nr tabeli;pełny numer tabeli;
+20240102;3,9432;4,3434;113,70;1;001/A/NBP/2024;
+20240103;3,9909;4,3646;114,36;2;002/A/NBP/2024;
+20240105;3,9812;4,3589;;4;004/A/NBP/2024;
+
+kod ISO;USD;EUR;HUF;;;
+nazwa waluty;dolar amerykański;euro;forint (Węgry);;;
+liczba jednostek;1;1;100;;;
+"""
+
+
+@pytest.fixture
+def archive_path(tmp_path):
+    path = tmp_path / "archiwum_tab_a_2024.csv"
+    path.write_bytes(ARCHIVE.encode("cp1250"))
+    return path
+
+
+@pytest.fixture
+def rate_store(archive_path):
+    store = RateStore()
+    assert store.import_csv(archive_path) == 8
+    return store
+
+
+def test_rate_store_import(rate_store):
+    assert rate_store.get("USD", "2024-01-02") == ("001/A/NBP/2024", 3.9432, "dolar amerykański")
+    assert rate_store.get("HUF", datetime.date(2024, 1, 3)).mid == pytest.approx(1.1436)
+    assert rate_store.get("HUF", "2024-01-05") is None
+    assert list(rate_store.get_range("EUR", datetime.date(2024, 1, 1), datetime.date(2024, 1, 4))) == [
+        datetime.date(2024, 1, 2),
+        datetime.date(2024, 1, 3),
+    ]
+    assert rate_store.covers(datetime.date(2024, 1, 1), datetime.date(2024, 1, 5))
+    assert not rate_store.covers(datetime.date(2024, 1, 6))
+    assert not rate_store.covers(datetime.date(2023, 12, 29))
+
+
+def test_rate_store_rejects_other_files(tmp_path):
+    path = tmp_path / "other.csv"
+    path.write_text("a;b\n1;2\n")
+    with pytest.raises(ValueError):
+        RateStore().import_csv(path)
+
+
+def test_rate_store_imports_year_quickly(tmp_path):
+    codes = [f"X{chr(65 + index // 26)}{chr(65 + index % 26)}" for index in range(35)]
+    lines = [f"data;{';'.join(f'1{code}' for code in codes)};nr tabeli;pełny numer tabeli;"]
+    day = datetime.date(2023, 1, 2)
+    for number in range(1, 253):
+        rates = ";".join(f"{number % 7 + 1},{index:04}" for index in range(35))
+        lines.append(f"{day:%Y%m%d};{rates};{number};{number:03}/A/NBP/2023;")
+        day += datetime.timedelta(days=1)
+    path = tmp_path / "archiwum_tab_a_2023.csv"
+    path.write_bytes("\n".join(lines).encode("cp1250"))
+
+    start = time.perf_counter()
+    assert RateStore(str(tmp_path / "rates.sqlite3")).import_csv(path) == 252 * 35
+    assert time.perf_counter() - start < 1
+
+
+def test_offline_client_serves_store(rate_store):
+    client = OfflineNBPApiClient(rate_store)
+    response = client.get_exchange_rate(ExchangeRateSchema(table="A", code="USD", date="2024-01-03"))
+    assert response.currency == "dolar amerykański"
+    assert response.rates[0].mid == 3.9909
+    assert response.rates[0].no == "002/A/NBP/2024"
+
+    with pytest.raises(NBPApiError, match="No exchange rate"):
+        client.get_exchange_rate(ExchangeRateSchema(table="A", code="USD", date="2024-01-04"))
+    with pytest.raises(NBPApiError, match="not in offline store"):
+        client.get_exchange_rate(ExchangeRateSchema(table="A", code="USD", date="2024-02-01"))
+
+    rates = client.get_exchange_rates(
+        ExchangeRateRangeSchema(table="A", code="EUR", start_date="2024-01-01", end_date="2024-01-31")
+    )
+    assert [rate.mid for rate in rates.rates] == [4.3434, 4.3646, 4.3589]
+
+
+def test_offline_client_falls_back_to_network(rate_store, fake_nbp_transport):
+    fallback = NBPApiClient()
+    fallback.client = httpx.Client(base_url=fallback.api_url, transport=fake_nbp_transport)
+    client = OfflineNBPApiClient(rate_store, fallback=fallback)
+
+    client.get_exchange_rate(ExchangeRateSchema(table="A", code="USD", date="2024-01-02"))
+    with pytest.raises(NBPApiError):
+        client.get_exchange_rate(ExchangeRateSchema(table="A", code="USD", date="2024-01-04"))
+    assert fake_nbp_transport.calls == []
+
+    response = client.get_exchange_rate(ExchangeRateSchema(table="A", code="USD", date="2024-02-01"))
+    assert len(fake_nbp_transport.calls) == 1
+    assert response.rates[0].effectiveDate == datetime.date(2024, 2, 1)
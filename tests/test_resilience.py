@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from task3_dsw.metrics import metrics
+from task3_dsw.nbp_api import AsyncNBPApiClient, ExchangeRateSchema, NBPApiClient, NBPApiError
+from task3_dsw.resilience import CircuitBreaker, CircuitOpenError, ResilientTransport, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def rate_request(code="EUR", date="2024-01-02"):
+    return ExchangeRateSchema(code=code, date=date)
+
+
+def flaky_transport(fake_nbp_transport, failures):
+    """Transport failing given responses or exceptions before answering like fake NBP api."""
+    failures = list(failures)
+
+    def handler(request):
+        if failures:
+            failure = failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return httpx.Response(failure)
+        return fake_nbp_transport.handle_request(request)
+
+    return httpx.MockTransport(handler)
+
+
+def test_transport_retries_server_errors_and_timeouts(fake_nbp_transport):
+    inner = flaky_transport(fake_nbp_transport, [503, httpx.ConnectTimeout("timeout"), 429])
+    client = NBPApiClient(transport=ResilientTransport(inner, backoff=0))
+    assert client.get_exchange_rate(rate_request()).rates[0].mid > 0
+    assert len(fake_nbp_transport.calls) == 1
+
+    # missing rate is an answer, not a failure
+    with pytest.raises(NBPApiError, match="404"):
+        client.get_exchange_rate(rate_request(date="2024-01-06"))
+    assert len(fake_nbp_transport.calls) == 2
+
+
+def test_transport_gives_up_after_retries(fake_nbp_transport):
+    inner = flaky_transport(fake_nbp_transport, [500, 500, 500])
+    client = NBPApiClient(transport=ResilientTransport(inner, retries=2, backoff=0))
+    with pytest.raises(NBPApiError, match="500"):
+        client.get_exchange_rate(rate_request())
+    assert client.get_exchange_rate(rate_request()).rates[0].mid > 0
+
+
+def test_backoff_is_jittered_and_capped():
+    transport = ResilientTransport(backoff=1.0, max_backoff=4.0)
+    delays = [transport._delay(attempt, None) for attempt in range(4)]
+    assert 0.5 <= delays[0] <= 1.0
+    assert 1.0 <= delays[1] <= 2.0
+    assert 2.0 <= delays[3] <= 4.0
+
+
+def test_token_bucket_spaces_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    clock.now = 3.0
+    assert bucket.reserve() == 0.0
+
+
+def test_circuit_breaker_opens_and_probes(fake_nbp_transport):
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, reset_timeout=10, clock=clock)
+    inner = flaky_transport(fake_nbp_transport, [500, 500, 500])
+    transport = ResilientTransport(inner, retries=0, breaker=breaker)
+    client = httpx.Client(base_url="http://nbp.test/api/", transport=transport)
+    assert client.get("exchangerates/rates/a/EUR/2024-01-02/").status_code == 500
+    assert client.get("exchangerates/rates/a/EUR/2024-01-02/").status_code == 500
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get("exchangerates/rates/a/EUR/2024-01-02/")
+
+    clock.now = 10
+    assert breaker.state == "half-open"
+    assert client.get("exchangerates/rates/a/EUR/2024-01-02/").status_code == 500
+    assert breaker.state == "open"
+    clock.now = 20
+    assert client.get("exchangerates/rates/a/EUR/2024-01-02/").status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_concurrent_async_requests_share_one_call(fake_nbp_transport):
+    async def handler(request):
+        await asyncio.sleep(0.05)
+        return fake_nbp_transport.handle_request(request)
+
+    async def fetch_all():
+        transport = ResilientTransport(async_transport=httpx.MockTransport(handler))
+        async with AsyncNBPApiClient(transport=transport) as client:
+            return await asyncio.gather(*(client.get_exchange_rate(rate_request()) for _ in range(5)))
+
+    responses = asyncio.run(fetch_all())
+    assert len(fake_nbp_transport.calls) == 1
+    assert all(response == responses[0] for response in responses)
+
+
+def test_concurrent_sync_requests_share_one_call(fake_nbp_transport, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "counters", {})
+    release = threading.Event()
+
+    def handler(request):
+        release.wait(5)
+        return fake_nbp_transport.handle_request(request)
+
+    transport = ResilientTransport(httpx.MockTransport(handler))
+    clients = [NBPApiClient(transport=transport) for _ in range(4)]
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(client.get_exchange_rate, rate_request()) for client in clients]
+        # answer once the other three requests wait for the first one
+        while metrics.counters.get("nbp_coalesced_total", 0) < 3:
+            time.sleep(0.001)
+        release.set()
+        responses = [future.result() for future in futures]
+    assert len(fake_nbp_transport.calls) == 1
+    assert all(response == responses[0] for response in responses)
@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from task3_dsw.database import Database
+from task3_dsw.server import DatabaseServer
+
+
+def run_with_server(database, scenario):
+    """Run scenario with async client of server listening on free port."""
+    server = DatabaseServer(database)
+
+    async def main():
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener, httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            return await scenario(client)
+
+    try:
+        return asyncio.run(main())
+    finally:
+        server.close()
+
+
+def test_server_operations(batch_database, fake_nbp_transport):
+    async def scenario(client):
+        response = await client.post("/invoices", json={"amount": 100, "currency": "EUR", "date": "2024-01-02"})
+        assert response.status_code == 201
+        invoice = response.json()
+        assert invoice["status"] == "Nie zaplacona"
+
+        response = await client.post(f"/invoices/{invoice['id']}/payments", json={"amount": 500, "currency": "PLN", "date": "2024-01-03"})
+        assert response.status_code == 201
+        payment = response.json()
+
+        status = (await client.get(f"/invoices/{invoice['id']}/status")).json()
+        assert status["status"] == "Nadplata"
+        assert status["sum_of_payments"] == 500
+        difference = (await client.get(f"/invoices/{invoice['id']}/payments/{payment['id']}/difference")).json()
+        assert difference["exchange_rate_difference"] == pytest.approx(500 * 4.003 - 100 * 4.002, abs=0.01)
+
+        stored = (await client.get(f"/invoices/{invoice['id']}")).json()
+        assert stored["payments"][0]["exchange_rate_difference"] == difference["exchange_rate_difference"]
+        return (await client.get("/health")).json()
+
+    assert run_with_server(batch_database, scenario) == {"status": "ok", "invoices": 4}
+    # changes were logged and saved, database file has new invoice
+    reloaded = Database(settings=batch_database.settings, nbp_api_client=batch_database.nbp_api_client)
+    reloaded.load()
+    assert reloaded.get_invoice(3).status == "Nadplata"
+
+
+def test_server_errors(batch_database):
+    async def scenario(client):
+        responses = [
+            await client.get("/invoices/missing"),
+            await client.get("/invoices/invoice-1/payments/missing/difference"),
+            await client.post("/invoices", json={"amount": 100, "currency": "XXX", "date": "2024-01-02"}),
+            await client.post("/invoices", content=b"{"),
+            await client.delete("/invoices/invoice-1"),
+            await client.get("/unknown"),
+        ]
+        return [response.status_code for response in responses], responses[2].json()
+
+    statuses, invalid = run_with_server(batch_database, scenario)
+    assert statuses == [404, 404, 422, 422, 405, 404]
+    assert "XXX" in invalid["error"][0]["msg"]
+
+
+def test_server_answers_pipelined_requests_in_order(batch_database):
+    async def scenario(client):
+        return await asyncio.gather(*(client.get(f"/invoices/invoice-{number}") for number in (1, 2, 3) * 5))
+
+    responses = run_with_server(batch_database, scenario)
+    assert [response.json()["id"] for response in responses] == [f"invoice-{number}" for number in (1, 2, 3) * 5]
+
+
+def test_server_answers_unexpected_errors(batch_database, mocker):
+    mocker.patch.object(batch_database, "commit", side_effect=OSError("disk full"))
+    mocker.patch.object(batch_database, "calulate_payments_for_invoice", return_value=None)
+
+    async def scenario(client):
+        return [
+            await client.post("/invoices", json={"amount": 100, "currency": "PLN", "date": "2024-01-02"}),
+            await client.get("/invoices/invoice-1/status"),
+            await client.get("/health"),
+        ]
+
+    added, status, health = run_with_server(batch_database, scenario)
+    assert added.status_code == 500
+    assert added.json() == {"error": "Internal server error."}
+    assert status.status_code == 500
+    assert "invoice-1" in status.json()["error"]
+    assert health.status_code == 200
+
+
+def test_server_sets_ids_and_rejects_duplicates(batch_database, mocker):
+    async def scenario(client):
+        fields = {"amount": 100, "currency": "PLN", "date": "2024-01-02"}
+        forged = await client.post("/invoices", json={**fields, "id": "invoice-1", "status": "Zaplacona"})
+        forged_payment = await client.post("/invoices/invoice-1/payments", json={**fields, "exchange_rate_difference": 5})
+        mocker.patch("uuid.uuid4", return_value="invoice-1")
+        duplicate = await client.post("/invoices", json=fields)
+        return forged, forged_payment, duplicate
+
+    forged, forged_payment, duplicate = run_with_server(batch_database, scenario)
+    assert forged.status_code == 422
+    assert forged_payment.status_code == 422
+    assert duplicate.status_code == 409
+    assert "invoice-1" in duplicate.json()["error"]
+    assert [invoice.id for invoice in batch_database.get_invoices()] == ["invoice-1", "invoice-2", "invoice-3"]
+
+
+@pytest.mark.parametrize("length", ["-1", "ten"])
+def test_server_rejects_invalid_content_length(batch_database, length):
+    async def request():
+        listener = await server.start("127.0.0.1", 0)
+        async with listener:
+            reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+            writer.write(f"POST /invoices HTTP/1.1\r\nHost: test\r\nContent-Length: {length}\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+            return response
+
+    server = DatabaseServer(batch_database)
+    try:
+        response = asyncio.run(request())
+    finally:
+        server.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.1 400 ")
+    assert json.loads(body) == {"error": "Malformed request."}
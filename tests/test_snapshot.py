@@ -0,0 +1,85 @@
+import argparse
+import datetime
+
+import pytest
+from task3_dsw import main
+from task3_dsw.database import AddPayment, Database
+from task3_dsw.menu import PAGE_SIZE, WithDatabaseAction
+from task3_dsw.settings import settings
+from task3_dsw.snapshot import Snapshot
+
+
+@pytest.fixture
+def json_database(batch_database):
+    batch_database.output_file = None
+    batch_database.save()
+    return batch_database
+
+
+def test_snapshot_matches_database(json_database):
+    with json_database.open_snapshot() as snapshot:
+        invoices = json_database.get_invoices()
+        assert len(snapshot) == 3
+        assert [str(row) for row in snapshot] == [str(invoice) for invoice in invoices]
+        assert snapshot[1].id == "invoice-2"
+        assert snapshot[1].date == datetime.date(2024, 2, 1)
+        assert snapshot[1].payment_count == 2
+        assert [str(row) for row in snapshot.payments(1)] == [str(payment) for payment in invoices[1].payments]
+        assert snapshot.payments(1)[1].id == "payment-2-2"
+        assert snapshot.payments(2) == []
+        assert [snapshot.index_of(f"invoice-{number}") for number in (1, 2, 3)] == [0, 1, 2]
+        assert snapshot.index_of("invoice-4") is None
+        with pytest.raises(IndexError):
+            snapshot[3]
+
+
+def test_snapshot_stale(json_database):
+    json_database.add_payment(json_database.get_invoice(2), AddPayment(amount=5.0, currency="USD", date="2024-03-04"))
+    json_database.commit()
+    assert json_database.open_snapshot() is None
+
+    json_database.save()
+    with json_database.open_snapshot() as snapshot:
+        assert snapshot[2].payment_count == 1
+
+    with open(json_database.settings.DATABASE_PATH, "a") as f:
+        f.write(" ")
+    assert json_database.open_snapshot() is None
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "database.json.snap"
+    path.write_bytes(b"not a snapshot at all, just some bytes")
+    with pytest.raises(ValueError):
+        Snapshot(path)
+    path.write_bytes(b"")
+    assert Snapshot.open(path, tmp_path / "database.json") is None
+
+
+def test_menu_lists_invoices_from_snapshot(json_database, mocker, capsys):
+    json_database.data.invoices *= PAGE_SIZE
+    json_database.save()
+    json_database.load = mocker.Mock(wraps=json_database.load)
+    action = WithDatabaseAction("", "", "", json_database)
+
+    mocker.patch("builtins.input", side_effect=["", "51"])
+    invoice = action.ask_for_invoice_index()
+    output = capsys.readouterr().out
+    assert "0 - <100.0 | EUR | 2024-01-02 |" in output
+    assert f"51 - {json_database.get_invoice(51)}" in output
+    assert invoice.id == "invoice-1"
+    # Database saved the file itself, so it is not loaded again
+    assert json_database.load.call_count == 0
+
+
+def test_interactive_mode_loads_database_when_invoice_is_chosen(json_database, mocker, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_PATH", json_database.settings.DATABASE_PATH)
+    run_interactive = mocker.patch("task3_dsw.main.run_interactive")
+    load = mocker.spy(Database, "load")
+    main.run_with_database(argparse.Namespace(interactive=True), json_database.nbp_api_client)
+    database = run_interactive.call_args.args[0]
+    assert load.call_count == 0
+
+    mocker.patch("builtins.input", return_value="1")
+    assert WithDatabaseAction("", "", "", database).ask_for_invoice_index().id == "invoice-2"
+    assert load.call_count == 1
@@ -0,0 +1,60 @@
+import datetime
+import sqlite3
+
+import pytest
+from task3_dsw.database import AddPayment, DataSchema, InvoiceStatus
+from task3_dsw.settings import Settings
+from task3_dsw.sqlite_database import SQLiteDatabase
+from task3_dsw.storage import create_database
+
+
+@pytest.fixture
+def sqlite_database(tmp_path, ledger, nbp_api_client):
+    """SQLite database filled with test ledger."""
+    settings = Settings(DATABASE_PATH=str(tmp_path / "database.sqlite3"), DATABASE_BACKEND="sqlite")
+    database = create_database(settings=settings, nbp_api_client=nbp_api_client)
+    database.load()
+    for invoice in DataSchema(**ledger).invoices:
+        database.add_invoice(invoice)
+    database.save()
+    return database
+
+
+def reopen(database):
+    other = SQLiteDatabase(settings=database.settings, nbp_api_client=database.nbp_api_client)
+    other.load()
+    return other
+
+
+def test_sqlite_database_roundtrip(sqlite_database, ledger):
+    assert isinstance(sqlite_database, SQLiteDatabase)
+    assert reopen(sqlite_database).data == DataSchema(**ledger)
+
+
+def test_sqlite_database_saves_changes(sqlite_database):
+    invoice = sqlite_database.get_invoice(2)
+    sqlite_database.add_payment(invoice, AddPayment(amount=10, currency="PLN", date="2024-03-02"))
+    sqlite_database.data.invoices[2].status = InvoiceStatus.PAID
+    sqlite_database.save()
+
+    reopened = reopen(sqlite_database)
+    assert reopened.data.model_dump() == sqlite_database.data.model_dump()
+    connection = sqlite3.connect(sqlite_database.settings.DATABASE_PATH)
+    assert connection.execute("SELECT COUNT(*) FROM payments").fetchone() == (4,)
+
+
+def test_sqlite_database_find_invoices(sqlite_database):
+    assert len(sqlite_database.find_invoices()) == 3
+    assert [invoice.currency for invoice in sqlite_database.find_invoices(currency="EUR")] == ["EUR"]
+    found = sqlite_database.find_invoices(date_from=datetime.date(2024, 2, 1), status=InvoiceStatus.UNPAID)
+    assert [invoice.amount for invoice in found] == [500.0, 10.0]
+    assert len(found[0].payments) == 2
+
+
+def test_sqlite_database_output_file(sqlite_database, tmp_path):
+    sqlite_database.output_file = str(tmp_path / "output.sqlite3")
+    sqlite_database.save()
+    settings = sqlite_database.settings.model_copy(update={"DATABASE_PATH": sqlite_database.output_file})
+    output = SQLiteDatabase(settings=settings, nbp_api_client=sqlite_database.nbp_api_client)
+    output.load()
+    assert output.data == sqlite_database.data
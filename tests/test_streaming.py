@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from task3_dsw import batch
+from task3_dsw.batch import run_batch_stream
+from task3_dsw.database import CODECS, DataSchema, Database
+from task3_dsw.nbp_api import AsyncNBPApiClient, NBPApiClient
+from task3_dsw.settings import Settings
+from task3_dsw.streaming import InvoiceWriter, iter_invoices
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+def test_iter_invoices_matches_full_load(tmp_path, ledger, chunk_size):
+    path = tmp_path / "database.json"
+    path.write_text(json.dumps({"version": 1, **ledger, "other": [1, 2.5]}, indent=2))
+    invoices = list(iter_invoices(path, chunk_size=chunk_size))
+    assert invoices == DataSchema(**ledger).invoices
+
+
+def test_iter_invoices_empty_file(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text('{"invoices": []}')
+    assert list(iter_invoices(path)) == []
+
+
+def test_iter_invoices_invalid_file(tmp_path):
+    path = tmp_path / "database.json"
+    path.write_text('{"invoices": [{"amount": 1}')
+    with pytest.raises(ValueError):
+        list(iter_invoices(path))
+
+
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("empty", [False, True])
+def test_invoice_writer_matches_save(tmp_path, ledger, empty, codec):
+    data = DataSchema(invoices=[]) if empty else DataSchema(**ledger)
+    path = tmp_path / "output.json"
+    with InvoiceWriter(path, codec) as writer:
+        for invoice in data.invoices:
+            writer.write(invoice)
+    settings = Settings(DATABASE_PATH=str(tmp_path / "database.json"), DATABASE_CODEC=codec)
+    database = Database(settings=settings, nbp_api_client=NBPApiClient(), output_file=str(tmp_path / "saved.json"))
+    database.data = data
+    database.save()
+    assert path.read_bytes() == (tmp_path / "saved.json").read_bytes()
+    assert list(iter_invoices(path)) == data.invoices
+
+
+def test_run_batch_stream(batch_database, fake_nbp_transport, ledger_path, expected_results):
+    async_client = AsyncNBPApiClient(cache=batch_database.nbp_api_client.cache)
+    async_client.client = httpx.AsyncClient(base_url=async_client.api_url, transport=fake_nbp_transport)
+    database = Database(settings=batch_database.settings, nbp_api_client=batch_database.nbp_api_client, output_file=batch_database.output_file)
+    assert asyncio.run(run_batch_stream(database, async_client)).invoices == 3
+
+    output = json.loads((ledger_path.parent / "output.json").read_text())
+    assert DataSchema(**output) == expected_results
+
+
+def test_run_batch_stream_keeps_pending_changes_bounded(batch_database, monkeypatch):
+    pending = []
+    calculate = batch.calculate_invoice
+
+    def calculate_invoice(database, invoice, **kwargs):
+        pending.append(len(database._pending))
+        return calculate(database, invoice, **kwargs)
+
+    monkeypatch.setattr(batch, "calculate_invoice", calculate_invoice)
+    database = Database(settings=batch_database.settings, nbp_api_client=batch_database.nbp_api_client, output_file=batch_database.output_file)
+    asyncio.run(run_batch_stream(database, None))
+    assert pending == [0, 0, 0]
+    assert not database._pending
@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+from task3_dsw.batch import run_batch
+from task3_dsw.nbp_api import AsyncNBPApiClient
+from task3_dsw.tracing import NULL_SPAN, Tracer, tracer
+
+
+@pytest.fixture
+def enabled_tracer():
+    tracer.reset()
+    tracer.enabled = True
+    yield tracer
+    tracer.enabled = False
+    tracer.reset()
+
+
+def test_disabled_tracer_records_nothing():
+    disabled = Tracer()
+    assert disabled.span("stage", size=1) is NULL_SPAN
+    with disabled.span("stage") as span:
+        span.set("cache", "hit")
+    assert disabled.traced("stage")(len)([1, 2]) == 2
+    assert disabled.events == []
+
+
+def test_spans_are_nested_and_tagged():
+    local = Tracer()
+    local.enabled = True
+    with local.span("outer", size=2):
+        with local.span("inner") as span:
+            span.set("cache", "miss")
+        with pytest.raises(ValueError), local.span("failing"):
+            raise ValueError
+    inner, failing, outer = local.trace_events()[1:]
+    assert inner["args"] == {"cache": "miss"}
+    assert failing["args"] == {"error": "ValueError"}
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert {event["ph"] for event in (inner, failing, outer)} == {"X"}
+
+
+def test_batch_run_trace(enabled_tracer, batch_database, fake_nbp_transport, tmp_path):
+    async_client = AsyncNBPApiClient(cache=batch_database.nbp_api_client.cache, transport=fake_nbp_transport)
+    asyncio.run(run_batch(batch_database, async_client))
+    path = tmp_path / "trace.json"
+    enabled_tracer.save(path)
+
+    events = json.loads(path.read_text())["traceEvents"]
+    by_name = {}
+    for event in events:
+        by_name.setdefault(event["name"], []).append(event)
+    assert len(by_name["database.load"]) == 1
+    assert len(by_name["database.save"]) == 1
+    assert len(by_name["batch.prefetch"]) == 1
+    assert [event["args"]["id"] for event in by_name["batch.invoice"]] == ["invoice-1", "invoice-2", "invoice-3"]
+    assert len(by_name["database.calculate_difference"]) == 3
+    assert [event["args"]["status"] for event in by_name["nbp.request"]] == [200, 200, 200]
+    # every rate is served from cache filled by prefetch
+    assert {event["args"]["cache"] for event in by_name["nbp.rate"]} == {"hit"}
+
+    invoice = by_name["batch.invoice"][1]
+    differences = [
+        event
+        for event in by_name["database.calculate_difference"]
+        if invoice["ts"] <= event["ts"] <= invoice["ts"] + invoice["dur"]
+    ]
+    assert len(differences) == 2
+    assert all(event["tid"] == invoice["tid"] for event in differences)
@@ -0,0 +1,141 @@
+import json
+import os
+
+import pytest
+from task3_dsw.database import AddInvoice, AddPayment, DataSchema, Database
+from task3_dsw.settings import Settings
+from task3_dsw.storage import create_database
+from task3_dsw.wal import WriteAheadLog
+
+
+def test_wal_append_and_read(tmp_path):
+    wal = WriteAheadLog(tmp_path / "database.json.wal")
+    assert wal.read() == []
+    wal.append(['{"a": 1}', '{"b": 2}'])
+    wal.append([])
+    assert len(wal) == 2
+    wal.close()
+    with open(wal.path, "ab") as f:
+        f.write(b'{"c": ')
+    assert WriteAheadLog(wal.path).read() == ['{"a": 1}\n', '{"b": 2}\n']
+    assert wal.path.read_bytes().endswith(b"}\n")
+    wal.clear()
+    assert not wal.path.exists()
+
+
+def reopen(database):
+    other = create_database(settings=database.settings, nbp_api_client=database.nbp_api_client)
+    other.load()
+    return other
+
+
+@pytest.fixture
+def json_database(batch_database):
+    """Database of test ledger saving to its own file."""
+    batch_database.output_file = None
+    return batch_database
+
+
+def test_database_commit_is_replayed(json_database):
+    batch_database = json_database
+    path = batch_database.settings.DATABASE_PATH
+    before = open(path).read()
+    invoice = batch_database.add_invoice(AddInvoice(amount=1, currency="PLN", date="2024-03-03"))
+    batch_database.add_payment(batch_database.get_invoice(0), AddPayment(amount=5, currency="PLN", date="2024-03-04"))
+    batch_database.commit()
+
+    assert open(path).read() == before
+    assert len(batch_database.wal) == 2
+    reopened = reopen(batch_database)
+    assert reopened.data.model_dump() == batch_database.data.model_dump()
+    assert reopened.get_invoice_by_id(invoice.id).model_dump() == invoice.model_dump()
+
+    reopened.save()
+    assert not reopened.wal.path.exists()
+    assert DataSchema(**json.load(open(path))).model_dump() == batch_database.data.model_dump()
+
+
+def test_database_commit_checkpoints(json_database):
+    batch_database = json_database
+    batch_database.settings = batch_database.settings.model_copy(update={"WAL_CHECKPOINT_INTERVAL": 2})
+    batch_database.add_invoice(AddInvoice(amount=1, currency="PLN", date="2024-03-03"))
+    batch_database.commit()
+    assert batch_database.wal.path.exists()
+    batch_database.add_invoice(AddInvoice(amount=2, currency="PLN", date="2024-03-03"))
+    batch_database.commit()
+    assert not batch_database.wal.path.exists()
+    assert len(batch_database.wal) == 0
+
+
+@pytest.mark.parametrize("backend", ["ndjson", "sqlite"])
+def test_tracked_database_replays_wal(tmp_path, ledger, nbp_api_client, backend):
+    settings = Settings(DATABASE_PATH=str(tmp_path / f"database.{backend}"), DATABASE_BACKEND=backend)
+    database = create_database(settings=settings, nbp_api_client=nbp_api_client)
+    database.load()
+    for invoice in DataSchema(**ledger).invoices:
+        database.add_invoice(invoice)
+    database.commit()
+    database.add_payment(database.get_invoice(2), AddPayment(amount=5, currency="PLN", date="2024-03-04"))
+    database.commit()
+
+    reopened = reopen(database)
+    assert reopened.data.model_dump() == database.data.model_dump()
+    reopened.save()
+    assert not reopened.wal.path.exists()
+    assert reopen(database).data.model_dump() == database.data.model_dump()
+
+
+def test_json_database_created_from_wal(tmp_path, nbp_api_client):
+    settings = Settings(DATABASE_PATH=str(tmp_path / "database.json"))
+    database = Database(settings=settings, nbp_api_client=nbp_api_client)
+    database.add_invoice(AddInvoice(amount=1, currency="PLN", date="2024-03-03"))
+    database.commit()
+
+    reopened = reopen(database)
+    assert reopened.data.model_dump() == database.data.model_dump()
+    assert not reopened.wal.path.exists()
+
+
+def test_database_refresh_loads_only_changed_files(json_database):
+    database = json_database
+    database.settings = database.settings.model_copy(update={"WAL_CHECKPOINT_INTERVAL": 2})
+    path = database.settings.DATABASE_PATH
+    assert not database.refresh()
+
+    # Own changes are already in memory, also after checkpoint saves them
+    database.add_invoice(AddInvoice(amount=1, currency="PLN", date="2024-03-03"))
+    database.commit()
+    assert not database.refresh()
+    database.add_invoice(AddInvoice(amount=2, currency="PLN", date="2024-03-03"))
+    database.commit()
+    assert not database.wal.path.exists()
+    assert not database.refresh()
+
+    # Touched file has the same digest
+    os.utime(path, ns=(1, 1))
+    assert not database.refresh()
+
+    other = reopen(database)
+    invoice = other.add_invoice(AddInvoice(amount=3, currency="PLN", date="2024-03-03"))
+    other.commit()
+    assert database.refresh()
+    assert database.get_invoice_by_id(invoice.id) is not None
+    other.save()
+    assert database.refresh()
+    assert len(database.get_invoices()) == 6
+
+
+@pytest.mark.parametrize("backend", ["json", "ndjson", "sqlite"])
+def test_database_refresh_after_load_is_noop(tmp_path, ledger, nbp_api_client, backend, mocker):
+    settings = Settings(DATABASE_PATH=str(tmp_path / f"database.{backend}"), DATABASE_BACKEND=backend)
+    database = create_database(settings=settings, nbp_api_client=nbp_api_client)
+    database.load()
+    for invoice in DataSchema(**ledger).invoices:
+        database.add_invoice(invoice)
+    database.save()
+
+    reopened = create_database(settings=settings, nbp_api_client=nbp_api_client)
+    reopened.load()
+    load = mocker.spy(reopened, "load")
+    assert not reopened.refresh()
+    assert load.call_count == 0